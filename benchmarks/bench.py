@@ -0,0 +1,271 @@
+"""
+Бенчмарк этапов анализа с дифференциальными проверками.
+
+    python benchmarks/bench.py                    # корпус scale=1 во временном каталоге
+    python benchmarks/bench.py --scale 4 -j 8     # корпус крупнее, пул из 8 процессов
+    python benchmarks/bench.py --root ~/src/proj  # реальный проект вместо корпуса
+    python benchmarks/bench.py --json out.json    # результаты для сравнения запусков
+
+Сначала замеряется импорт code_analyzer.cli в отдельном интерпретаторе
+(байт-код уже скомпилирован, лучший из запусков): он должен укладываться
+в бюджет --import-budget и не компилировать ни одного шаблона каталогов
+(то же проверяет tests/test_startup.py).
+Каждый этап cli.main (индекс, языки, SLOC, стек, зависимости, эндпоинты,
+заголовки, конфиги, секреты) замеряется отдельно, лучший из --repeat запусков;
+для него выводятся файлы/с и МБ/с по файлам, которые этап обрабатывает.
+Затем замеряется общий проход cli.analyze в разных режимах (пул
+процессов, mmap, упреждающее чтение, холодный и тёплый кэш).
+
+Проверки (без --no-check): результаты оптимизированных сканеров
+совпадают с эталонными реализациями из reference.py, а результаты
+cli.analyze во всех режимах — с последовательным запуском; шаблоны
+скомпилированы только для языков корпуса. При расхождении или превышении
+бюджета импорта код возврата 1.
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Callable, Dict, List, Sequence, Tuple
+
+_HERE = os.path.dirname(os.path.abspath(__file__))
+_SRC = os.path.join(_HERE, '..', 'src')
+sys.path.insert(0, _SRC)
+
+import corpus      # noqa: E402
+import reference   # noqa: E402
+from code_analyzer.analyzers.dependency_analyzer import DependencyAnalyzer  # noqa: E402
+from code_analyzer.analyzers.language_analyzer import LanguageAnalyzer, SlocCounter  # noqa: E402
+from code_analyzer.analyzers.stack_analyzer import StackAnalyzer  # noqa: E402
+from code_analyzer.cli import analyze  # noqa: E402
+from code_analyzer.detectors.config_detector import ConfigDetector  # noqa: E402
+from code_analyzer.detectors.endpoint_detector import EndpointDetector  # noqa: E402
+from code_analyzer.detectors.header_detector import HeaderDetector  # noqa: E402
+from code_analyzer.detectors.secret_detector import SecretDetector  # noqa: E402
+from code_analyzer.engine import resolve_jobs, run_scan  # noqa: E402
+from code_analyzer.file_index import FileEntry, FileIndex  # noqa: E402
+from code_analyzer.git_diff import MANIFEST_FILES  # noqa: E402
+from code_analyzer.patterns import CONFIG_PATTERNS, ENDPOINT_PATTERNS, HEADER_PATTERNS  # noqa: E402
+
+# Бюджет импорта code_analyzer.cli по умолчанию, мс: тысячи коротких запусков
+# не должны платить за компиляцию каталогов и модули, нужные только -j/--cache-dir/--diff
+IMPORT_BUDGET_MS = 50
+
+# Что скомпилировано после импорта: языки и технологии каталогов, общие шаблоны
+_IMPORT_PROBE = (
+    'import code_analyzer.cli, code_analyzer.patterns as p\n'
+    'print(p.ENDPOINT_PATTERNS.compiled() + p.HEADER_PATTERNS.compiled()'
+    ' + p.TECHNOLOGY_DETECTORS.compiled() + [name for name in p._DEFERRED if name in vars(p)])'
+)
+
+
+def import_time(repeat: int) -> Tuple[float, str]:
+    """
+    Лучшее время импорта code_analyzer.cli (секунды, по -X importtime) в новом
+    интерпретаторе и вывод _IMPORT_PROBE. Байт-код пишется во временный
+    каталог и компилируется первым, незамеряемым запуском.
+    """
+    env = dict(os.environ, PYTHONPATH=os.path.abspath(_SRC))
+    env.pop('PYTHONDONTWRITEBYTECODE', None)
+    prefix = tempfile.mkdtemp(prefix='bench-pyc-')
+    cmd = [sys.executable, '-X', f'pycache_prefix={prefix}', '-X', 'importtime', '-c', _IMPORT_PROBE]
+    try:
+        best, probe = float('inf'), ''
+        for run in range(max(repeat, 5) + 1):
+            done = subprocess.run(cmd, env=env, check=True, capture_output=True, text=True)
+            probe = done.stdout.strip()
+            for line in done.stderr.splitlines():
+                # import time: self [us] | cumulative | name
+                fields = line.split('|')
+                if run and len(fields) == 3 and fields[2].strip() == 'code_analyzer.cli':
+                    best = min(best, int(fields[1]) / 1e6)
+        return best, probe
+    finally:
+        shutil.rmtree(prefix, ignore_errors=True)
+
+
+def _timed(fn: Callable[[], Any], repeat: int) -> Tuple[Any, float]:
+    """Результат последнего запуска и лучшее время из repeat."""
+    best, result = float('inf'), None
+    for _ in range(max(repeat, 1)):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return result, best
+
+
+def _row(stage: str, seconds: float, entries: Sequence[FileEntry]) -> Dict[str, Any]:
+    size = sum(entry.size for entry in entries)
+    return {
+        'stage':       stage,
+        'seconds':     round(seconds, 4),
+        'files':       len(entries),
+        'mb':          round(size / 1e6, 3),
+        'files_per_s': round(len(entries) / seconds, 1) if seconds else None,
+        'mb_per_s':    round(size / 1e6 / seconds, 2) if seconds else None,
+    }
+
+
+def _accepted(index: FileIndex, scanner: Any) -> List[FileEntry]:
+    return [entry for entry in index.scannable() if scanner.accepts(entry)]
+
+
+class Bench:
+    def __init__(self, root: str, repeat: int, jobs: int):
+        self.root = root
+        self.repeat = repeat
+        self.jobs = jobs
+        self.rows: List[Dict[str, Any]] = []
+        self.failures: List[str] = []
+
+    def stage(self, name: str, fn: Callable[[], Any], entries: Sequence[FileEntry]) -> Any:
+        result, seconds = _timed(fn, self.repeat)
+        self.rows.append(_row(name, seconds, entries))
+        return result
+
+    def check(self, name: str, got: Any, expected: Any) -> None:
+        if got != expected:
+            self.failures.append(name)
+
+    def startup(self, budget_ms: float, check: bool) -> None:
+        seconds, probe = import_time(self.repeat)
+        self.rows.append(_row('import code_analyzer.cli', seconds, []))
+        if check:
+            self.check(f'import <= {budget_ms:g} ms', seconds * 1000 <= budget_ms, True)
+            self.check('import compiles no patterns', probe, '[]')
+
+    def stages(self, check: bool) -> None:
+        index, seconds = _timed(lambda: FileIndex(self.root), self.repeat)
+        entries = list(index)
+        self.rows.append(_row('index', seconds, entries))
+        scannable = list(index.scannable())
+
+        langs = self.stage('language', lambda: LanguageAnalyzer(self.root, index).detect_languages(), entries)
+        main_lang = max(langs, key=langs.get) if langs else ''
+
+        sloc = self.stage('sloc', lambda: run_scan(index, [SlocCounter()])[0], scannable)
+
+        stack = StackAnalyzer(self.root, main_lang, index)
+        stack.prepare_detectors()
+        code = stack.code_matcher
+
+        def run_stack():
+            run_scan(index, [code])
+            return stack.analyze_stack(scanned=True)
+        self.stage('stack', run_stack, _accepted(index, code))
+
+        manifests = [entry for entry in map(index.get, MANIFEST_FILES) if entry is not None]
+        self.stage('dependencies', lambda: DependencyAnalyzer(self.root, main_lang, index).analyze(), manifests)
+
+        active = [lang for lang in langs if lang in ENDPOINT_PATTERNS]
+        ep = EndpointDetector(self.root, active, index)
+        ep_res = self.stage('endpoints', lambda: run_scan(index, [ep])[0], _accepted(index, ep))
+        hdr = HeaderDetector(self.root, active, index)
+        hdr_res = self.stage('headers', lambda: run_scan(index, [hdr])[0], _accepted(index, hdr))
+        cfg = ConfigDetector(self.root, CONFIG_PATTERNS, index)
+        self.stage('configs', lambda: run_scan(index, [cfg])[0], _accepted(index, cfg))
+        sec = SecretDetector(self.root, index=index)
+        sec_res = self.stage('secrets', lambda: run_scan(index, [sec])[0], scannable)
+
+        if check:
+            # до эталонов: reference.py обращается к каталогам только по языкам корпуса,
+            # но проверяется то, что скомпилировали сами этапы
+            self.check('patterns compiled only for present languages',
+                       set(ENDPOINT_PATTERNS.compiled()) | set(HEADER_PATTERNS.compiled()) <= set(langs), True)
+            self.check('sloc == reference', sloc, reference.sloc(index))
+            self.check('endpoints == reference', ep_res, reference.endpoints(index, ep))
+            self.check('headers == reference', hdr_res, reference.headers(index, hdr))
+            self.check('secrets == reference', sec_res, reference.secrets(index))
+            run_scan(index, [code])
+            self.check('stack code rules == per-rule reference',
+                       [det.matches for _, det in code.rules], reference.code_rules(index, code.rules))
+
+    def full_pass(self, check: bool) -> None:
+        index = FileIndex(self.root)
+        scannable = list(index.scannable())
+        cache_dir = tempfile.mkdtemp(prefix='bench-cache-')
+        modes = [
+            ('analyze', {}),
+            (f'analyze -j {self.jobs}', {'jobs': self.jobs}),
+            ('analyze --mmap', {'use_mmap': True}),
+            ('analyze --readers 4', {'readers': 4}),
+            # окна меньше большинства файлов корпуса: проверяется слияние находок окон
+            ('analyze --window-size 4K', {'window_size': 4 * 1024}),
+            (f'analyze -j {self.jobs} --window-size 4K', {'jobs': self.jobs, 'window_size': 4 * 1024}),
+        ]
+        try:
+            expected = self.stage('analyze', lambda: analyze(self.root, FileIndex(self.root)), scannable)
+            for name, options in modes[1:]:
+                got = self.stage(name, lambda: analyze(self.root, FileIndex(self.root), **options), scannable)
+                if check:
+                    self.check(f'{name} == analyze', got, expected)
+
+            # холодный кэш — один запуск по пустому каталогу, тёплый — лучший из repeat
+            repeat, self.repeat = self.repeat, 1
+            got = self.stage('analyze --cache-dir (cold)',
+                             lambda: analyze(self.root, FileIndex(self.root), cache_dir=cache_dir), scannable)
+            self.repeat = repeat
+            if check:
+                self.check('cache cold == analyze', got, expected)
+            got = self.stage('analyze --cache-dir (warm)',
+                             lambda: analyze(self.root, FileIndex(self.root), cache_dir=cache_dir), scannable)
+            if check:
+                self.check('cache warm == analyze', got, expected)
+        finally:
+            shutil.rmtree(cache_dir, ignore_errors=True)
+
+
+def _print(rows: List[Dict[str, Any]]) -> None:
+    print(f"{'этап':<28} {'сек':>8} {'файлы':>7} {'МБ':>9} {'файлы/с':>10} {'МБ/с':>9}")
+    for row in rows:
+        print(f"{row['stage']:<28} {row['seconds']:>8.3f} {row['files']:>7} {row['mb']:>9.2f} "
+              f"{row['files_per_s'] or 0:>10.0f} {row['mb_per_s'] or 0:>9.1f}")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='Бенчмарк этапов анализа на синтетическом корпусе')
+    parser.add_argument('--root', help='Существующий проект вместо синтетического корпуса')
+    parser.add_argument('--scale', type=int, default=1, help='Размер корпуса (множитель)')
+    parser.add_argument('--seed', type=int, default=0, help='Зерно генератора корпуса')
+    parser.add_argument('--keep', action='store_true', help='Не удалять сгенерированный корпус')
+    parser.add_argument('--repeat', type=int, default=3, help='Запусков на этап (берётся лучший)')
+    parser.add_argument('--jobs', '-j', type=int, default=0, help='Процессов для режима -j (0 — все ядра)')
+    parser.add_argument('--no-check', action='store_true', help='Без дифференциальных проверок')
+    parser.add_argument('--json', help='Сохранить результаты в JSON')
+    parser.add_argument('--import-budget', type=float, default=IMPORT_BUDGET_MS,
+                        help=f'Бюджет импорта code_analyzer.cli, мс (по умолчанию {IMPORT_BUDGET_MS})')
+    args = parser.parse_args()
+
+    root = args.root
+    if root is None:
+        root = tempfile.mkdtemp(prefix='bench-corpus-')
+        start = time.perf_counter()
+        stats = corpus.generate(root, scale=args.scale, seed=args.seed)
+        print(f"корпус: {root} — {stats['files']} файлов, {stats['bytes'] / 1e6:.1f} МБ "
+              f"({time.perf_counter() - start:.1f} с)")
+
+    bench = Bench(root, args.repeat, resolve_jobs(args.jobs))
+    try:
+        bench.startup(args.import_budget, not args.no_check)
+        bench.stages(not args.no_check)
+        bench.full_pass(not args.no_check)
+    finally:
+        if args.root is None and not args.keep:
+            shutil.rmtree(root, ignore_errors=True)
+
+    _print(bench.rows)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'root': root, 'scale': args.scale, 'seed': args.seed,
+                       'stages': bench.rows, 'failures': bench.failures}, f, indent=2, ensure_ascii=False)
+    if not args.no_check:
+        print('проверки: ' + ('все совпали' if not bench.failures else 'РАСХОЖДЕНИЯ: ' + ', '.join(bench.failures)))
+    return 1 if bench.failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
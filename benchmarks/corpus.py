@@ -0,0 +1,259 @@
+"""
+Генератор синтетического монорепозитория для бенчмарков.
+
+Корпус воспроизводим: содержимое определяется только seed и scale.
+В нём есть всё, что встречается в реальных проектах и влияет на скорость:
+сервисы на нескольких языках с эндпоинтами, HTTP-заголовками и кодовыми
+признаками стека, манифесты и конфиги с секретами, учётные данные в форматах
+провайдеров, шум зависимостей (node_modules, vendor), минифицированные
+бандлы в одну строку, двоичные файлы (по расширению и без него), глубокие
+деревья каталогов и один файл крупнее предела --max-file-size.
+
+Все файлы — ASCII: режимы str и mmap на корпусе обязаны совпадать.
+"""
+import json
+import os
+import random
+import string
+from typing import Callable, Dict, List
+
+# Файл крупнее DEFAULT_MAX_FILE_SIZE (10 MiB)
+OVERSIZED_BYTES = 11 * 1024 * 1024
+
+_PY_SERVICE = '''\
+import os
+import requests
+from flask import Flask, jsonify, request
+
+app = Flask(__name__)
+API_TOKEN = os.environ.get("API_TOKEN")
+
+
+@app.route("/api/{name}/items", methods=["GET"])
+def list_{name}():
+    resp = requests.get("https://upstream.example.com/{name}", headers={{"Authorization": "Bearer " + API_TOKEN}})
+    return jsonify(resp.json())
+
+
+@app.route("/api/{name}/items/<int:item_id>", methods=["POST"])
+def update_{name}(item_id):
+    payload = request.get_json()
+    return jsonify({{"id": item_id, "payload": payload}})
+'''
+
+_DJANGO_URLS = '''\
+from django.urls import path
+from . import views
+
+urlpatterns = [
+    path("{name}/", views.index),
+    path("{name}/<int:pk>/", views.detail),
+]
+'''
+
+_JS_SERVICE = '''\
+const express = require('express');
+const axios = require('axios');
+const router = express.Router();
+
+router.get('/api/{name}', async (req, res) => {{
+  const data = await axios.get('/internal/{name}', {{ headers: {{ 'X-Request-Id': req.id }} }});
+  res.json(data.data);
+}});
+
+router.post('/api/{name}/:id', (req, res) => {{
+  res.setHeader('Cache-Control', 'no-store');
+  res.status(201).send({{ id: req.params.id }});
+}});
+
+module.exports = router;
+'''
+
+_JSX_COMPONENT = '''\
+import React, {{ useEffect, useState }} from 'react';
+
+export default function {cls}List() {{
+  const [items, setItems] = useState([]);
+  useEffect(() => {{
+    fetch('/api/{name}').then(r => r.json()).then(setItems);
+  }}, []);
+  return <ul>{{items.map(i => <li key={{i.id}}>{{i.title}}</li>)}}</ul>;
+}}
+'''
+
+_JAVA_CONTROLLER = '''\
+package com.example.{name};
+
+import org.springframework.web.bind.annotation.*;
+import org.springframework.http.ResponseEntity;
+
+@RestController
+@RequestMapping("/api/{name}")
+public class {cls}Controller {{
+
+    @GetMapping("/list")
+    public ResponseEntity<String> list() {{
+        return ResponseEntity.ok().header("X-Total-Count", "0").body("[]");
+    }}
+
+    @PostMapping("/create")
+    public String create(@RequestBody String body) {{
+        return body;
+    }}
+}}
+'''
+
+_GO_SERVICE = '''\
+package main
+
+import "github.com/gin-gonic/gin"
+
+func main() {{
+    r := gin.Default()
+    r.GET("/api/{name}", func(c *gin.Context) {{
+        c.Header("Content-Type", "application/json")
+        c.JSON(200, gin.H{{"ok": true}})
+    }})
+    r.Run()
+}}
+'''
+
+_PHP_ROUTES = '''\
+<?php
+use Illuminate\\Support\\Facades\\Route;
+
+Route::get('/api/{name}', [{cls}Controller::class, 'index']);
+Route::post('/api/{name}', [{cls}Controller::class, 'store']);
+'''
+
+_RUBY_ROUTES = '''\
+Rails.application.routes.draw do
+  get '/api/{name}', to: '{name}#index'
+  post '/api/{name}', to: '{name}#create'
+end
+'''
+
+_TEMPLATES: Dict[str, str] = {
+    'py': _PY_SERVICE, 'urls.py': _DJANGO_URLS, 'js': _JS_SERVICE, 'jsx': _JSX_COMPONENT,
+    'java': _JAVA_CONTROLLER, 'go': _GO_SERVICE, 'php': _PHP_ROUTES, 'rb': _RUBY_ROUTES,
+}
+
+
+def _words(rng: random.Random, count: int) -> List[str]:
+    return [''.join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(3, 9)))
+            for _ in range(count)]
+
+
+def _filler(rng: random.Random, lang: str, lines: int) -> str:
+    """Код без находок: функции с комментариями и пустыми строками."""
+    out = []
+    for i in range(lines // 4):
+        name = '_'.join(_words(rng, 2))
+        if lang == 'py':
+            out += [f'def {name}_{i}(value):', f'    # {" ".join(_words(rng, 6))}',
+                    f'    return value * {rng.randint(1, 99)}', '']
+        else:
+            out += [f'function {name}_{i}(value) {{', f'  // {" ".join(_words(rng, 6))}',
+                    f'  return value * {rng.randint(1, 99)};', '}']
+    return '\n'.join(out) + '\n'
+
+
+def _write(path: str, data, mode: str = 'w') -> int:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, mode) as f:
+        f.write(data)
+    return len(data)
+
+
+def generate(root: str, scale: int = 1, seed: int = 0, oversized: bool = True) -> Dict[str, int]:
+    """
+    Создаёт корпус в root (каталог должен быть пустым или отсутствовать).
+    scale — множитель числа сервисов, шума и бандлов; размер корпуса растёт линейно.
+    Возвращает {'files': ..., 'bytes': ...}.
+    """
+    rng = random.Random(seed)
+    stats = {'files': 0, 'bytes': 0}
+
+    def put(rel: str, data, mode: str = 'w') -> None:
+        stats['bytes'] += _write(os.path.join(root, rel), data, mode)
+        stats['files'] += 1
+
+    # Манифесты и конфиги в корне
+    put('package.json', json.dumps({
+        'name': 'monorepo', 'private': True,
+        'dependencies': {'express': '^4.18.0', 'react': '^18.2.0', 'axios': '^1.6.0'},
+        'devDependencies': {'jest': '^29.0.0', 'webpack': '^5.0.0'},
+    }, indent=2))
+    put('requirements.txt', 'Flask==2.3.0\nrequests==2.31.0\nDjango==4.2\npytest==7.4.0\n')
+    put('.env', 'DB_CONNECTION=pgsql\nCACHE_DRIVER=redis\npassword=benchSecret123\n')
+    put('docker-compose.yml', 'services:\n  db:\n    image: postgres:15\n  cache:\n    image: redis:7\n')
+    put('Dockerfile', 'FROM python:3.11-slim\nCOPY . /app\nRUN pip install -r requirements.txt\n')
+    put('tools/deploy', '#!/usr/bin/env python3\nimport sys\nprint(sys.argv)\n')
+
+    # Учётные данные в деплойном конфиге: форматы провайдеров и пароль
+    alnum = string.ascii_letters + string.digits
+    put('deploy/credentials.yml', '\n'.join([
+        'aws:',
+        '  access_key_id: AKIA' + ''.join(rng.choice(string.ascii_uppercase + string.digits) for _ in range(16)),
+        '  aws_secret_access_key: ' + ''.join(rng.choice(alnum + '/+') for _ in range(40)),
+        'slack_token: xoxb-' + ''.join(rng.choice(string.digits) for _ in range(12)),
+        'github: ghp_' + ''.join(rng.choice(alnum) for _ in range(36)),
+        'db_password: ' + ''.join(rng.choice(alnum) for _ in range(14)),
+        'database_url: postgres://app:' + ''.join(rng.choice(alnum) for _ in range(10)) + '@db:5432/app',
+    ]) + '\n')
+
+    # Сервисы: шаблон с находками плюс код-наполнитель
+    kinds: List[Callable[[str], str]] = [
+        lambda n: f'services/py/{n}/app.py',
+        lambda n: f'services/py/{n}/urls.py',
+        lambda n: f'services/node/{n}/routes.js',
+        lambda n: f'web/{n}/src/{n.capitalize()}List.jsx',
+        lambda n: f'services/java/{n}/src/main/java/{n.capitalize()}Controller.java',
+        lambda n: f'services/go/{n}/main.go',
+        lambda n: f'services/php/{n}/routes/api.php',
+        lambda n: f'services/ruby/{n}/config/routes.rb',
+    ]
+    names = sorted(set(_words(rng, 12 * scale)))
+    for n in names:
+        for make in kinds:
+            rel = make(n)
+            key = 'urls.py' if rel.endswith('urls.py') else rel.rsplit('.', 1)[1]
+            body = _TEMPLATES[key].format(name=n, cls=n.capitalize())
+            lang = 'py' if key in ('py', 'urls.py') else 'js'
+            put(rel, body + _filler(rng, lang, rng.randint(40, 400)))
+        for i in range(rng.randint(2, 6)):
+            put(f'services/py/{n}/lib/util_{i}.py', _filler(rng, 'py', rng.randint(50, 600)))
+
+    # Шум зависимостей: при обходе не индексируется, но лежит на диске
+    for p in range(40 * scale):
+        pkg = f'pkg-{p:04d}'
+        put(f'node_modules/{pkg}/package.json', json.dumps({'name': pkg, 'version': '1.0.0'}))
+        for i in range(5):
+            put(f'node_modules/{pkg}/lib/m{i}.js', _filler(rng, 'js', 80))
+    for p in range(5 * scale):
+        put(f'vendor/lib{p}/src/Lib{p}.php', _filler(rng, 'js', 120))
+
+    # Минифицированные бандлы: одна очень длинная строка с fetch-вызовами
+    for b in range(2 * scale):
+        parts = []
+        for i in range(3000):
+            parts.append(f'function a{i}(b){{return b+{i}}}')
+            if i % 250 == 0:
+                parts.append(f'fetch("/api/bundle/{b}/{i}")')
+        put(f'web/static/js/bundle{b}.min.js', ';'.join(parts))
+
+    # Двоичные файлы: по расширению и без расширения (распознаются по NUL)
+    for i in range(20 * scale):
+        blob = bytes(rng.getrandbits(8) for _ in range(rng.randint(512, 8192)))
+        put(f'assets/img/icon{i}.png', blob, 'wb')
+        put(f'build-artifacts/blob{i}', b'\0' + blob, 'wb')
+
+    # Глубокое дерево
+    for d in range(3 * scale):
+        deep = '/'.join(f'level{k}' for k in range(14))
+        put(f'deep{d}/{deep}/leaf.py', _filler(rng, 'py', 40))
+
+    if oversized:
+        line = ('x' * 99 + '\n').encode()
+        put('data/dump.sql', line * (OVERSIZED_BYTES // len(line) + 1), 'wb')
+    return stats
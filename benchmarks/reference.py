@@ -0,0 +1,118 @@
+"""
+Эталонные реализации для дифференциальных проверок бенчмарка.
+
+Это прямолинейные версии этапов без оптимизаций: каждый шаблон каталога
+применяется к полному тексту файла, номер строки — подсчётом '\\n' до
+позиции, SLOC — через splitlines, кодовые правила стека — по одному
+CodeDetector на правило построчно, секреты — каждое правило по полному
+тексту без отбора строк по литералам. Выбор файлов (accepts) общий
+с оптимизированными сканерами: сравнивается разбор содержимого.
+"""
+from typing import Any, Dict, List, Tuple
+
+from code_analyzer.detectors.code_detector import CodeDetector
+from code_analyzer.detectors.endpoint_detector import EXTENSION_LANG_MAP, EndpointDetector
+from code_analyzer.detectors.header_detector import HEADER_LANG_MAP, HeaderDetector
+from code_analyzer.detectors.secret_detector import plausible
+from code_analyzer.file_index import FileIndex
+from code_analyzer.patterns import AJAX_PATTERN_EXT, ENDPOINT_PATTERNS, HEADER_PATTERNS, SECRET_PATTERNS
+
+
+def _line(text: str, pos: int) -> int:
+    return text[:pos].count('\n') + 1
+
+
+def sloc(index: FileIndex) -> Tuple[Dict[str, int], int]:
+    by_lang: Dict[str, int] = {}
+    total = 0
+    for entry in index.scannable():
+        text = entry.read()
+        if text is None:
+            continue
+        lines = sum(1 for line in text.splitlines() if line.strip())
+        by_lang[entry.lang] = by_lang.get(entry.lang, 0) + lines
+        total += lines
+    return by_lang, total
+
+
+def endpoints(index: FileIndex, detector: EndpointDetector) -> Dict[str, List[Dict[str, Any]]]:
+    raw, ajax = [], set()
+    for entry in index.scannable():
+        if not detector.accepts(entry):
+            continue
+        text = entry.read()
+        if text is None:
+            continue
+        for regex, framework in ENDPOINT_PATTERNS.get(EXTENSION_LANG_MAP[entry.ext], []):
+            for m in regex.finditer(text):
+                method = m.group(1).upper() if regex.groups >= 2 else 'ALL'
+                raw.append((entry.rel, _line(text, m.start()), framework, method, m.group(regex.groups)))
+        for m in AJAX_PATTERN_EXT.finditer(text):
+            url = next((g for g in m.groups() if g), None)
+            if url:
+                ajax.add((entry.rel, _line(text, m.start()), url))
+    raw.sort(key=lambda x: (x[0], x[1]))
+    return {
+        'endpoints': [{'file': f, 'line': ln, 'framework': fw, 'method': meth, 'endpoint': ep}
+                      for f, ln, fw, meth, ep in raw],
+        'ajax': [{'file': f, 'line': ln, 'call': url} for f, ln, url in sorted(ajax)],
+    }
+
+
+def headers(index: FileIndex, detector: HeaderDetector) -> List[Dict[str, Any]]:
+    results = []
+    for entry in index.scannable():
+        if not detector.accepts(entry):
+            continue
+        text = entry.read()
+        if text is None:
+            continue
+        for regex, framework in HEADER_PATTERNS.get(HEADER_LANG_MAP[entry.ext], []):
+            for m in regex.finditer(text):
+                gd = m.groupdict()
+                hdrs = gd.get('headers')
+                if not hdrs and gd.get('headerName'):
+                    hdrs = {gd['headerName']: gd.get('headerValue')}
+                if isinstance(hdrs, dict):
+                    hdrs = {k.lower(): v for k, v in hdrs.items()}
+                results.append({'file': entry.rel, 'line': _line(text, m.start()), 'framework': framework,
+                                'method': gd.get('method'), 'endpoint': gd.get('url'), 'headers': hdrs})
+    return results
+
+
+def code_rules(index: FileIndex, rules: List[Tuple[str, CodeDetector]]) -> List[List[Tuple[str, int, str]]]:
+    """Первое совпадение каждого правила в каждом файле, отдельным проходом (без объединения)."""
+    found = []
+    for _, det in rules:
+        matches = []
+        for entry in index.scannable():
+            if not det.accepts(entry):
+                continue
+            text = entry.read()
+            if text is None:
+                continue
+            for lineno, line in enumerate(text.split('\n'), start=1):
+                m = det.pattern.search(line)
+                if m:
+                    matches.append((entry.path, lineno, m.group(0)))
+                    break
+        found.append(matches)
+    return found
+
+
+def secrets(index: FileIndex) -> List[Tuple[str, List[str]]]:
+    found_files = []
+    for entry in index.scannable():
+        text = entry.read()
+        if text is None:
+            continue
+        found: Dict[str, Tuple[int, str]] = {}
+        for name, regex, min_entropy in SECRET_PATTERNS:
+            for m in regex.finditer(text):
+                value = m.group(1) if regex.groups else m.group(0)
+                if min_entropy is None or plausible(value, min_entropy):
+                    found.setdefault(value, (m.start(), name))
+        if found:
+            ordered = sorted(found.items(), key=lambda item: item[1][0])
+            found_files.append((entry.path, [f'{name}: {value}' for value, (_, name) in ordered]))
+    return found_files
@@ -3,7 +3,7 @@ from .language_analyzer import LanguageAnalyzer
 from .stack_analyzer import StackAnalyzer
 from .dependency_analyzer import DependencyAnalyzer
 from .secret_analyzer import SecretAnalyzer
-from .report_generator import ReportGenerator
+from .report_generator import ReportGenerator, json_default
 
 __all__ = [
     "LanguageAnalyzer",
@@ -11,4 +11,5 @@ __all__ = [
     "DependencyAnalyzer",
     "SecretAnalyzer",
     "ReportGenerator",
+    "json_default",
 ]
\ No newline at end of file
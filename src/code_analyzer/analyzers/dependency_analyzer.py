@@ -1,12 +1,24 @@
 from collections import defaultdict
-import os, json
+import json
 from typing import Dict, Set, Union
 from ..patterns import DEPENDENCY_PATTERNS, JS_TECH_DETECTION
+from ..file_index import FileIndex
 
 class DependencyAnalyzer:
-    def __init__(self, directory: str, main_lang: str):
+    def __init__(self, directory: str, main_lang: str, index: FileIndex = None):
         self.directory = directory
         self.main_lang = main_lang
+        self.index = index if index is not None else FileIndex(directory)
+        # {технология: манифест, в котором она найдена} — после analyze()
+        self.sources: Dict[str, str] = {}
+
+    def _load_json(self, filename: str) -> dict:
+        """Разбирает JSON-манифест из корня проекта; {} при любой ошибке."""
+        entry = self.index.get(filename)
+        try:
+            return json.loads(entry.content)
+        except Exception:
+            return {}
 
     def analyze(self) -> Dict[str, Set[str]]:
         tech_stack: Dict[str, Set[str]] = defaultdict(set)
@@ -14,43 +26,39 @@ class DependencyAnalyzer:
         # 1) декларативный обход текстовых шаблонов
         for file_spec in DEPENDENCY_PATTERNS.get(self.main_lang, []):
             filename, patterns, category, *rest = (*file_spec, None)
-            path = os.path.join(self.directory, filename)
-            if not os.path.exists(path):
+            entry = self.index.get(filename)
+            if entry is None:
                 continue
 
             # вдруг patterns — словарь (composer.json)
             if isinstance(patterns, dict):
-                try:
-                    data = json.load(open(path, 'r', encoding='utf-8', errors='ignore'))
-                except Exception:
-                    data = {}
+                data = self._load_json(filename)
                 require = data.get('require', {})
                 for pkg, tech in patterns.items():
                     if pkg in require:
                         tech_stack[category].add(tech)
+                        self.sources.setdefault(tech, filename)
 
             # иначе ищем простое вхождение
             else:
-                try:
-                    text = open(path, 'r', encoding='utf-8', errors='ignore').read().lower()
-                except Exception:
+                text = entry.content
+                if text is None:
                     continue
+                text = text.lower()
                 if patterns.lower() in text:
                     tech = rest[0] or patterns  # если rest задано, это название технологии
                     tech_stack[category].add(tech)
+                    self.sources.setdefault(tech, filename)
 
         # 2) JS/TS через уже существующий механизм
         if self.main_lang in ["JavaScript", "TypeScript"]:
-            pkg = os.path.join(self.directory, 'package.json')
-            try:
-                data = json.load(open(pkg, 'r', encoding='utf-8', errors='ignore'))
-            except Exception:
-                data = {}
+            data = self._load_json('package.json')
             deps = {**data.get('dependencies', {}), **data.get('devDependencies', {})}
             for tech, detector in JS_TECH_DETECTION.items():
                 if any(pkg_name in deps for pkg_name in detector['packages']):
                     cat = detector['type']
                     # приводим 'backend'/'frontend'/'database'
                     tech_stack[cat].add(tech)
+                    self.sources.setdefault(tech, 'package.json')
 
         return tech_stack
\ No newline at end of file
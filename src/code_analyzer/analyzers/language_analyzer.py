@@ -1,12 +1,84 @@
-import os
 from collections import Counter, defaultdict
-from typing import Dict, Tuple
-from ..utils import read_files
-from ..patterns import LANG_EXTENSIONS
+from typing import Any, Dict, List, Tuple
+from ..engine import run_scan
+from ..file_index import BINARY, OVERSIZED, FileEntry, FileIndex
+
+# Подсчёт непустых строк без объектов-строк: байты переводятся в алфавит
+# из двух символов — разделители строк (как у str.splitlines) становятся
+# '\n', прочие пробельные удаляются, остальные становятся 'x'. Непустая
+# строка — это 'x' в начале буфера или после '\n'.
+_LINE_BREAKS = b'\n\r\x0b\x0c\x1c\x1d\x1e'
+_BLANKS = b' \t\x1f'
+_SLOC_TABLE = bytes(0x0a if byte in _LINE_BREAKS else 0x78 for byte in range(256))
+# mmap и большие буферы переводятся окнами (срез окна — копия в bytes),
+# чтобы не копировать файл целиком
+_SLOC_WINDOW = 1 << 20
+
+
+def count_sloc(content) -> int:
+    """
+    Число непустых строк в str или bytes/mmap. Для str с не-ASCII символами
+    (пробелы и разделители Unicode) — str.splitlines/strip; байты
+    классифицируются только по ASCII.
+    """
+    if isinstance(content, str):
+        if not content.isascii():
+            return sum(1 for line in content.splitlines() if line.strip())
+        content = content.encode('ascii')
+    if isinstance(content, bytes) and len(content) <= _SLOC_WINDOW:
+        marks = b'\n' + content.translate(_SLOC_TABLE, _BLANKS)
+        return marks.count(b'\nx')
+    total, last = 0, b'\n'
+    for start in range(0, len(content), _SLOC_WINDOW):
+        marks = last + content[start:start + _SLOC_WINDOW].translate(_SLOC_TABLE, _BLANKS)
+        total += marks.count(b'\nx')
+        last = marks[-1:]
+    return total
+
+
+class SlocCounter:
+    """Сканер для движка: непустые строки по языкам за общий проход."""
+
+    # scan_file принимает и bytes/mmap (см. engine.py, режим mmap)
+    supports_bytes = True
+
+    def reset(self) -> None:
+        self._by_lang: Dict[str, int] = defaultdict(int)
+        self._total = 0
+
+    def accepts(self, entry: FileEntry) -> bool:
+        return True
+
+    def cache_key(self) -> str:
+        return 'sloc'
+
+    def scan_file(self, entry: FileEntry, content) -> int:
+        return count_sloc(content)
+
+    # --- сканирование окнами (см. windows.py): окна делятся по строкам,
+    #     перекрытие не нужно ---
+
+    def window_overlap(self) -> int:
+        return 0
+
+    def scan_window(self, entry: FileEntry, content, limit: int, skip=None) -> Tuple[int, None]:
+        return count_sloc(content[:limit] if limit < len(content) else content), None
+
+    def join_windows(self, parts: List[Tuple[int, int]]) -> int:
+        return sum(lines for _, lines in parts)
+
+    def collect(self, entry: FileEntry, lines: int) -> None:
+        self._by_lang[entry.lang] += lines
+        self._total += lines
+
+    def finish(self) -> Tuple[Dict[str, int], int]:
+        return dict(self._by_lang), self._total
+
 
 class LanguageAnalyzer:
-    def __init__(self, directory: str):
+    def __init__(self, directory: str, index: FileIndex = None):
         self.directory = directory
+        self.index = index if index is not None else FileIndex(directory)
 
     def detect_languages(self) -> Dict[str, float]:
         """
@@ -17,19 +89,12 @@ class LanguageAnalyzer:
         counter = Counter()
         total_files = 0
 
-        for path, _ in read_files(self.directory):
-            ext = os.path.splitext(path)[1].lower()
-            filename = os.path.basename(path).lower()
-            lang = "Other"
-
-            # Определяем язык по расширению или специальному имени файла
-            for language, exts in LANG_EXTENSIONS.items():
-                exts_lower = [e.lower() for e in exts]
-                if ext in exts_lower or filename in exts_lower:
-                    lang = language
-                    break
-
-            counter[lang] += 1
+        # Язык уже определён при построении индекса (по расширению, имени
+        # файла или shebang); двоичные файлы в распределение не входят
+        for entry in self.index:
+            if entry.kind == BINARY:
+                continue
+            counter[entry.lang] += 1
             total_files += 1
 
         distribution: Dict[str, float] = {}
@@ -44,23 +109,31 @@ class LanguageAnalyzer:
         и возвращает словарь и общее число строк.
         :return: ({"Python": 1024, "Java": 512}, 1536)
         """
-        sloc_counter: Dict[str, int] = defaultdict(int)
-        total_sloc = 0
-
-        for path, content in read_files(self.directory):
-            ext = os.path.splitext(path)[1].lower()
-            filename = os.path.basename(path).lower()
-            lang = "Other"
-
-            for language, exts in LANG_EXTENSIONS.items():
-                exts_lower = [e.lower() for e in exts]
-                if ext in exts_lower or filename in exts_lower:
-                    lang = language
-                    break
-
-            # Считаем непустые строки
-            lines = sum(1 for line in content.splitlines() if line.strip())
-            sloc_counter[lang] += lines
-            total_sloc += lines
-
-        return dict(sloc_counter), total_sloc
+        return run_scan(self.index, [SlocCounter()])[0]
+
+    def analyze(self) -> Tuple[Dict[str, float], Tuple[Dict[str, int], int]]:
+        """
+        Распределение языков и SLOC: языки — по индексу без чтения файлов,
+        строки — одним чтением каждого текстового файла.
+        :return: ({"Python": 45.5, ...}, ({"Python": 1024, ...}, 1536))
+        """
+        return self.detect_languages(), self.count_sloc()
+
+    def skipped_files(self) -> Dict[str, Any]:
+        """
+        Файлы, не анализируемые по содержимому:
+        двоичные — числом и суммарным размером, слишком большие — списком.
+        :return: {"binary": {"files": 12, "bytes": 40960}, "oversized": [{"file": ..., "size": ...}]}
+        """
+        binary_files = binary_bytes = 0
+        oversized = []
+        for entry in self.index:
+            if entry.kind == BINARY:
+                binary_files += 1
+                binary_bytes += entry.size
+            elif entry.kind == OVERSIZED:
+                oversized.append({'file': entry.rel, 'size': entry.size})
+        return {
+            'binary':    {'files': binary_files, 'bytes': binary_bytes},
+            'oversized': oversized,
+        }
@@ -1,18 +1,139 @@
 from typing import Any, Dict
 import json
+import sys
+
+from ..findings import FindingTable
+
+
+def json_default(obj: Any) -> Any:
+    """Параметр default для json.dumps результатов анализа (отчёт, служба)."""
+    # множества технологий — отсортированными списками: отчёт детерминирован
+    # и может служить базовым для режима --diff
+    if isinstance(obj, (set, frozenset)):
+        return sorted(obj)
+    # компактные находки разворачиваются в словари только здесь, при выводе
+    if isinstance(obj, FindingTable):
+        return list(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+# Находки, которые формат ndjson выводит отдельными записями:
+# (ключ результатов, тип записи, преобразование элемента в запись)
+_STREAMED = (
+    ('endpoints',      'endpoint', dict),
+    ('ajax',           'ajax',     dict),
+    ('headers',        'header',   dict),
+    ('config_secrets', 'secret',   lambda item: {'file': item[0], 'values': item[1]}),
+    ('secrets',        'secret',   lambda item: {'file': item[0], 'values': item[1]}),
+)
+
+def finding_counts(results: Dict[str, Any]) -> Dict[str, int]:
+    """Число находок по типам записей ndjson (как в counts итоговой записи summary)."""
+    counts: Dict[str, int] = {}
+    for key, kind, _ in _STREAMED:
+        found = len(results.get(key) or [])
+        if found:
+            counts[kind] = counts.get(kind, 0) + found
+    return counts
+
+
+def _evidence_label(item: Dict[str, Any]) -> str:
+    """Признак технологии (см. StackAnalyzer._evidence) одной строкой."""
+    source, path = item['source'], item.get('path') or ''
+    if source == 'code':
+        return f"{path}:{item['line']}"
+    if source == 'dependency':
+        return f"зависимость в {path}"
+    if source == 'config':
+        return f"конфиг {path}"
+    if 'match' in item:
+        return f"{path}: {item['match']}"
+    return path + ('/' if source == 'dir' else '')
+
+
+# Типы записей ndjson для разделов отчёта --diff
+_DIFF_RECORDS = (('endpoints', 'endpoint'), ('ajax', 'ajax'),
+                 ('secrets', 'secret'), ('technologies', 'technology'))
+
 
 class ReportGenerator:
     def __init__(self, output_format: str = 'console'):
         self.output_format = output_format
+        self.counts: Dict[str, int] = {}
+
+    @property
+    def streaming(self) -> bool:
+        """Формат ndjson: находки выводятся по мере поиска (см. record)."""
+        return self.output_format == 'ndjson'
+
+    def record(self, kind: str, data: Dict[str, Any]) -> None:
+        """
+        Одна запись ndjson — одна находка: {"type": kind, ...поля находки}.
+        Выводится сразу, чтобы потребитель мог обрабатывать поток до конца анализа.
+        """
+        self.counts[kind] = self.counts.get(kind, 0) + 1
+        sys.stdout.write(json.dumps({'type': kind, **data}, ensure_ascii=False,
+                                    default=json_default) + '\n')
+        sys.stdout.flush()
 
     def generate(self, results: Dict[str, Any]) -> None:
         if self.output_format == 'console':
             self._to_console(results)
         elif self.output_format == 'json':
-            print(json.dumps(results, indent=2, ensure_ascii=False))
+            print(json.dumps(results, indent=2, ensure_ascii=False, default=json_default))
+        elif self.output_format == 'ndjson':
+            self._to_ndjson(results)
         elif self.output_format == 'html':
             self._to_html(results)
 
+    def _to_ndjson(self, results: Dict[str, Any]) -> None:
+        """
+        Находки, ещё не выведенные потоком, — отдельными записями, затем
+        итоговая запись "summary": остальные результаты и число записей по типам.
+        """
+        summary = dict(results)
+        for key, kind, convert in _STREAMED:
+            for item in summary.pop(key, None) or []:
+                self.record(kind, convert(item))
+        summary['counts'] = dict(self.counts)
+        print(json.dumps({'type': 'summary', **summary}, ensure_ascii=False, default=json_default))
+
+    def generate_diff(self, changes: Dict[str, Any]) -> None:
+        """Отчёт режима --diff: добавленные и удалённые находки."""
+        if self.output_format == 'json':
+            print(json.dumps(changes, indent=2, ensure_ascii=False, default=json_default))
+            return
+        if self.output_format == 'ndjson':
+            for key, kind in _DIFF_RECORDS:
+                section = changes.get(key, {})
+                for change in ('added', 'removed'):
+                    for item in section.get(change, []):
+                        self.record(kind, {'change': change, **item})
+            print(json.dumps({'type': 'summary', 'changed_files': changes.get('changed_files', 0),
+                              'counts': dict(self.counts)}, ensure_ascii=False))
+            return
+
+        print(f"=== ИЗМЕНЁННЫЕ ФАЙЛЫ: {changes.get('changed_files', 0)} ===")
+        sections = [
+            ('endpoints',    "API ЭНДПОИНТЫ",
+             lambda ep: f"{ep['file']}:{ep.get('line', '?')}  {(ep.get('method') or '').upper():<6} "
+                        f"{ep.get('framework') or '':<10} {ep.get('endpoint')}"),
+            ('ajax',         "AJAX-ЗАПРОСЫ",
+             lambda call: f"{call['file']}:{call.get('line', '?')} -> {call.get('call')}"),
+            ('secrets',      "СЕКРЕТЫ",
+             lambda secret: f"{secret['file']}: {secret['value']}"),
+            ('technologies', "ТЕХНОЛОГИИ",
+             lambda tech: f"{tech['category'].capitalize()}: {tech['tech']}"),
+        ]
+        for key, title, fmt in sections:
+            section = changes.get(key, {})
+            added, removed = section.get('added', []), section.get('removed', [])
+            print(f"=== {title}: +{len(added)} / -{len(removed)} ===")
+            for item in added:
+                print(f"  + {fmt(item)}")
+            for item in removed:
+                print(f"  - {fmt(item)}")
+
     def _to_console(self, results: Dict[str, Any]) -> None:
         from collections import defaultdict
         from ..utils import format_path
@@ -31,15 +152,27 @@ class ReportGenerator:
         for lang, count in by_lang.items():
             print(f"- {lang}: {count} строк")
 
-        # Технологический стек
+        # Файлы, не анализируемые по содержимому
+        binary = results.get('binary') or {}
+        if binary.get('files'):
+            print(f"=== ДВОИЧНЫЕ ФАЙЛЫ: {binary['files']} ({binary.get('bytes', 0)} байт) ===")
+        oversized = results.get('oversized') or []
+        if oversized:
+            print(f"=== СЛИШКОМ БОЛЬШИЕ ФАЙЛЫ: {len(oversized)} ===")
+            for item in oversized:
+                print(f"- {item['file']}: {item['size']} байт")
+
+        # Технологический стек и чем подтверждена каждая технология
         stack = results.get('stack', {}) or {}
+        evidence = results.get('stack_evidence') or {}
         print("=== ТЕХНОЛОГИЧЕСКИЙ СТЕК ===")
         for category, techs in stack.items():
             if techs:
                 title = category.capitalize()
                 print(f"{title}:")
                 for tech in techs:
-                    print(f"  - {tech}")
+                    found = '; '.join(map(_evidence_label, evidence.get(tech) or []))
+                    print(f"  - {tech}" + (f" ({found})" if found else ""))
 
         # Зависимости
         deps = results.get('dependencies', {})
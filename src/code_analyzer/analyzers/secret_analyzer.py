@@ -1,14 +1,20 @@
 from typing import List, Tuple
-import fnmatch
-from ..patterns import PASSWORD_PATTERN
+from ..detectors.secret_detector import SecretDetector
+from ..file_index import FileIndex
 
 class SecretAnalyzer:
-    def __init__(self, directory: str):
+    def __init__(self, directory: str, index: FileIndex = None):
         self.directory = directory
+        # Сканер для общего прохода движка (см. cli.analyze)
+        self.detector = SecretDetector(directory, index=index)
 
-    def find_secrets(self) -> List[Tuple[str, List[str]]]:
+    def find_secrets(self, scanned: bool = False) -> List[Tuple[str, List[str]]]:
         """
-        Ищет в конфигурационных файлах потенциальные пароли, токены и ключи.
+        Ищет во всех текстовых файлах проекта потенциальные пароли, токены и ключи.
+        scanned=True — detector уже отработал в общем проходе движка,
+        повторно дерево не сканируется.
         :return: список кортежей (путь_к_файлу, [список совпадений])
         """
-        pass
+        if not scanned:
+            return self.detector.detect()
+        return self.detector.secrets
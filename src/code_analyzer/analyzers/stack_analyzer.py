@@ -1,54 +1,158 @@
-from typing import Dict, Set
 import os
-from ..patterns import TECHNOLOGY_DETECTORS, TECHNOLOGIES_BY_LANG, JS_TECH_DETECTION 
+from typing import Any, Dict, List, Set, Tuple
+from ..patterns import TECHNOLOGY_DETECTORS, TECHNOLOGIES_BY_LANG, JS_TECH_DETECTION
 from ..detectors.base import Detector
-from ..detectors import FileDetector, CodeDetector
+from ..detectors import FileDetector, CodeDetector, FusedCodeDetector
+from ..file_index import FileIndex
+
+# Сколько признаков подтверждают технологию: остальные её признаки не проверяются
+EVIDENCE_THRESHOLD = 1
+
+# Оценка стоимости признаков: наличие пути — поиск в индексе путей,
+# шаблон имени или glob — проход по именам, содержимое — чтение манифеста,
+# кодовое правило — просмотр всех исходников в общем проходе
+COST_PATH, COST_NAME, COST_CONTENT, COST_CODE = 0, 1, 2, 3
+
+# Категории TECHNOLOGIES_BY_LANG -> категории результата
+CATEGORY_MAP = {
+    'frameworks': 'backend',
+    'frontend': 'frontend',
+    'databases': 'database',
+    'build_tools': 'build_tools',
+    'test_frameworks': 'testing',
+    'devops': 'devops'
+}
+
+
+def evidence_cost(det: Detector) -> int:
+    """Оценка стоимости проверки признака (COST_*)."""
+    if not isinstance(det, FileDetector):
+        return COST_CODE
+    cost = COST_PATH
+    for cfg in det.configs:
+        if 'content' in cfg:
+            cost = max(cost, COST_CONTENT)
+        elif 'pattern' in cfg or any(ch in cfg.get('path', '') for ch in '*?['):
+            cost = max(cost, COST_NAME)
+    return cost
+
 
 class StackAnalyzer:
-    def __init__(self, directory: str, main_lang: str):
+    """
+    План обнаружения технологий: признаки каждой технологии упорядочены по
+    стоимости (пути, затем содержимое манифестов, затем кодовые правила),
+    проверка технологии прекращается, как только набрано EVIDENCE_THRESHOLD
+    признаков. Структурные признаки проверяются до общего прохода, и
+    кодовые правила подтверждённых ими технологий в него не попадают.
+    """
+
+    def __init__(self, directory: str, main_lang: str, index: FileIndex = None,
+                 threshold: int = EVIDENCE_THRESHOLD):
         self.directory = directory
         self.main_lang = main_lang
-        self.detectors = [] 
+        self.index = index if index is not None else FileIndex(directory)
+        self.threshold = threshold
+        # (категория результата, технология, признаки по возрастанию стоимости)
+        self.detectors: List[Tuple[str, str, List[Detector]]] = []
+        self.code_matcher: FusedCodeDetector = None
+        # {технология: [признак, ...]} — чем подтверждена (см. _evidence)
+        self.evidence: Dict[str, List[Dict[str, Any]]] = {}
 
-    def prepare_detectors(self):
+    def prepare_detectors(self, structure: bool = True):
         """
-        Сначала добавляем детекторы из JS_TECH_DETECTION для JS/TS-проектов,
-        затем — общие технологии из TECHNOLOGY_DETECTORS.
+        Сначала собираем признаки из JS_TECH_DETECTION для проектов с package.json,
+        затем — общие технологии из TECHNOLOGY_DETECTORS, по одной записи плана
+        на технологию. structure=True — сразу проверяем структурные признаки;
+        structure=False — только кодовые (режим --diff: дерево целиком не
+        просматривается).
         """
-        # ——— Новый блок для JS/TS ———
-        pkg_json = os.path.join(self.directory, "package.json")
-        if os.path.exists(pkg_json):
+        plan: Dict[str, Tuple[str, List[Detector]]] = {}
+
+        def add(category: str, tech: str, instances: List[Detector]) -> None:
+            plan.setdefault(tech, (category, []))[1].extend(instances)
+
+        # ——— Новый блок для JS/TS: пакеты в зависимостях package.json ———
+        if self.index.get("package.json") is not None:
             for tech, info in JS_TECH_DETECTION.items():
                 # категория: frontend / backend / database
                 cat = 'frontend' if info['type']=='frontend' else 'backend' if info['type']=='backend' else 'database'
-                # конфиг для FileDetector — паттерн найдёт package.json
-                cfg = {
-                    'type':   'file',
-                    'pattern': r'"(?:' + '|'.join(info['packages']) + r')"'
-                }
-                self.detectors.append((cat, tech, [FileDetector(self.directory, [cfg])]))
+                configs = [{'type': 'file', 'path': 'package.json', 'content': f'"{pkg}":'}
+                           for pkg in info['packages']]
+                add(cat, tech, [FileDetector(self.directory, configs, self.index)])
 
         # ——— Существующий код для остальных технологий ———
         lang_techs = TECHNOLOGIES_BY_LANG.get(self.main_lang, {})
         for category_key, tech_list in lang_techs.items():
             for tech in tech_list:
                 configs = TECHNOLOGY_DETECTORS.get(tech, [])
-                if not configs:
-                    continue
                 instances = []
                 for cfg in configs:
                     t = cfg.get('type')
                     if t in ('file', 'dir'):
-                        instances.append(FileDetector(self.directory, [cfg]))
+                        instances.append(FileDetector(self.directory, [cfg], self.index))
                     elif t == 'code':
-                        instances.append(CodeDetector(self.directory, cfg['pattern']))
+                        instances.append(CodeDetector(self.directory, cfg['pattern'], self.index))
                 if instances:
-                    self.detectors.append((category_key, tech, instances))
+                    add(CATEGORY_MAP.get(category_key, category_key), tech, instances)
+
+        # sorted устойчив: при равной стоимости — порядок каталога
+        self.detectors = [(category, tech, sorted(instances, key=evidence_cost))
+                          for tech, (category, instances) in plan.items()]
+        self.evidence = {}
+        if structure:
+            self._check_structure()
+
+        # Кодовые правила неподтверждённых технологий — в одно объединённое
+        # выражение, один проход по файлам
+        rules = [(tech, det) for _, tech, instances in self.detectors
+                 if len(self.evidence.get(tech, ())) < self.threshold
+                 for det in instances if isinstance(det, CodeDetector)]
+        self.code_matcher = FusedCodeDetector(self.directory, rules, self.index)
+
+    def _check_structure(self) -> None:
+        """Структурные признаки по возрастанию стоимости, до порога по технологии."""
+        for _, tech, instances in self.detectors:
+            for det in instances:
+                if isinstance(det, CodeDetector):
+                    break   # дальше только кодовые правила
+                try:
+                    found, matches = det.detect(first=True)
+                except Exception:
+                    continue
+                if found:
+                    self._confirm(tech, det, matches[0])
+                    if len(self.evidence[tech]) >= self.threshold:
+                        break
+
+    def _confirm(self, tech: str, det: Detector, match: Tuple) -> None:
+        self.evidence.setdefault(tech, []).append(self._evidence(det, match))
+
+    def _evidence(self, det: Detector, match: Tuple) -> Dict[str, Any]:
+        """
+        Признак в отчёте: {'source': 'file' | 'dir' | 'code', 'path': отн. путь,
+        'line': номер строки (code), 'match': найденный текст (code и содержимое)}.
+        """
+        if isinstance(det, CodeDetector):
+            path, lineno, text = match
+            return {'source': 'code', 'path': os.path.relpath(path, self.directory),
+                    'line': lineno, 'match': text}
+        full, content = match
+        rel = os.path.relpath(full, self.directory)
+        evidence = {'source': self.index.path_index().kind(rel), 'path': rel}
+        if content is not None:
+            evidence['match'] = content
+        return evidence
 
-    def analyze_stack(self) -> Dict[str, Set[str]]:
+    def analyze_stack(self, scanned: bool = False) -> Dict[str, Set[str]]:
         """
-        Запускает детекторы и возвращает найденные технологии по категориям.
+        Добирает кодовые признаки неподтверждённых технологий и возвращает
+        найденные технологии по категориям; чем подтверждена каждая — в evidence.
+        scanned=True — code_matcher уже отработал в общем проходе движка,
+        повторно дерево не сканируется.
         """
+        if not scanned:
+            self.code_matcher.detect()
+
         result = {
             'backend': set(),
             'frontend': set(),
@@ -57,23 +161,14 @@ class StackAnalyzer:
             'testing': set(),
             'devops': set()
         }
-        category_map = {
-            'frameworks': 'backend',
-            'frontend': 'frontend',
-            'databases': 'database',
-            'build_tools': 'build_tools',
-            'test_frameworks': 'testing',
-            'devops': 'devops'
-        }
-        for category_key, tech, instances in self.detectors:
-            mapped = category_map.get(category_key, category_key)
+        for category, tech, instances in self.detectors:
             for det in instances:
-                try:
-                    detected = det.detect()
-                except Exception:
-                    continue
-                found = bool(detected[0]) if isinstance(detected, tuple) else bool(detected)
-                if found:
-                    result[mapped].add(tech)
+                if len(self.evidence.get(tech, ())) >= self.threshold:
                     break
+                if isinstance(det, CodeDetector) and det.matches:
+                    self._confirm(tech, det, det.matches[0])
+            if len(self.evidence.get(tech, ())) >= self.threshold:
+                result.setdefault(category, set()).add(tech)
+            else:
+                self.evidence.pop(tech, None)
         return result
@@ -0,0 +1,359 @@
+"""
+Аудит каталога шаблонов на катастрофический бэктрекинг.
+
+    python -m code_analyzer.audit                  # весь каталог
+    python -m code_analyzer.audit --match Ktor     # шаблоны с подстрокой в подписи
+    python -m code_analyzer.audit --json audit.json
+
+Проверяются шаблоны, которые применяются к содержимому файлов:
+ENDPOINT_PATTERNS, HEADER_PATTERNS, AJAX_PATTERN_EXT, PASSWORD_PATTERN,
+SECRET_PATTERNS, кодовые правила TECHNOLOGY_DETECTORS и объединённое
+выражение стека из всех правил (см. FusedCodeDetector). Фильтры путей
+(ENDPOINT_IGNORE_FILE_PATTERNS) видят только короткие строки и не проверяются.
+
+Худшие входы строятся из дерева разбора шаблона — для каждой альтернативы:
+  - «префикс k»: начало шаблона до k-го элемента, повторённое много раз, —
+    каждое вхождение начинает попытку совпадения, которая не завершается
+    (незакрытое «routing {», «fetch('…» без кавычки и т.п.);
+  - «повтор k»: начало шаблона и затем тело k-го квантификатора без конца —
+    одна длинная попытка, а у вложенных квантификаторов — перебор разбиений.
+Время finditer (как в сканерах) замеряется на входах растущего размера;
+показатель роста — наклон log(время) от log(размер) по последним точкам.
+Класс сложности шаблона — худший по всем входам: O(n), O(n^2), O(n^3)…
+или O(2^n), если замер не уложился в --timeout.
+
+Замеры идут в отдельном процессе: зависший на экспоненциальном шаблоне
+поиск re не прерывается изнутри, процесс завершается по таймауту.
+Код возврата 1, если найден хотя бы один шаблон с ростом выше линейного.
+"""
+import argparse
+import json
+import math
+import multiprocessing
+import re
+import sys
+import time
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from .patterns import catalog
+
+try:  # Python 3.11+
+    from re import _parser as sre_parse
+except ImportError:  # pragma: no cover
+    import sre_parse
+
+# Размеры входов: от MIN_SIZE символов удвоением до --max-size
+MIN_SIZE = 256
+DEFAULT_MAX_SIZE = 64 * 1024
+# Один замер дольше этого — больший размер не пробуется (рост уже виден)
+DEFAULT_BUDGET = 0.2
+# Вход, не уложившийся в это время, считается экспоненциальным
+DEFAULT_TIMEOUT = 10.0
+# Замер короче этого повторяется: время отдельного прогона — шум таймера
+MIN_SAMPLE = 0.002
+# Наклон ниже этого — линейный рост (запас на шум и кэши)
+LINEAR_SLOPE = 1.5
+# Локальный наклон выше этого — экспоненциальный рост
+EXPONENTIAL_SLOPE = 4.5
+# Точек (с конца) для оценки наклона
+FIT_POINTS = 3
+
+_REPEATS = {'MAX_REPEAT', 'MIN_REPEAT', 'POSSESSIVE_REPEAT'}
+# Символы, из которых подбирается представитель класса ([^"'], \s, \w…)
+_CANDIDATES = 'a_0x /.-:;,=(){}<>"\'\n'
+_CATEGORIES = {
+    'CATEGORY_DIGIT':         lambda c: c.isdigit(),
+    'CATEGORY_NOT_DIGIT':     lambda c: not c.isdigit(),
+    'CATEGORY_SPACE':         lambda c: c.isspace(),
+    'CATEGORY_NOT_SPACE':     lambda c: not c.isspace(),
+    'CATEGORY_WORD':          lambda c: c.isalnum() or c == '_',
+    'CATEGORY_NOT_WORD':      lambda c: not (c.isalnum() or c == '_'),
+    'CATEGORY_LINEBREAK':     lambda c: c == '\n',
+    'CATEGORY_NOT_LINEBREAK': lambda c: c != '\n',
+}
+
+# Атака: (название, голова, звено) — вход = голова + звено * k
+Attack = Tuple[str, str, str]
+
+
+# --- каталог ---
+
+def _targets() -> List[Tuple[str, re.Pattern]]:
+    """Каталог и объединённое выражение стека из всех кодовых правил."""
+    from .detectors.code_detector import CodeDetector, FusedCodeDetector
+
+    targets = catalog()
+    rules = [(label, CodeDetector('.', regex)) for label, regex in targets if label.startswith('stack ')]
+    fused = FusedCodeDetector('.', rules)._fused
+    if fused is not None:
+        targets.append((f'stack: объединённое выражение ({len(rules)} правил)', fused))
+    return targets
+
+
+# --- построение входов ---
+
+def _in_class(ch: str, items) -> bool:
+    negate = False
+    found = False
+    for op, av in items:
+        name = str(op)
+        if name == 'NEGATE':
+            negate = True
+        elif name == 'LITERAL':
+            found |= ch == chr(av)
+        elif name == 'RANGE':
+            found |= av[0] <= ord(ch) <= av[1]
+        elif name == 'CATEGORY':
+            found |= _CATEGORIES.get(str(av), lambda c: False)(ch)
+    return found != negate
+
+
+def _char(op, av) -> str:
+    """Один символ, подходящий под односимвольный элемент."""
+    name = str(op)
+    if name == 'LITERAL':
+        return chr(av)
+    if name == 'NOT_LITERAL':
+        return next(c for c in _CANDIDATES if c != chr(av))
+    if name == 'IN':
+        return next((c for c in _CANDIDATES if _in_class(c, av)), 'a')
+    return 'a'   # ANY
+
+
+def _sample(seq, first: bool = False) -> str:
+    """
+    Короткая строка, подходящая под последовательность (по возможности):
+    квантификатор даёт минимум повторов, first=True — последний элемент
+    хотя бы один раз (чтобы звено атаки не было пустым).
+    """
+    out = []
+    items = list(seq)
+    for i, (op, av) in enumerate(items):
+        name = str(op)
+        if name in ('LITERAL', 'NOT_LITERAL', 'IN', 'ANY'):
+            out.append(_char(op, av))
+        elif name == 'SUBPATTERN':
+            out.append(_sample(av[-1], first and i == len(items) - 1))
+        elif name == 'ATOMIC_GROUP':
+            out.append(_sample(av, first and i == len(items) - 1))
+        elif name == 'BRANCH':
+            out.append(_sample(av[1][0]))
+        elif name in _REPEATS:
+            lo, _, item = av
+            times = max(lo, 1) if first and i == len(items) - 1 else lo
+            out.append(_sample(item) * min(times, 16))
+        # AT, ASSERT, ASSERT_NOT, GROUPREF… — пустая строка
+    return ''.join(out)
+
+
+def _alternatives(seq, name: str = '') -> Iterator[Tuple[str, list]]:
+    """Последовательности для атак: шаблон целиком или каждая его альтернатива."""
+    items = list(seq)
+    if len(items) == 1:
+        op, av = items[0]
+        if str(op) == 'SUBPATTERN':
+            yield from _alternatives(av[-1], name)
+            return
+        if str(op) == 'BRANCH':
+            for i, alternative in enumerate(av[1]):
+                yield from _alternatives(alternative, f'{name}альт. {i}: ')
+            return
+    yield name, items
+
+
+def attacks(pattern: re.Pattern) -> List[Attack]:
+    """Худшие входы для шаблона (см. описание модуля), без повторов."""
+    seen = set()
+    result: List[Attack] = []
+
+    def add(name: str, head: str, unit: str) -> None:
+        if unit and (head, unit) not in seen:
+            seen.add((head, unit))
+            result.append((name, head, unit))
+
+    tree = sre_parse.parse(pattern.pattern, pattern.flags)
+    for prefix, items in _alternatives(tree):
+        for k, (op, av) in enumerate(items, start=1):
+            repeat = str(op) in _REPEATS
+            # префикс: обрываем после квантификаторов и перед последним элементом
+            if repeat or k >= len(items) - 1:
+                add(f'{prefix}префикс {k}', '', _sample(items[:k], first=True))
+            if repeat:
+                add(f'{prefix}повтор {k}', _sample(items[:k - 1]), _sample(av[2], first=True))
+    return result
+
+
+# --- замеры (в рабочем процессе) ---
+
+def _time(pattern: re.Pattern, text: str, budget: float) -> float:
+    """Лучшее время полного прохода finditer по text."""
+    best, total, runs = float('inf'), 0.0, 0
+    while (runs < 3 and total < budget) or (total < MIN_SAMPLE and runs < 1000):
+        start = time.perf_counter()
+        for _ in pattern.finditer(text):
+            pass
+        elapsed = time.perf_counter() - start
+        best = min(best, elapsed)
+        total += elapsed
+        runs += 1
+    return best
+
+
+def _measure(source: str, flags: int, head: str, unit: str,
+             max_size: int, budget: float) -> List[Tuple[int, float]]:
+    """Точки (размер входа, секунды) для атаки; рост прекращается по budget."""
+    pattern = re.compile(source, flags)
+    points = []
+    size = MIN_SIZE
+    while size <= max_size:
+        text = head + unit * max(size // len(unit), 1)
+        seconds = _time(pattern, text, budget)
+        points.append((len(text), seconds))
+        if seconds > budget:
+            break
+        size *= 2
+    return points
+
+
+def _slope(points: Sequence[Tuple[int, float]]) -> float:
+    """Наклон log(время) от log(размер) методом наименьших квадратов."""
+    xs = [math.log(n) for n, _ in points]
+    ys = [math.log(max(t, 1e-9)) for _, t in points]
+    mx, my = sum(xs) / len(xs), sum(ys) / len(ys)
+    var = sum((x - mx) ** 2 for x in xs)
+    return sum((x - mx) * (y - my) for x, y in zip(xs, ys)) / var if var else 0.0
+
+
+def classify(points: Sequence[Tuple[int, float]], timed_out: bool = False) -> Tuple[str, float]:
+    """Класс сложности и показатель роста по точкам замера."""
+    if timed_out:
+        return 'O(2^n)', math.inf
+    if len(points) < 2:
+        return 'O(n)', 1.0
+    exponent = _slope(points[-FIT_POINTS:])
+    local = _slope(points[-2:])
+    if local > EXPONENTIAL_SLOPE:
+        return 'O(2^n)', exponent
+    if exponent < LINEAR_SLOPE:
+        return 'O(n)', exponent
+    return f'O(n^{round(exponent)})', exponent
+
+
+class Auditor:
+    """Замеры атак в рабочем процессе, который перезапускается после таймаута."""
+
+    def __init__(self, max_size: int = DEFAULT_MAX_SIZE, budget: float = DEFAULT_BUDGET,
+                 timeout: float = DEFAULT_TIMEOUT):
+        self.max_size = max_size
+        self.budget = budget
+        self.timeout = timeout
+        self._pool = None
+
+    def close(self) -> None:
+        if self._pool is not None:
+            self._pool.terminate()
+            self._pool = None
+
+    def _run(self, pattern: re.Pattern, head: str, unit: str) -> Optional[List[Tuple[int, float]]]:
+        """Точки замера или None, если замер не уложился в таймаут."""
+        if self._pool is None:
+            self._pool = multiprocessing.Pool(1)
+        job = self._pool.apply_async(_measure, (pattern.pattern, pattern.flags, head, unit,
+                                                self.max_size, self.budget))
+        try:
+            return job.get(self.timeout)
+        except multiprocessing.TimeoutError:
+            self.close()
+            return None
+
+    def audit(self, label: str, pattern: re.Pattern) -> Dict[str, Any]:
+        """
+        Худший результат по всем атакам на шаблон. Шаблон без элементов
+        (например, verbose-шаблон, целиком ставший комментарием) атак не
+        даёт: показатель и атака — None.
+        """
+        worst: Dict[str, Any] = {'class': 'O(n)', 'exponent': -math.inf}
+        for name, head, unit in attacks(pattern):
+            points = self._run(pattern, head, unit)
+            complexity, exponent = classify(points or [], timed_out=points is None)
+            if exponent > worst['exponent']:
+                worst = {
+                    'class':    complexity,
+                    'exponent': exponent,
+                    'attack':   name,
+                    'input':    (head + unit * 3)[:80],
+                    'size':     points[-1][0] if points else None,
+                    'seconds':  round(points[-1][1], 4) if points else None,
+                }
+            if points is None:
+                break   # хуже не будет
+        return {
+            'pattern':     label,
+            'source':      pattern.pattern,
+            'class':       worst['class'],
+            'exponent':    None if math.isinf(worst['exponent']) else round(worst['exponent'], 2),
+            'superlinear': worst['class'] != 'O(n)',
+            'attack':      worst.get('attack'),
+            'input':       worst.get('input'),
+            'size':        worst.get('size'),
+            'seconds':     worst.get('seconds'),
+        }
+
+
+def _print(results: List[Dict[str, Any]], out=None) -> None:
+    out = out or sys.stdout
+    print(f"{'шаблон':<52} {'класс':<8} {'рост':>6} {'размер':>8} {'с':>8}  атака", file=out)
+    for r in results:
+        exponent = '—' if r['exponent'] is None else f"{r['exponent']:.2f}"
+        size = '' if r['size'] is None else r['size']
+        seconds = '' if r['seconds'] is None else f"{r['seconds']:.3f}"
+        mark = '!' if r['superlinear'] else ' '
+        print(f"{mark}{r['pattern'][:51]:<51} {r['class']:<8} {exponent:>6} {size:>8} {seconds:>8}  "
+              f"{r['attack'] or ''}", file=out)
+        if r['superlinear']:
+            print(f"    вход: {r['input']!r}", file=out)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='Аудит каталога шаблонов на катастрофический бэктрекинг')
+    parser.add_argument('--match', help='Только шаблоны, в подписи которых есть эта подстрока')
+    parser.add_argument('--max-size', type=int, default=DEFAULT_MAX_SIZE,
+                        help=f'Наибольший размер входа в символах (по умолчанию {DEFAULT_MAX_SIZE})')
+    parser.add_argument('--budget', type=float, default=DEFAULT_BUDGET,
+                        help=f'Замер дольше стольких секунд завершает рост входа (по умолчанию {DEFAULT_BUDGET})')
+    parser.add_argument('--timeout', type=float, default=DEFAULT_TIMEOUT,
+                        help=f'Замер дольше стольких секунд — экспоненциальный рост (по умолчанию {DEFAULT_TIMEOUT:g})')
+    parser.add_argument('--json', help='Сохранить результаты в JSON')
+    args = parser.parse_args(argv)
+    if args.max_size < MIN_SIZE:
+        parser.error(f'--max-size должен быть не меньше {MIN_SIZE}')
+    if args.budget <= 0 or args.timeout <= 0:
+        parser.error('--budget и --timeout должны быть положительными')
+
+    targets = [(label, regex) for label, regex in _targets()
+               if args.match is None or args.match.lower() in label.lower()]
+    if not targets:
+        parser.error(f'нет шаблонов с подписью, содержащей {args.match!r}')
+
+    auditor = Auditor(args.max_size, args.budget, args.timeout)
+    try:
+        results = [auditor.audit(label, regex) for label, regex in targets]
+    finally:
+        auditor.close()
+    # сначала не уложившиеся в таймаут, затем по убыванию показателя роста
+    results.sort(key=lambda r: (r['class'] != 'O(2^n)', -(r['exponent'] or 0.0)))
+
+    _print(results)
+    flagged = sum(r['superlinear'] for r in results)
+    print(f"шаблонов: {len(results)}, с ростом выше линейного: {flagged}")
+    if args.json:
+        try:
+            with open(args.json, 'w', encoding='utf-8') as f:
+                json.dump(results, f, indent=2, ensure_ascii=False)
+        except OSError as e:
+            parser.error(f'не удалось записать {args.json}: {e}')
+    return 1 if flagged else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
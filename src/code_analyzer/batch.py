@@ -0,0 +1,344 @@
+"""
+Пакетный режим: анализ многих репозиториев одним запуском.
+
+Манифест — текстовый файл, по пути к репозиторию на строку (пустые строки
+и строки с # пропускаются, относительные пути — от каталога манифеста).
+Репозитории распределяются по общему пулу рабочих процессов, крупные —
+первыми: оценка размера (байты файлов без игнорируемых каталогов, только
+stat) считается заранее в потоках основного процесса, и самый большой
+проект не оказывается последним в очереди. Каждый процесс импортирует инструмент и разбирает каталоги
+шаблонов один раз (см. prefilter.required_clauses, каталог прогревается
+ещё до запуска пула), а затем анализирует проекты один за другим.
+
+Для каждого репозитория в каталог отчётов пишется свой отчёт, в конце —
+сводка summary.json. Ошибка в одном репозитории записывается в сводку
+и не прерывает пакет; если рабочий процесс погиб (OOM, SIGKILL), пул
+пересоздаётся, а прерванные проекты анализируются заново.
+"""
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import redirect_stdout
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from .analyzers.report_generator import ReportGenerator, finding_counts
+from .cli import analyze, parse_size
+from .engine import resolve_jobs
+from .file_index import DEFAULT_MAX_FILE_SIZE, FileIndex
+from .patterns import IGNORE_DIRS, catalog
+from .prefilter import required_clauses
+from .readahead import DEFAULT_QUEUE_DEPTH
+from .windows import DEFAULT_WINDOW_SIZE
+
+SUMMARY_FILE = 'summary.json'
+# Сколько раз репозиторий может обрушить рабочий процесс, прежде чем
+# считаться ошибкой (процесс убит по OOM, сигналом, упал в расширении)
+MAX_ATTEMPTS = 2
+# Расширение файла отчёта по формату
+REPORT_SUFFIXES = {'console': '.txt', 'json': '.json', 'ndjson': '.ndjson'}
+
+
+def read_manifest(path: str) -> List[str]:
+    """Пути репозиториев из манифеста (абсолютные, без повторов, в порядке файла)."""
+    base = os.path.dirname(os.path.abspath(path))
+    repos: List[str] = []
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            repo = os.path.normpath(os.path.join(base, os.path.expanduser(line)))
+            if repo not in repos:
+                repos.append(repo)
+    return repos
+
+
+def report_name(repo: str, output_format: str) -> str:
+    """Имя файла отчёта: имя каталога и хэш пути — одноимённые проекты не совпадут."""
+    digest = hashlib.sha1(repo.encode('utf-8', 'surrogatepass')).hexdigest()[:8]
+    return f"{os.path.basename(repo) or 'root'}-{digest}{REPORT_SUFFIXES[output_format]}"
+
+
+def estimate_size(repo: str, ignore_dirs: Iterable[str] = IGNORE_DIRS) -> int:
+    """
+    Оценка объёма работы: суммарный размер файлов без игнорируемых каталогов,
+    только по stat — без классификации и чтения. -1 — каталог недоступен.
+    """
+    ignore = frozenset(ignore_dirs or ())
+    if not os.path.isdir(repo):
+        return -1
+    total = 0
+    stack = [repo]
+    while stack:
+        try:
+            with os.scandir(stack.pop()) as it:
+                for item in it:
+                    try:
+                        if item.is_dir(follow_symlinks=False):
+                            if item.name not in ignore:
+                                stack.append(item.path)
+                        elif item.is_file(follow_symlinks=False):
+                            total += item.stat(follow_symlinks=False).st_size
+                    except OSError:
+                        continue
+        except OSError:
+            continue
+    return total
+
+
+def warm_catalogs() -> None:
+    """
+    Разбор всех шаблонов каталога для предфильтров заранее: рабочие
+    процессы, порождённые fork, наследуют готовые условия.
+    """
+    for _, regex in catalog():
+        required_clauses(regex)
+
+
+# Настройки анализа пакета: передаются рабочим процессам один раз при старте пула
+_options: Dict[str, Any] = {}
+
+
+def _init_worker(options: Dict[str, Any]) -> None:
+    global _options
+    _options = options
+
+
+def _analyze_repo(task: Tuple[int, str, int]) -> Dict[str, Any]:
+    """
+    Анализ одного репозитория в рабочем процессе: отчёт пишется во временный
+    файл и переименовывается только после успешной генерации.
+    Возвращает запись сводки; исключение становится записью со статусом error.
+    """
+    position, repo, estimate = task
+    options = _options
+    output = os.path.join(options['out_dir'], report_name(repo, options['format']))
+    record: Dict[str, Any] = {'repo': repo, 'report': None, 'status': 'ok', 'error': None,
+                              'estimate': estimate, 'position': position}
+    started = time.perf_counter()
+    partial = output + '.tmp'
+    try:
+        if not os.path.isdir(repo):
+            raise NotADirectoryError(f'нет каталога: {repo}')
+        index = FileIndex(repo, ignore_dirs=options['ignore_dirs'],
+                          max_file_size=options['max_file_size'])
+        report = ReportGenerator(options['format'])
+        with open(partial, 'w', encoding='utf-8') as f, redirect_stdout(f):
+            results = analyze(repo, index, cache_dir=options['cache_dir'],
+                              use_mmap=options['use_mmap'],
+                              sink=report.record if report.streaming else None,
+                              readers=options['readers'], queue_depth=options['queue_depth'],
+                              window_size=options['window_size'])
+            counts = None if report.streaming else finding_counts(results)
+            report.generate(results)
+        os.replace(partial, output)
+        record.update({
+            'report':    output,
+            'files':     len(index),
+            'bytes':     sum(entry.size for entry in index.scannable()),
+            'sloc':      results['sloc']['total'],
+            'languages': results['languages'],
+            'counts':    dict(report.counts) if counts is None else counts,
+        })
+    except Exception as e:
+        record.update({'status': 'error', 'error': f'{type(e).__name__}: {e}'})
+        try:
+            os.remove(partial)
+        except OSError:
+            pass
+    record['seconds'] = round(time.perf_counter() - started, 3)
+    return record
+
+
+def _executor(workers: int, options: Dict[str, Any]) -> ProcessPoolExecutor:
+    return ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(options,))
+
+
+def _crashed(task: Tuple[int, str, int]) -> Dict[str, Any]:
+    """Запись сводки для репозитория, на котором аварийно завершался рабочий процесс."""
+    position, repo, estimate = task
+    return {'repo': repo, 'report': None, 'status': 'error', 'estimate': estimate,
+            'error': f'BrokenProcessPool: рабочий процесс завершился аварийно ({MAX_ATTEMPTS} раза)',
+            'position': position, 'seconds': 0.0}
+
+
+def run_batch(repos: Sequence[str], out_dir: str, jobs: int = 0, output_format: str = 'json',
+              cache_dir: str = None, ignore_dirs: Iterable[str] = IGNORE_DIRS,
+              max_file_size: int = DEFAULT_MAX_FILE_SIZE, use_mmap: bool = False,
+              readers: int = 0, queue_depth: int = DEFAULT_QUEUE_DEPTH,
+              window_size: int = DEFAULT_WINDOW_SIZE, progress=None) -> Dict[str, Any]:
+    """
+    Анализирует репозитории в пуле из jobs процессов (0 — все ядра), крупные —
+    первыми; каждый проект анализируется одним процессом (readers — потоки
+    упреждающего чтения в нём). progress(done, total, record) вызывается по
+    завершении каждого проекта. Возвращает сводку: записи по репозиториям
+    в порядке манифеста и итоги.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    options = {
+        'out_dir':       out_dir,
+        'format':        output_format,
+        'cache_dir':     cache_dir,
+        'ignore_dirs':   tuple(ignore_dirs or ()),
+        'max_file_size': max_file_size,
+        'use_mmap':      use_mmap,
+        'readers':       readers,
+        'queue_depth':   queue_depth,
+        'window_size':   window_size,
+    }
+    started = time.perf_counter()
+    warm_catalogs()
+    records: List[Dict[str, Any]] = []
+    workers = max(1, min(resolve_jobs(jobs), len(repos)))
+    # оценка — только scandir/stat: потоки, а не пул процессов, чей
+    # процесс может погибнуть ещё до анализа
+    with ThreadPoolExecutor(workers) as threads:
+        estimates = list(threads.map(lambda repo: estimate_size(repo, options['ignore_dirs']), repos))
+    executor = _executor(workers, options)
+    try:
+        # крупные первыми, при равенстве — в порядке манифеста
+        tasks = sorted(((i, repo, size) for i, (repo, size) in enumerate(zip(repos, estimates))),
+                       key=lambda task: (-task[2], task[0]))
+        pending = deque(tasks)
+        attempts: Dict[int, int] = {}
+        # задач в работе не больше, чем процессов: очередь исполнителя не
+        # нарушает порядок по размеру, а при сбое пула страдают только они
+        running: Dict[Future, Tuple[int, str, int]] = {}
+        while pending or running:
+            while pending and len(running) < workers:
+                # повтор после сбоя пула идёт в одиночку: если процесс снова
+                # погибнет, виноват именно этот репозиторий
+                if attempts.get(pending[0][0]) and running:
+                    break
+                task = pending.popleft()
+                running[executor.submit(_analyze_repo, task)] = task
+                if attempts.get(task[0]):
+                    break
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            if any(isinstance(future.exception(), BrokenProcessPool) for future in done):
+                # рабочий процесс убит (OOM, сигнал): пул сломан целиком,
+                # остальные задачи в нём тоже завершатся с BrokenProcessPool
+                done = wait(running)[0]
+            crashed = []
+            for future in done:
+                task = running.pop(future)
+                if isinstance(future.exception(), BrokenProcessPool):
+                    crashed.append(task)
+                    continue
+                records.append(future.result())
+                if progress is not None:
+                    progress(len(records), len(tasks), records[-1])
+            if not crashed:
+                continue
+            executor.shutdown(wait=True)
+            executor = _executor(workers, options)
+            # какая из задач убила процесс, неизвестно: каждая повторяется,
+            # а упавшая MAX_ATTEMPTS раз записывается в сводку как ошибка
+            for task in sorted(crashed, key=lambda task: (task[2], -task[0])):
+                attempts[task[0]] = attempts.get(task[0], 0) + 1
+                if attempts[task[0]] < MAX_ATTEMPTS:
+                    pending.appendleft(task)
+                    continue
+                records.append(_crashed(task))
+                if progress is not None:
+                    progress(len(records), len(tasks), records[-1])
+    finally:
+        executor.shutdown(wait=True)
+    records.sort(key=lambda record: record.pop('position'))
+
+    totals: Dict[str, Any] = {'files': 0, 'bytes': 0, 'sloc': 0, 'counts': {}}
+    for record in records:
+        if record['status'] != 'ok':
+            continue
+        for key in ('files', 'bytes', 'sloc'):
+            totals[key] += record[key]
+        for kind, count in record['counts'].items():
+            totals['counts'][kind] = totals['counts'].get(kind, 0) + count
+    return {
+        'repos':   records,
+        'total':   len(records),
+        'failed':  sum(record['status'] != 'ok' for record in records),
+        'jobs':    workers,
+        'seconds': round(time.perf_counter() - started, 3),
+        'totals':  totals,
+    }
+
+
+def _progress(done: int, total: int, record: Dict[str, Any]) -> None:
+    status = record['status'] if record['error'] is None else record['error']
+    print(f"[{done}/{total}] {record['repo']}: {status} ({record['seconds']:.1f} с)",
+          file=sys.stderr, flush=True)
+
+
+def _print(summary: Dict[str, Any], out=None) -> None:
+    out = out or sys.stdout
+    print(f"{'репозиторий':<48} {'статус':<7} {'файлов':>7} {'SLOC':>9} {'секретов':>9} {'с':>8}", file=out)
+    for record in summary['repos']:
+        if record['status'] == 'ok':
+            print(f"{record['repo'][-48:]:<48} {'ok':<7} {record['files']:>7} {record['sloc']:>9} "
+                  f"{record['counts'].get('secret', 0):>9} {record['seconds']:>8.1f}", file=out)
+        else:
+            print(f"{record['repo'][-48:]:<48} {'ошибка':<7} {record['error']}", file=out)
+    totals = summary['totals']
+    print(f"репозиториев: {summary['total']}, с ошибками: {summary['failed']}, "
+          f"файлов: {totals['files']}, SLOC: {totals['sloc']}, "
+          f"время: {summary['seconds']:.1f} с ({summary['jobs']} процессов)", file=out)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='Пакетный анализ репозиториев по манифесту')
+    parser.add_argument('manifest', help='Файл со списком путей к репозиториям, по одному на строку')
+    parser.add_argument('--out-dir', '-o', required=True,
+                        help=f'Каталог отчётов: по отчёту на репозиторий и сводка {SUMMARY_FILE}')
+    parser.add_argument('--format', choices=sorted(REPORT_SUFFIXES), default='json',
+                        help='Формат отчётов по репозиториям (по умолчанию json)')
+    parser.add_argument('--jobs', '-j', type=int, default=0,
+                        help='Число рабочих процессов; каждый анализирует свой репозиторий (0 — все ядра)')
+    parser.add_argument('--cache-dir', default=None,
+                        help='Каталог постоянного кэша (общий для всех репозиториев)')
+    parser.add_argument('--no-ignore', action='store_true',
+                        help='Анализировать и каталоги зависимостей и сборок')
+    parser.add_argument('--max-file-size', type=parse_size, default=DEFAULT_MAX_FILE_SIZE,
+                        help='Файлы крупнее не анализируются по содержимому (по умолчанию 10M)')
+    parser.add_argument('--window-size', type=parse_size, default=DEFAULT_WINDOW_SIZE,
+                        help='Файлы крупнее сканируются окнами такого размера; совпадение длиннее 64K '
+                             'у границы окна теряется (0 — целиком, по умолчанию 4M)')
+    parser.add_argument('--mmap', action='store_true',
+                        help='Сканировать файлы, отображённые в память, как байты')
+    parser.add_argument('--readers', type=int, default=0,
+                        help='Потоки упреждающего чтения в каждом процессе (по умолчанию 0)')
+    parser.add_argument('--queue-depth', type=int, default=DEFAULT_QUEUE_DEPTH,
+                        help=f'Сколько файлов читается наперёд (по умолчанию {DEFAULT_QUEUE_DEPTH})')
+    args = parser.parse_args(argv)
+    if args.readers < 0 or args.queue_depth < 1:
+        parser.error('--readers должно быть >= 0, --queue-depth — >= 1')
+    try:
+        repos = read_manifest(args.manifest)
+    except (OSError, UnicodeDecodeError) as e:
+        parser.error(f'не удалось прочитать манифест: {e}')
+    if not repos:
+        parser.error(f'в манифесте {args.manifest} нет репозиториев')
+
+    summary = run_batch(repos, args.out_dir, jobs=args.jobs, output_format=args.format,
+                        cache_dir=args.cache_dir, ignore_dirs=() if args.no_ignore else IGNORE_DIRS,
+                        max_file_size=args.max_file_size, use_mmap=args.mmap,
+                        readers=args.readers, queue_depth=args.queue_depth,
+                        window_size=args.window_size, progress=_progress)
+    _print(summary)
+    path = os.path.join(args.out_dir, SUMMARY_FILE)
+    try:
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, indent=2, ensure_ascii=False)
+    except OSError as e:
+        parser.error(f'не удалось записать {path}: {e}')
+    return 1 if summary['failed'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
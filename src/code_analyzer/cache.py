@@ -0,0 +1,145 @@
+"""
+Постоянный инкрементальный кэш находок сканирования.
+
+Для каждого файла хранятся находки каждого сканера (результаты scan_file)
+с ключом по относительному пути. Запись действительна, пока совпадают
+размер и mtime файла; при изменившемся mtime файл перечитывается, и если
+хэш содержимого не изменился — находки берутся из кэша. Повторный запуск
+читает и анализирует только изменённые и новые файлы, а итоговые
+результаты собираются collect()/finish() как при полном проходе.
+
+Находки хранятся под ключом сканера (cache_key()), поэтому смена
+настроек одного сканера (например, основного языка у правил стека)
+не сбрасывает находки остальных. Весь кэш сбрасывается автоматически
+при смене версии инструмента или каталога шаблонов patterns.py.
+"""
+import json
+import os
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from . import __version__, patterns
+from .file_index import FileEntry
+
+# Имя файла кэша строится по абсолютному пути корня проекта:
+# в одном каталоге кэша могут лежать кэши нескольких проектов
+CACHE_SUFFIX = '.sqlite'
+
+# (размер, mtime, хэш содержимого, находки по ключам сканеров)
+CacheRecord = Tuple[int, int, str, Dict[str, Any]]
+
+
+def _sha1(data: bytes):
+    # hashlib (OpenSSL) загружается только при работе с кэшем, не при импорте
+    import hashlib
+    return hashlib.sha1(data)
+
+
+def content_digest(text) -> str:
+    """
+    Хэш содержимого файла в том виде, в котором его видят сканеры:
+    текста (str) или сырых байт (bytes/mmap, режим mmap).
+    """
+    if isinstance(text, str):
+        text = text.encode('utf-8', 'surrogatepass')
+    return _sha1(text).hexdigest()
+
+
+def parts_digest(parts: Iterable[Any]) -> str:
+    """content_digest содержимого, прочитанного по частям (см. windows.py)."""
+    digest = _sha1(b'')
+    for part in parts:
+        digest.update(part.encode('utf-8', 'surrogatepass') if isinstance(part, str) else part)
+    return digest.hexdigest()
+
+
+def catalog_fingerprint() -> str:
+    """Отпечаток версии инструмента и каталога шаблонов."""
+    digest = _sha1(__version__.encode())
+    try:
+        with open(patterns.__file__, 'rb') as f:
+            digest.update(f.read())
+    except OSError:
+        pass
+    return digest.hexdigest()
+
+
+def settings_key(name: str, *settings: Any) -> str:
+    """
+    Ключ находок сканера: имя плюс отпечаток настроек, от которых зависит
+    результат scan_file (например, набор правил).
+    """
+    if not settings:
+        return name
+    return name + ':' + _sha1(repr(settings).encode('utf-8', 'surrogatepass')).hexdigest()[:16]
+
+
+class ScanCache:
+    """Кэш находок одного проекта в SQLite-файле внутри cache_dir."""
+
+    def __init__(self, cache_dir: str, directory: str):
+        os.makedirs(cache_dir, exist_ok=True)
+        root = os.path.abspath(directory)
+        name = _sha1(root.encode('utf-8', 'surrogatepass')).hexdigest()[:16]
+        self.path = os.path.join(cache_dir, name + CACHE_SUFFIX)
+        self.hits = 0
+        self.misses = 0
+        self._updates: Dict[str, Tuple[int, int, str, str]] = {}
+        import sqlite3   # только с --cache-dir: не замедляет обычный запуск
+        self._db = sqlite3.connect(self.path)
+        self._db.execute('CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)')
+        self._db.execute('CREATE TABLE IF NOT EXISTS files ('
+                         'rel TEXT PRIMARY KEY, size INTEGER, mtime INTEGER, '
+                         'digest TEXT, findings TEXT)')
+        fingerprint = catalog_fingerprint()
+        row = self._db.execute("SELECT value FROM meta WHERE key = 'fingerprint'").fetchone()
+        if row is None or row[0] != fingerprint:
+            # сменился каталог или версия — все находки недействительны
+            self._db.execute('DELETE FROM files')
+            self._db.execute("INSERT OR REPLACE INTO meta VALUES ('fingerprint', ?)", (fingerprint,))
+            self._db.commit()
+        self._rows = {rel: (size, mtime, digest, findings) for rel, size, mtime, digest, findings
+                      in self._db.execute('SELECT rel, size, mtime, digest, findings FROM files')}
+
+    def lookup(self, entry: FileEntry) -> Optional[CacheRecord]:
+        """Запись кэша для файла (без проверки актуальности) или None."""
+        row = self._rows.get(entry.rel)
+        if row is None:
+            return None
+        size, mtime, digest, findings = row
+        try:
+            return size, mtime, digest, json.loads(findings)
+        except ValueError:
+            return None
+
+    @staticmethod
+    def is_fresh(entry: FileEntry, record: Optional[CacheRecord]) -> bool:
+        """Запись актуальна без чтения файла: совпали размер и mtime."""
+        return record is not None and record[0] == entry.size and record[1] == entry.mtime
+
+    def store(self, entry: FileEntry, digest: str, findings: Dict[str, Any]) -> None:
+        """Запоминает находки файла; запись на диск — в save()."""
+        self._updates[entry.rel] = (entry.size, entry.mtime, digest,
+                                    json.dumps(findings, ensure_ascii=False))
+
+    def save(self, seen: Optional[Iterable[str]] = None) -> None:
+        """
+        Сохраняет новые записи и удаляет записи файлов, которых больше нет
+        в проекте (seen — относительные пути текущего индекса; None — не удалять).
+        """
+        stale: List[Tuple[str]] = []
+        if seen is not None:
+            seen = set(seen)
+            stale = [(rel,) for rel in self._rows if rel not in seen]
+        with self._db:
+            if stale:
+                self._db.executemany('DELETE FROM files WHERE rel = ?', stale)
+            self._db.executemany(
+                'INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?)',
+                [(rel,) + row for rel, row in self._updates.items()])
+        for (rel,) in stale:
+            del self._rows[rel]
+        self._rows.update(self._updates)
+        self._updates = {}
+
+    def close(self) -> None:
+        self._db.close()
@@ -1,76 +1,150 @@
 import argparse
-from .analyzers.language_analyzer    import LanguageAnalyzer
+import os
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable
+from .analyzers.language_analyzer    import LanguageAnalyzer, SlocCounter
 from .analyzers.stack_analyzer       import StackAnalyzer
 from .analyzers.dependency_analyzer  import DependencyAnalyzer
 from .analyzers.secret_analyzer       import SecretAnalyzer
 from .analyzers.report_generator      import ReportGenerator
+from .detectors.base                  import Sink
 from .detectors.endpoint_detector     import EndpointDetector
 from .detectors.config_detector       import ConfigDetector
 from .detectors.header_detector       import HeaderDetector
-from .patterns                        import CONFIG_PATTERNS, ENDPOINT_PATTERNS
+from .cache                           import ScanCache
+from .engine                          import CancelToken, run_scan
+from .file_index                      import DEFAULT_MAX_FILE_SIZE, FileIndex
+from .profiler                        import Profiler
+from .readahead                       import DEFAULT_QUEUE_DEPTH, DEFAULT_READERS
+from .windows                         import DEFAULT_WINDOW_SIZE
+from .git_diff                        import (MANIFEST_FILES, changed_paths, diff_reports,
+                                              load_baseline, merge_baseline)
+from .patterns                        import CONFIG_PATTERNS, ENDPOINT_PATTERNS, IGNORE_DIRS
 
-def main():
-    parser = argparse.ArgumentParser(description="Анализатор безопасности исходного кода")
-    parser.add_argument('path', help='Путь к корню проекта')
-    parser.add_argument(
-        '--format',
-        choices=['console', 'json', 'html'],
-        default='console',
-        help='Формат вывода отчёта'
-    )
-    args = parser.parse_args()
 
-    # 1) Языки и SLOC
-    lang_analyzer = LanguageAnalyzer(args.path)
-    distro, = lang_analyzer.detect_languages(),  # распределение языков
-    sloc_by_lang, total_sloc = lang_analyzer.count_sloc()
-    main_lang = max(distro, key=distro.get) if distro else None
+@contextmanager
+def _unprofiled(name: str, entries: Iterable = ()):
+    yield
 
-    # 2) Первичный стек по структурам и коду
-    stack_analyzer = StackAnalyzer(args.path, main_lang or "")
-    stack_analyzer.prepare_detectors()
-    tech_stack = stack_analyzer.analyze_stack()
+
+def analyze(path: str, index: FileIndex, jobs: int = 1, cache_dir: str = None,
+            languages: Dict[str, float] = None, structure: bool = True,
+            use_mmap: bool = False, sink: Sink = None, readers: int = 0,
+            queue_depth: int = DEFAULT_QUEUE_DEPTH, profiler: Profiler = None,
+            cancel: CancelToken = None, window_size: int = DEFAULT_WINDOW_SIZE,
+            start_method: str = None) -> Dict[str, Any]:
+    """
+    Полный анализ проекта по индексу файлов; возвращает результаты для ReportGenerator.
+    languages — готовое распределение языков (в режиме --diff — из базового отчёта),
+    structure=False — без проверки структуры каталогов (см. StackAnalyzer.prepare_detectors),
+    use_mmap — общий проход по файлам, отображённым в память (см. engine.py),
+    sink — приёмник потоковых находок: эндпоинты, AJAX, заголовки и секреты
+    (в том числе конфигов) передаются ему по мере сканирования, а в результатах остаются пустыми,
+    readers/queue_depth — упреждающее чтение файлов общего прохода (см. readahead.py),
+    profiler — замер этапов, сканеров и шаблонов (см. profiler.py); общий
+    проход при этом выполняется в текущем процессе,
+    cancel — признак отмены (см. engine.CancelToken): проверяется между этапами
+    и файлами общего прохода, отменённый анализ завершается исключением Cancelled,
+    window_size — файлы крупнее сканируются окнами (см. windows.py: совпадения
+    длиннее windows.MAX_OVERLAP у границы окна теряются; 0 — целиком),
+    start_method — способ запуска процессов пула общего прохода (см. engine.run_scan).
+    """
+    stage = profiler.stage if profiler is not None else _unprofiled
+    check = cancel.check if cancel is not None else lambda: None
+
+    # 1) Языки — только по индексу, без чтения файлов
+    with stage('languages', index):
+        lang_analyzer = LanguageAnalyzer(path, index)
+        distro = languages if languages is not None else lang_analyzer.detect_languages()
+        main_lang = max(distro, key=distro.get) if distro else None
+        skipped = lang_analyzer.skipped_files()
+
+    # 2) План стека: структурные признаки сразу, кодовые правила
+    #    неподтверждённых технологий — в общий проход
+    with stage('stack: prepare'):
+        stack_analyzer = StackAnalyzer(path, main_lang or "", index)
+        stack_analyzer.prepare_detectors(structure=structure)
 
     # 3) Зависимости (из package.json, pom.xml и т.д.)
-    dep_analyzer = DependencyAnalyzer(args.path, main_lang)
-    deps = dep_analyzer.analyze()
+    manifests = (entry for entry in map(index.get, MANIFEST_FILES) if entry is not None)
+    with stage('dependencies', manifests):
+        dep_analyzer = DependencyAnalyzer(path, main_lang, index)
+        deps = dep_analyzer.analyze()
 
-    # 4) Общие секреты
-    secret_analyzer = SecretAnalyzer(args.path)
-    secrets = secret_analyzer.find_secrets()
+    check()
 
-    # 5) Эндпоинты и AJAX
+    # 4) Общий проход по файлам: SLOC, эндпоинты и AJAX, HTTP-заголовки,
+    #    конфиги и секреты в них, кодовые признаки стека, секреты во всех файлах
     active_langs = [lang for lang in distro.keys() if lang in ENDPOINT_PATTERNS]
-    ep_detector = EndpointDetector(args.path, active_langs)
-    ep_res      = ep_detector.detect()
-    endpoints   = ep_res.get('endpoints', [])
-    ajax_calls  = ep_res.get('ajax', [])
-
-    # 6) HTTP-заголовки
-    hdr_detector = HeaderDetector(args.path, active_langs)
-    headers_info = hdr_detector.detect()
-    # 7) Конфиги и секреты в них
-    config_detector = ConfigDetector(args.path, CONFIG_PATTERNS)
-    configs         = config_detector.detect()
-    config_secrets  = config_detector.secrets
-
-    # 8) Сливаем зависимостями и конфига в единый tech_stack
+    ep_detector     = EndpointDetector(path, active_langs, index)
+    hdr_detector    = HeaderDetector(path, active_langs, index)
+    config_detector = ConfigDetector(path, CONFIG_PATTERNS, index)
+    secret_analyzer = SecretAnalyzer(path, index)
+    ep_detector.sink = hdr_detector.sink = config_detector.sink = secret_analyzer.detector.sink = sink
+    scanners = [SlocCounter(), ep_detector, hdr_detector, config_detector]
+    scanners.append(stack_analyzer.code_matcher)
+    scanners.append(secret_analyzer.detector)
+    cache = ScanCache(cache_dir, path) if cache_dir else None
+    try:
+        with stage('scan', index.scannable()):
+            if profiler is None:
+                results = run_scan(index, scanners, jobs=jobs, cache=cache, use_mmap=use_mmap,
+                                   readers=readers, queue_depth=queue_depth, cancel=cancel,
+                                   window_size=window_size, start_method=start_method)
+            else:
+                with profiler.patterns():
+                    results = run_scan(index, profiler.wrap(scanners), jobs=1, cache=cache,
+                                       use_mmap=use_mmap, readers=readers, queue_depth=queue_depth,
+                                       cancel=cancel, window_size=window_size)
+        (sloc_by_lang, total_sloc), ep_res, headers_info, configs, fired, _ = results
+    finally:
+        if cache is not None:
+            cache.close()
+
+    endpoints      = ep_res.get('endpoints', [])
+    ajax_calls     = ep_res.get('ajax', [])
+    config_secrets = config_detector.secrets
+    secrets        = secret_analyzer.find_secrets(scanned=True)
+    check()
+
+    # 5) Стек: кодовые детекторы уже отработали в общем проходе
+    with stage('stack: evidence'):
+        tech_stack = stack_analyzer.analyze_stack(scanned=True)
+    stack_evidence = stack_analyzer.evidence
+
+    # 6) Сливаем зависимостями и конфига в единый tech_stack
     for cat, items in deps.items():
         if items:
             tech_stack.setdefault(cat, set()).update(items)
+            for tech in items:
+                stack_evidence.setdefault(tech, []).append(
+                    {'source': 'dependency', 'path': dep_analyzer.sources.get(tech)})
 
     # сопоставление технологий из config_patterns к категориям
-    for tech in configs:
+    for tech, paths in configs.items():
         if tech in {"MySQL", "PostgreSQL", "Redis"}:
             tech_stack.setdefault("database", set()).add(tech)
         else:
             tech_stack.setdefault("backend", set()).add(tech)
+        stack_evidence.setdefault(tech, []).append({'source': 'config', 'path': os.path.relpath(paths[0], path)})
+
+    # Файлы-признаки технологий (кодовые правила и конфиги): по ним режим
+    # --diff понимает, что технология исчезла вместе с изменёнными файлами
+    evidence: Dict[str, set] = {}
+    for tech, hits in fired.items():
+        evidence.setdefault(tech, set()).update(os.path.relpath(p, path) for _, p, _, _ in hits)
+    for tech, paths in configs.items():
+        evidence.setdefault(tech, set()).update(os.path.relpath(p, path) for p in paths)
 
-    # 9) Собираем окончательные результаты
-    results = {
+    # 7) Собираем окончательные результаты
+    return {
+        "root":           path,
         "languages":      distro,
         "sloc":           {"by_lang": sloc_by_lang, "total": total_sloc},
+        "binary":         skipped["binary"],
+        "oversized":      skipped["oversized"],
         "stack":          tech_stack,
+        "stack_evidence": stack_evidence,
         "dependencies":   deps,
         "secrets":        secrets,
         "endpoints":      endpoints,
@@ -78,12 +152,192 @@ def main():
         "headers":        headers_info,
         "configs":        configs,
         "config_secrets": config_secrets,
+        "evidence":       {tech: sorted(files) for tech, files in evidence.items()},
     }
 
-    # 10) Генерация отчёта
+
+def analyze_diff(path: str, base: str, head: str, baseline: Dict[str, Any],
+                 jobs: int = 1, cache_dir: str = None,
+                 ignore_dirs: Iterable[str] = IGNORE_DIRS,
+                 max_file_size: int = DEFAULT_MAX_FILE_SIZE,
+                 use_mmap: bool = False, readers: int = 0,
+                 queue_depth: int = DEFAULT_QUEUE_DEPTH, profiler: Profiler = None,
+                 window_size: int = DEFAULT_WINDOW_SIZE) -> Dict[str, Any]:
+    """
+    Режим --diff: анализируются только файлы, изменённые между base и head
+    (рабочее дерево должно соответствовать head), плюс манифесты в корне.
+    Возвращает изменения относительно базового отчёта (см. git_diff.py).
+    """
+    changed, removed = changed_paths(path, base, head)
+    index = FileIndex(path, paths=changed + MANIFEST_FILES, ignore_dirs=ignore_dirs,
+                      max_file_size=max_file_size)
+
+    # распределение языков — из базового отчёта; языки, впервые появившиеся
+    # в изменённых файлах, тоже участвуют в поиске эндпоинтов
+    languages = dict(baseline.get('languages') or {})
+    for lang in LanguageAnalyzer(path, index).detect_languages():
+        languages.setdefault(lang, 0.0)
+
+    fresh = analyze(path, index, jobs=jobs, cache_dir=cache_dir,
+                    languages=languages, structure=False, use_mmap=use_mmap,
+                    readers=readers, queue_depth=queue_depth, profiler=profiler,
+                    window_size=window_size)
+    touched = set(changed) | set(removed) | {entry.rel for entry in index}
+    merged = merge_baseline(baseline, fresh, touched)
+    changes = diff_reports(baseline, merged)
+    changes['changed_files'] = len(changed) + len(removed)
+    return changes
+
+
+def parse_size(value: str) -> int:
+    """Размер в байтах: 500000, 512K, 10M, 1G."""
+    units = {'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3}
+    text = value.strip().upper().rstrip('B')
+    try:
+        if text and text[-1] in units:
+            return int(float(text[:-1]) * units[text[-1]])
+        return int(text)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"неверный размер: {value}")
+
+
+def _save_profile(profiler: Profiler, path: str, parser: argparse.ArgumentParser) -> None:
+    if profiler is None:
+        return
+    profiler.print_table()
+    try:
+        profiler.save(path)
+    except OSError as e:
+        parser.error(f"--profile: {e}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Анализатор безопасности исходного кода")
+    parser.add_argument('path', help='Путь к корню проекта')
+    parser.add_argument(
+        '--format',
+        choices=['console', 'json', 'ndjson', 'html'],
+        default='console',
+        help='Формат вывода отчёта (ndjson — по строке JSON на находку по мере '
+             'анализа и итоговая запись summary)'
+    )
+    parser.add_argument(
+        '--jobs', '-j',
+        type=int,
+        default=1,
+        help='Число рабочих процессов сканирования (0 — все ядра)'
+    )
+    parser.add_argument(
+        '--cache-dir',
+        default=None,
+        help='Каталог постоянного кэша: повторный запуск читает только изменённые файлы'
+    )
+    parser.add_argument(
+        '--diff',
+        nargs=2,
+        metavar=('BASE', 'HEAD'),
+        default=None,
+        help='Анализировать только файлы, изменённые между ревизиями git (требует --baseline)'
+    )
+    parser.add_argument(
+        '--baseline',
+        default=None,
+        help='Базовый отчёт (JSON полного запуска с --format json) для режима --diff'
+    )
+    parser.add_argument(
+        '--no-ignore',
+        action='store_true',
+        help='Анализировать и каталоги зависимостей и сборок (node_modules, vendor, dist, build…)'
+    )
+    parser.add_argument(
+        '--max-file-size',
+        type=parse_size,
+        default=DEFAULT_MAX_FILE_SIZE,
+        help='Файлы крупнее не анализируются по содержимому, а перечисляются отдельно '
+             '(байты или с суффиксом K/M/G; 0 — без ограничения, по умолчанию 10M)'
+    )
+    parser.add_argument(
+        '--window-size',
+        type=parse_size,
+        default=DEFAULT_WINDOW_SIZE,
+        help='Файлы крупнее сканируются окнами такого размера по границам строк: '
+             'в памяти не больше окна, с --jobs окна файла сканируются параллельно. '
+             'Приближение: совпадение длиннее 64K, начавшееся у границы окна, '
+             'теряется (байты или с суффиксом K/M/G; 0 — файлы целиком, точно; '
+             'по умолчанию 4M)'
+    )
+    parser.add_argument(
+        '--mmap',
+        action='store_true',
+        help='Сканировать файлы, отображённые в память, как байты: без декодирования '
+             'файла целиком (\\w и IGNORECASE в шаблонах — только ASCII)'
+    )
+    parser.add_argument(
+        '--readers',
+        type=int,
+        default=DEFAULT_READERS,
+        help='Потоки упреждающего чтения файлов в каждом процессе: ожидание диска '
+             f'(NFS) перекрывается с анализом; 0 — без упреждения (по умолчанию {DEFAULT_READERS})'
+    )
+    parser.add_argument(
+        '--queue-depth',
+        type=int,
+        default=DEFAULT_QUEUE_DEPTH,
+        help=f'Сколько файлов читается наперёд, не более (по умолчанию {DEFAULT_QUEUE_DEPTH})'
+    )
+    parser.add_argument(
+        '--profile',
+        metavar='JSON',
+        default=None,
+        help='Профиль запуска: время и память этапов, стоимость сканеров и шаблонов, '
+             'самые медленные файлы — таблицей в stderr и в файл JSON (общий проход '
+             'выполняется в одном процессе)'
+    )
+    parser.add_argument(
+        '--profile-top',
+        type=int,
+        default=10,
+        help='Сколько самых медленных шаблонов и файлов выводить в таблице профиля'
+    )
+    args = parser.parse_args()
+    if args.readers < 0 or args.queue_depth < 1:
+        parser.error('--readers должно быть >= 0, --queue-depth — >= 1')
     report = ReportGenerator(args.format)
-    report.generate(results)
+    ignore_dirs = () if args.no_ignore else IGNORE_DIRS
+    profiler = Profiler(args.profile_top) if args.profile else None
+    stage = profiler.stage if profiler is not None else _unprofiled
+
+    if args.diff:
+        if not args.baseline:
+            parser.error('--diff требует --baseline')
+        try:
+            baseline = load_baseline(args.baseline)
+            changes = analyze_diff(args.path, args.diff[0], args.diff[1], baseline,
+                                   jobs=args.jobs, cache_dir=args.cache_dir,
+                                   ignore_dirs=ignore_dirs, max_file_size=args.max_file_size,
+                                   use_mmap=args.mmap, readers=args.readers,
+                                   queue_depth=args.queue_depth, profiler=profiler,
+                                   window_size=args.window_size)
+        except (OSError, ValueError, RuntimeError) as e:
+            parser.error(str(e))
+        with stage('report'):
+            report.generate_diff(changes)
+        _save_profile(profiler, args.profile, parser)
+        return
+
+    # Единый обход дерева: общий индекс файлов для всех этапов
+    with stage('index', lambda: index):
+        index = FileIndex(args.path, ignore_dirs=ignore_dirs, max_file_size=args.max_file_size)
+    results = analyze(args.path, index, jobs=args.jobs, cache_dir=args.cache_dir,
+                      use_mmap=args.mmap, sink=report.record if report.streaming else None,
+                      readers=args.readers, queue_depth=args.queue_depth, profiler=profiler,
+                      window_size=args.window_size)
+
+    # Генерация отчёта
+    with stage('report'):
+        report.generate(results)
+    _save_profile(profiler, args.profile, parser)
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
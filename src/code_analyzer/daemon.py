@@ -0,0 +1,397 @@
+"""
+Режим службы: долгоживущий процесс, выполняющий анализ по запросам.
+
+Каталоги patterns.py скомпилированы и разобраны для предфильтров один раз
+при старте (см. batch.warm_catalogs), постоянный кэш находок (cache.py)
+общий для всех запросов (отдельный файл на проект и набор настроек), а готовые результаты хранятся в памяти по ключу
+"проект + состояние дерева + настройки": повторный запрос к неизменённому
+проекту обходит дерево, но не читает ни одного файла.
+
+API — HTTP поверх локального TCP-порта или Unix-сокета, тела в JSON:
+  POST   /scan         {"path": ..., "id": ..., "options": {...}} — анализ;
+                       ответ {"id", "cached", "seconds", "tree", "results"},
+                       results — та же структура, что строит cli.analyze;
+  GET    /scans        — выполняющиеся анализы;
+  DELETE /scans/<id>   — отмена анализа (его запрос получит ответ 409);
+  GET    /health       — проверка, что служба жива.
+
+Запросы обрабатываются параллельно (поток на соединение); одновременные
+запросы к одному проекту с одинаковыми настройками выполняются по очереди,
+и второй получает результат первого из кэша. Пулы рабочих процессов
+(jobs > 1) запускаются через forkserver (или spawn): fork из
+многопоточной службы мог бы унаследовать блокировку, захваченную другим
+потоком (журнала, SQLite, импорта), и зависнуть.
+"""
+import argparse
+import errno
+import hashlib
+import http.server
+import json
+import multiprocessing
+import os
+import signal
+import socket
+import socketserver
+import stat
+import sys
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from .analyzers.report_generator import json_default
+from .batch import warm_catalogs
+from .cache import catalog_fingerprint
+from .cli import analyze, parse_size
+from .engine import CancelToken, Cancelled
+from .file_index import DEFAULT_MAX_FILE_SIZE, FileIndex
+from .patterns import IGNORE_DIRS
+from .readahead import DEFAULT_QUEUE_DEPTH
+from .windows import DEFAULT_WINDOW_SIZE
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+# Сколько результатов хранится в памяти (вытесняются давно не запрошенные)
+DEFAULT_RESULT_CACHE = 32
+# Способ запуска пулов анализа: не fork (см. описание модуля)
+POOL_START_METHOD = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+
+# Настройки анализа, которые принимает запрос, и значения по умолчанию
+OPTIONS = {
+    'jobs':          1,
+    'no_ignore':     False,
+    'max_file_size': DEFAULT_MAX_FILE_SIZE,
+    'mmap':          False,
+    'readers':       0,
+    'queue_depth':   DEFAULT_QUEUE_DEPTH,
+    'window_size':   DEFAULT_WINDOW_SIZE,
+}
+
+
+class RequestError(ValueError):
+    """Неверный запрос: ответ 400 с текстом ошибки."""
+
+
+def parse_options(raw: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """Настройки запроса поверх значений по умолчанию, с проверкой типов."""
+    raw = raw or {}
+    if not isinstance(raw, dict):
+        raise RequestError('options должен быть объектом')
+    unknown = sorted(set(raw) - set(OPTIONS))
+    if unknown:
+        raise RequestError(f"неизвестные настройки: {', '.join(unknown)}")
+    options = dict(OPTIONS, **raw)
+    try:
+        for key in ('max_file_size', 'window_size'):
+            if isinstance(options[key], str):
+                options[key] = parse_size(options[key])
+        for key in ('jobs', 'max_file_size', 'readers', 'queue_depth', 'window_size'):
+            if isinstance(options[key], bool) or not isinstance(options[key], int):
+                raise RequestError(f'{key} должен быть целым числом')
+    except argparse.ArgumentTypeError as e:
+        raise RequestError(str(e))
+    for key in ('no_ignore', 'mmap'):
+        options[key] = bool(options[key])
+    if options['readers'] < 0 or options['queue_depth'] < 1:
+        raise RequestError('readers должно быть >= 0, queue_depth — >= 1')
+    return options
+
+
+def tree_state(index: FileIndex) -> str:
+    """
+    Отпечаток состояния дерева по индексу: пути, размеры, mtime и классы
+    файлов, пропущенные каталоги. Любое изменение файла меняет отпечаток.
+    """
+    digest = hashlib.sha1()
+    for entry in sorted(index, key=lambda entry: entry.rel):
+        digest.update(f'{entry.rel}\0{entry.size}\0{entry.mtime}\0{entry.kind}\n'
+                      .encode('utf-8', 'surrogatepass'))
+    for rel in sorted(index.pruned):
+        digest.update(f'{rel}\0pruned\n'.encode('utf-8', 'surrogatepass'))
+    return digest.hexdigest()
+
+
+class AnalysisService:
+    """
+    Выполнение запросов анализа: кэш результатов, очередь по проектам и
+    отмена. Не зависит от транспорта — HTTP-обработчик только вызывает scan().
+    """
+
+    def __init__(self, cache_dir: str = None, result_cache: int = DEFAULT_RESULT_CACHE):
+        self.cache_dir = cache_dir
+        self.result_cache = result_cache
+        self.fingerprint = catalog_fingerprint()
+        self._lock = threading.Lock()
+        self._results: 'OrderedDict[Tuple, Dict[str, Any]]' = OrderedDict()
+        # (проект, настройки) -> [блокировка, сколько запросов её ждут или держат]:
+        # запись удаляется с последним запросом
+        self._project_locks: Dict[Tuple, List[Any]] = {}
+        self._active: Dict[str, Dict[str, Any]] = {}
+
+    def active(self) -> Dict[str, Dict[str, Any]]:
+        """Выполняющиеся анализы: id -> {path, started}."""
+        with self._lock:
+            return {scan_id: {'path': scan['path'], 'started': scan['started']}
+                    for scan_id, scan in self._active.items()}
+
+    def cancel(self, scan_id: str) -> bool:
+        """Отменяет анализ; False — такого анализа нет (или он уже завершён)."""
+        with self._lock:
+            scan = self._active.get(scan_id)
+        if scan is None:
+            return False
+        scan['token'].cancel()
+        return True
+
+    def _cache_dir(self, settings: Tuple) -> Optional[str]:
+        """
+        Каталог постоянного кэша для набора настроек. Запросы с разными
+        настройками выполняются одновременно, а ScanCache.save удаляет записи
+        файлов, которых нет в его индексе: общий файл SQLite они бы чистили
+        друг у друга (и упирались бы в блокировку базы).
+        """
+        if self.cache_dir is None:
+            return None
+        name = hashlib.sha1(repr(settings).encode('utf-8')).hexdigest()[:16]
+        return os.path.join(self.cache_dir, name)
+
+    def _project_lock(self, key: Tuple) -> threading.Lock:
+        """Блокировка проекта для запроса; по завершении — _release_project(key)."""
+        with self._lock:
+            entry = self._project_locks.setdefault(key, [threading.Lock(), 0])
+            entry[1] += 1
+            return entry[0]
+
+    def _release_project(self, key: Tuple) -> None:
+        with self._lock:
+            entry = self._project_locks[key]
+            entry[1] -= 1
+            if not entry[1]:
+                del self._project_locks[key]
+
+    def _cached(self, key: Tuple) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            results = self._results.get(key)
+            if results is not None:
+                self._results.move_to_end(key)
+            return results
+
+    def _remember(self, key: Tuple, results: Dict[str, Any]) -> None:
+        with self._lock:
+            self._results[key] = results
+            while len(self._results) > self.result_cache:
+                self._results.popitem(last=False)
+
+    def scan(self, path: str, options: Dict[str, Any] = None, scan_id: str = None) -> Dict[str, Any]:
+        """
+        Анализ проекта path. Возвращает {"id", "cached", "seconds", "tree", "results"};
+        Cancelled — анализ отменён, RequestError — неверный запрос.
+        """
+        if not isinstance(path, str) or not path:
+            raise RequestError('не указан path')
+        root = os.path.abspath(path)
+        if not os.path.isdir(root):
+            raise RequestError(f'нет каталога: {path}')
+        options = parse_options(options)
+        if scan_id is not None and not isinstance(scan_id, str):
+            raise RequestError('id должен быть строкой')
+        scan_id = scan_id or uuid.uuid4().hex
+        token = CancelToken()
+        with self._lock:
+            if scan_id in self._active:
+                raise RequestError(f'анализ {scan_id} уже выполняется')
+            self._active[scan_id] = {'path': root, 'started': time.time(), 'token': token}
+        started = time.perf_counter()
+        settings = tuple(sorted(options.items()))
+        lock = self._project_lock((root, settings))
+        try:
+            # одновременные запросы к одному проекту — по очереди, с проверкой отмены
+            while not lock.acquire(timeout=0.1):
+                token.check()
+            try:
+                token.check()
+                index = FileIndex(root, ignore_dirs=() if options['no_ignore'] else IGNORE_DIRS,
+                                  max_file_size=options['max_file_size'])
+                state = tree_state(index)
+                key = (root, state, settings, self.fingerprint)
+                results = self._cached(key)
+                cached = results is not None
+                if not cached:
+                    results = analyze(root, index, jobs=options['jobs'],
+                                      cache_dir=self._cache_dir(settings),
+                                      use_mmap=options['mmap'], readers=options['readers'],
+                                      queue_depth=options['queue_depth'], cancel=token,
+                                      window_size=options['window_size'],
+                                      start_method=POOL_START_METHOD)
+                    self._remember(key, results)
+            finally:
+                lock.release()
+        finally:
+            self._release_project((root, settings))
+            with self._lock:
+                del self._active[scan_id]
+        return {
+            'id':      scan_id,
+            'cached':  cached,
+            'seconds': round(time.perf_counter() - started, 3),
+            'tree':    state,
+            'results': results,
+        }
+
+
+class _Handler(http.server.BaseHTTPRequestHandler):
+    server_version = 'code-analyzer'
+    protocol_version = 'HTTP/1.1'
+
+    @property
+    def service(self) -> AnalysisService:
+        return self.server.service
+
+    def address_string(self) -> str:
+        # у Unix-сокета адреса клиента нет
+        return self.client_address[0] if isinstance(self.client_address, tuple) else 'unix'
+
+    def log_message(self, format: str, *args) -> None:
+        if not self.server.quiet:
+            super().log_message(format, *args)
+
+    def _reply(self, status: int, body: Dict[str, Any]) -> None:
+        data = json.dumps(body, ensure_ascii=False, default=json_default).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _body(self) -> Dict[str, Any]:
+        length = int(self.headers.get('Content-Length') or 0)
+        try:
+            body = json.loads(self.rfile.read(length) or b'{}')
+        except ValueError as e:
+            raise RequestError(f'тело запроса — не JSON: {e}')
+        if not isinstance(body, dict):
+            raise RequestError('тело запроса должно быть объектом JSON')
+        return body
+
+    def do_GET(self) -> None:
+        if self.path == '/health':
+            self._reply(200, {'status': 'ok', 'catalog': self.service.fingerprint})
+        elif self.path == '/scans':
+            self._reply(200, {'scans': self.service.active()})
+        else:
+            self._reply(404, {'error': f'нет ресурса {self.path}'})
+
+    def do_POST(self) -> None:
+        if self.path != '/scan':
+            self._reply(404, {'error': f'нет ресурса {self.path}'})
+            return
+        scan_id = None
+        try:
+            body = self._body()
+            scan_id = body.get('id')
+            self._reply(200, self.service.scan(body.get('path'), body.get('options'), scan_id))
+        except RequestError as e:
+            self._reply(400, {'error': str(e)})
+        except Cancelled as e:
+            self._reply(409, {'id': scan_id, 'error': str(e)})
+        except Exception as e:
+            self._reply(500, {'id': scan_id, 'error': f'{type(e).__name__}: {e}'})
+
+    def do_DELETE(self) -> None:
+        prefix = '/scans/'
+        if not self.path.startswith(prefix):
+            self._reply(404, {'error': f'нет ресурса {self.path}'})
+            return
+        scan_id = self.path[len(prefix):]
+        if self.service.cancel(scan_id):
+            self._reply(202, {'id': scan_id, 'status': 'cancelling'})
+        else:
+            self._reply(404, {'id': scan_id, 'error': 'нет такого анализа'})
+
+
+class _TCPServer(http.server.ThreadingHTTPServer):
+    daemon_threads = True
+
+
+class _UnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def _remove_stale_socket(path: str) -> None:
+    """
+    Удаляет файл сокета, оставшийся от завершившейся службы. OSError — по
+    пути лежит не сокет (например, опечатка в --socket указала на обычный
+    файл) или сокет ещё слушает работающая служба.
+    """
+    try:
+        mode = os.lstat(path).st_mode
+    except FileNotFoundError:
+        return
+    if not stat.S_ISSOCK(mode):
+        raise FileExistsError(errno.EEXIST, 'файл существует и не является сокетом', path)
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+        try:
+            probe.connect(path)
+        except (ConnectionRefusedError, FileNotFoundError):
+            pass
+        else:
+            raise OSError(errno.EADDRINUSE, 'сокет уже слушает работающая служба', path)
+    os.remove(path)
+
+
+def make_server(service: AnalysisService, socket_path: str = None, host: str = DEFAULT_HOST,
+                port: int = DEFAULT_PORT, quiet: bool = False) -> socketserver.BaseServer:
+    """
+    HTTP-сервер службы на Unix-сокете socket_path (сокет завершившейся службы
+    заменяется, см. _remove_stale_socket) или на TCP host:port. Запускается
+    serve_forever().
+    """
+    if socket_path is not None:
+        _remove_stale_socket(socket_path)
+        server = _UnixServer(socket_path, _Handler)
+    else:
+        server = _TCPServer((host, port), _Handler)
+    server.service = service
+    server.quiet = quiet
+    return server
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='Служба анализа: запросы по HTTP на локальном сокете')
+    parser.add_argument('--socket', default=None, help='Путь Unix-сокета (вместо TCP-порта)')
+    parser.add_argument('--host', default=DEFAULT_HOST, help=f'Адрес TCP (по умолчанию {DEFAULT_HOST})')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT,
+                        help=f'Порт TCP (по умолчанию {DEFAULT_PORT}; 0 — любой свободный)')
+    parser.add_argument('--cache-dir', default=None,
+                        help='Каталог постоянного кэша находок, общий для всех запросов')
+    parser.add_argument('--result-cache', type=int, default=DEFAULT_RESULT_CACHE,
+                        help=f'Сколько результатов хранить в памяти (по умолчанию {DEFAULT_RESULT_CACHE})')
+    parser.add_argument('--quiet', action='store_true', help='Не журналировать запросы в stderr')
+    args = parser.parse_args(argv)
+    if args.result_cache < 1:
+        parser.error('--result-cache должен быть не меньше 1')
+
+    warm_catalogs()
+    service = AnalysisService(args.cache_dir, args.result_cache)
+    try:
+        server = make_server(service, args.socket, args.host, args.port, args.quiet)
+    except OSError as e:
+        parser.error(f'не удалось открыть сокет: {e}')
+    where = args.socket or '{}:{}'.format(*server.server_address[:2])
+    print(f'code-analyzer: служба слушает {where}', file=sys.stderr, flush=True)
+    # SIGTERM — как Ctrl+C: сокет закрывается и файл сокета удаляется
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    try:
+        server.serve_forever()
+    except (KeyboardInterrupt, SystemExit):
+        pass
+    finally:
+        server.server_close()
+        if args.socket is not None and os.path.exists(args.socket):
+            os.remove(args.socket)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,14 +1,17 @@
 """Набор детекторов для анализа кода"""
 from .base import Detector
 from .file_detector import FileDetector
-from .code_detector import CodeDetector
+from .code_detector import CodeDetector, FusedCodeDetector
 from .config_detector import ConfigDetector
 from .endpoint_detector import EndpointDetector
+from .secret_detector import SecretDetector
 
 __all__ = [
     "Detector",
     "FileDetector",
     "CodeDetector",
+    "FusedCodeDetector",
     "ConfigDetector",
     "EndpointDetector",
+    "SecretDetector",
 ]
\ No newline at end of file
@@ -1,9 +1,83 @@
 from abc import ABC, abstractmethod
-from typing import Any, Tuple
+from typing import Any, Callable, Dict, Optional, Tuple
+from ..file_index import FileIndex
+
+# Приёмник потоковых находок: (тип записи, данные), см. ReportGenerator.record
+Sink = Callable[[str, Dict[str, Any]], None]
 
 class Detector(ABC):
-    def __init__(self, directory: str):
-        self.directory = directory
+    def __init__(self, directory: str, index: FileIndex = None):
+        self._directory = directory
+        self._index = index
+        # Если задан, находки передаются ему по мере сбора (collect) и не
+        # накапливаются детектором — память не растёт с числом находок
+        self.sink: Optional[Sink] = None
+        self.invalidate()
+
+    @property
+    def directory(self) -> str:
+        return self._directory
+
+    @directory.setter
+    def directory(self, directory: str) -> None:
+        # другой каталог — другие результаты; индекс старого каталога не годится
+        self._directory = directory
+        self._index = None
+        self.invalidate()
+
+    @property
+    def index(self) -> FileIndex:
+        """
+        Общий индекс файлов. Если его не передали в конструктор,
+        строится при первом обращении.
+        """
+        if self._index is None:
+            self._index = FileIndex(self._directory)
+        return self._index
+
+    @index.setter
+    def index(self, index: FileIndex) -> None:
+        self._index = index
+        self.invalidate()
+
+    def __getstate__(self):
+        # Индекс остаётся в родительском процессе: рабочим процессам
+        # движка нужны только настройки и скомпилированные шаблоны
+        state = self.__dict__.copy()
+        state['_index'] = None
+        state['sink'] = None
+        state['_result'] = None
+        state['scanned'] = False
+        return state
+
+    # --- запомненный результат последнего прохода ---
+
+    def invalidate(self) -> None:
+        """Сбрасывает запомненный результат: следующий result() сканирует заново."""
+        self._result: Any = None
+        self.scanned = False
+        # счётчики последнего прохода: файлов просмотрено и файлов с находками
+        self.examined = 0
+        self.matched = 0
+
+    def remember(self, result: Any, examined: int, matched: int) -> None:
+        """Итог прохода (вызывает движок после finish(), см. engine.py)."""
+        self._result = result
+        self.scanned = True
+        self.examined = examined
+        self.matched = matched
+
+    def result(self) -> Any:
+        """
+        Результат последнего прохода — detect() или общего прохода движка;
+        detect() выполняется, только если прохода ещё не было (или после invalidate()).
+        """
+        if not self.scanned:
+            result = self.detect()
+            if not self.scanned:
+                # detect() без движка (run_scan запоминает сам)
+                self.remember(result, self.examined, self.matched)
+        return self._result
 
     @abstractmethod
     def detect(self) -> Tuple[bool, Any]:
@@ -17,6 +91,7 @@ class Detector(ABC):
     @abstractmethod
     def confidence(self) -> float:
         """
-        Оценка уверенности в результатах анализа (0.0–1.0).
+        Оценка уверенности в результатах анализа (0.0–1.0) — по запомненному
+        результату и счётчикам прохода, без повторного сканирования.
         """
         pass
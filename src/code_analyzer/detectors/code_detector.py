@@ -1,15 +1,23 @@
-import os
+import heapq
 import re
-from typing import List, Tuple
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 from .base import Detector
+from ..cache import settings_key
+from ..engine import run_scan
+from ..file_index import FileEntry, FileIndex
+from ..prefilter import LiteralPrefilter
+from ..utils import LineIndex, as_text, for_buffer
+
+# Расширения файлов с исходным кодом, которые просматривает детектор
+CODE_EXTENSIONS = ('.py', '.js', '.ts', '.java', '.php', '.cs')
 
 class CodeDetector(Detector):
     """
     Детектор, ищущий совпадения по регулярному выражению в исходном коде.
     """
 
-    def __init__(self, directory: str, pattern: str):
-        super().__init__(directory)
+    def __init__(self, directory: str, pattern: str, index: FileIndex = None):
+        super().__init__(directory, index)
         # Если пришёл уже re.Pattern — используем напрямую, иначе компилируем
         if isinstance(pattern, re.Pattern):
             self.pattern = pattern
@@ -20,23 +28,40 @@ class CodeDetector(Detector):
     def detect(self) -> List[Tuple[str, int, str]]:
         """
         Сканирует все файлы проекта с исходным кодом и ищет совпадения по regex.
-        Возвращает список кортежей (путь_к_файлу, номер_строки, совпавший_текст).
-        """
-        self._matches.clear()
-        for root, _, files in os.walk(self.directory):
-            for fname in files:
-                if not fname.endswith(('.py', '.js', '.ts', '.java', '.php', '.cs')):
-                    continue
-                path = os.path.join(root, fname)
-                try:
-                    with open(path, 'r', encoding='utf-8', errors='ignore') as f:
-                        for lineno, line in enumerate(f, start=1):
-                            m = self.pattern.search(line)
-                            if m:
-                                self._matches.append((path, lineno, m.group(0)))
-                except Exception:
-                    # Пропускаем файлы, которые не удалось прочитать
-                    continue
+        Возвращает список кортежей (путь_к_файлу, номер_строки, совпавший_текст):
+        по первому совпадению в каждом файле — признаку технологии больше не нужно.
+        """
+        return run_scan(self.index, [self])[0]
+
+    @property
+    def matches(self) -> List[Tuple[str, int, str]]:
+        """Совпадения, собранные последним проходом (detect() или общий проход движка)."""
+        return self._matches
+
+    # --- протокол сканера (см. engine.py) ---
+
+    def reset(self) -> None:
+        # новый список: результат прошлого прохода (result(), detect()) не меняется
+        self._matches = []
+
+    def accepts(self, entry: FileEntry) -> bool:
+        return entry.name.endswith(CODE_EXTENSIONS)
+
+    def cache_key(self) -> str:
+        return settings_key('code', 'first', self.pattern.pattern, self.pattern.flags)
+
+    def scan_file(self, entry: FileEntry, text: str) -> Optional[List[Tuple[int, str]]]:
+        for lineno, line in enumerate(text.split('\n'), start=1):
+            m = self.pattern.search(line)
+            if m:
+                return [(lineno, m.group(0))]
+        return None
+
+    def collect(self, entry: FileEntry, found: List[Tuple[int, str]]) -> None:
+        for lineno, text in found:
+            self._matches.append((entry.path, lineno, text))
+
+    def finish(self) -> List[Tuple[str, int, str]]:
         return self._matches
 
     def confidence(self) -> float:
@@ -44,10 +69,199 @@ class CodeDetector(Detector):
         Оценка уверенности: доля файлов, в которых найдены совпадения,
         от общего числа проверенных файлов с исходным кодом.
         """
-        total = 0
-        seen_files = set(path for path, _, _ in self._matches)
-        for root, _, files in os.walk(self.directory):
-            for fname in files:
-                if fname.endswith(('.py', '.js', '.ts', '.java', '.php', '.cs')):
-                    total += 1
-        return (len(seen_files) / total) if total > 0 else 0.0
\ No newline at end of file
+        self.result()
+        return (self.matched / self.examined) if self.examined else 0.0
+
+# Флаги, которые переносятся в объединённое выражение как локальные (?flags:...)
+_SCOPED_FLAGS = ((re.IGNORECASE, 'i'), (re.MULTILINE, 'm'), (re.DOTALL, 's'), (re.VERBOSE, 'x'))
+
+
+def _scoped(pattern: re.Pattern) -> str:
+    """Исходник шаблона, обёрнутый в группу с его собственными флагами."""
+    flags = ''.join(letter for flag, letter in _SCOPED_FLAGS if pattern.flags & flag)
+    source = pattern.pattern
+    if pattern.flags & re.VERBOSE:
+        # комментарий в конце verbose-шаблона не должен съесть закрывающую скобку
+        source += '\n'
+    return f'(?{flags}:{source})' if flags else f'(?:{source})'
+
+
+class FusedCodeDetector(Detector):
+    """
+    Все кодовые правила стека в одном регулярном выражении: файл
+    просматривается один раз для всех правил, а не отдельным обходом
+    дерева на каждый CodeDetector.
+
+    Совпадения раскладываются по исходным CodeDetector (их matches заполняются
+    так же, как при detect()), а finish() сообщает, какая технология и какое
+    правило сработали.
+    """
+
+    # scan_file принимает и bytes/mmap (см. engine.py, режим mmap)
+    supports_bytes = True
+
+    def __init__(self, directory: str, rules: List[Tuple[str, CodeDetector]], index: FileIndex = None):
+        super().__init__(directory, index)
+        self.rules = rules
+        # Одинаковые шаблоны разных технологий проверяются один раз
+        self._groups: List[Tuple[re.Pattern, List[int]]] = []
+        seen: Dict[Tuple[str, int], int] = {}
+        for i, (_, det) in enumerate(rules):
+            key = (det.pattern.pattern, det.pattern.flags)
+            if key not in seen:
+                seen[key] = len(self._groups)
+                self._groups.append((det.pattern, []))
+            self._groups[seen[key]][1].append(i)
+        self._prefilter = LiteralPrefilter([pattern for pattern, _ in self._groups])
+        self._fused, loose = self._compile()
+        # «Ворота» первого шага: объединённое выражение и не встроившиеся шаблоны
+        self._gates = ([self._fused] if self._fused is not None else []) + [self._groups[g][0] for g in loose]
+        self.reset()
+
+    def _compile(self) -> Tuple[Optional[re.Pattern], List[int]]:
+        """
+        Собирает (?flags:...)|(?flags:...)|... Группы не именуются: в модуле re
+        именованные альтернативы вдвое замедляют поиск, а какое правило
+        сработало, выясняется на строках-кандидатах. Шаблоны, которые нельзя
+        встроить (глобальные inline-флаги и т.п.), проверяются по отдельности.
+        """
+        parts, loose = [], []
+        for g, (pattern, _) in enumerate(self._groups):
+            part = _scoped(pattern)
+            try:
+                re.compile(part)
+            except re.error:
+                loose.append(g)
+                continue
+            parts.append(part)
+        # MULTILINE: ^/$ на уровне всего файла ведут себя как на отдельной строке
+        fused = re.compile('|'.join(parts), re.MULTILINE) if parts else None
+        return fused, loose
+
+    def detect(self) -> Dict[str, List[Tuple[str, str, int, str]]]:
+        return run_scan(self.index, [self])[0]
+
+    # --- протокол сканера (см. engine.py) ---
+
+    def reset(self) -> None:
+        for _, det in self.rules:
+            det.reset()
+        self._fired: Dict[str, List[Tuple[str, str, int, str]]] = {}
+
+    def accepts(self, entry: FileEntry) -> bool:
+        return entry.name.endswith(CODE_EXTENSIONS)
+
+    def pattern_labels(self) -> Dict[Tuple[str, int], str]:
+        """Подписи объединённого выражения для профилировщика (см. profiler.py)."""
+        if self._fused is None:
+            return {}
+        return {(self._fused.pattern, self._fused.flags):
+                f'stack: объединённое выражение ({len(self._groups)} правил)'}
+
+    def cache_key(self) -> str:
+        # номера групп в находках имеют смысл только при том же наборе правил
+        return settings_key('stack', 'first', [(p.pattern, p.flags) for p, _ in self._groups])
+
+    @staticmethod
+    def _candidate_lines(gate: re.Pattern, text, lines: LineIndex) -> Iterator[int]:
+        """Строки с совпадениями gate по возрастанию; со строки берётся одно совпадение."""
+        gate = for_buffer(gate, text)
+        m = gate.search(text)
+        while m:
+            line = lines.line(m.start())
+            yield line
+            _, end = lines.span(line)
+            m = gate.search(text, end + 1)
+
+    def scan_file(self, entry: FileEntry, text) -> Optional[List[Tuple[int, int, str]]]:
+        """
+        Возвращает [(номер_группы, номер_строки, совпавший_текст)] или None.
+        text — str или bytes/mmap: в bytes-режиме декодируются только совпадения.
+        Семантика та же, что у CodeDetector: первое совпадение правила в файле —
+        сработавшее правило дальше по файлу не проверяется, а просмотр файла
+        заканчивается, когда сработали все правила-кандидаты.
+        """
+        return self.scan_window(entry, text, len(text))[0]
+
+    # --- сканирование окнами (см. windows.py) ---
+
+    def window_overlap(self) -> int:
+        # правила проверяются на строке-кандидате целиком, а окна делятся
+        # по границам строк — перекрытие не нужно
+        return 0
+
+    def scan_window(self, entry: FileEntry, text, limit: int,
+                    skip=None) -> Tuple[Optional[List[Tuple[int, int, str]]], None]:
+        """
+        Как scan_file, но только строки, начинающиеся до смещения limit.
+        Совпадения не выходят за строку — переноса между окнами нет.
+        """
+        # 0) Правила, чьи обязательные литералы есть в файле; нет таких — файл пропускается
+        selected = self._prefilter.candidates(text)
+        if not selected:
+            return None, None
+        lines = LineIndex(text)
+
+        # 1) Объединённое выражение (и не встроившиеся шаблоны) отмечает
+        #    строки-кандидаты — лениво и по возрастанию номера. После совпадения
+        #    поиск продолжается со следующей строки, а совпадения, «перекрытые»
+        #    чужой альтернативой, добираются на шаге 2.
+        # 2) На строке-кандидате отдельно проверяются правила, ещё не сработавшие
+        #    в этом файле; когда таких не осталось, файл дальше не просматривается.
+        pending = list(selected)
+        found = []
+        previous = 0
+        for line in heapq.merge(*(self._candidate_lines(gate, text, lines) for gate in self._gates)):
+            if line == previous:
+                continue
+            previous = line
+            start, end = lines.span(line)
+            if start >= limit:
+                break
+            chunk = text[start:end]
+            waiting = []
+            for g in pending:
+                m = for_buffer(self._groups[g][0], chunk).search(chunk)
+                if m:
+                    found.append((g, line, as_text(m.group(0))))
+                else:
+                    waiting.append(g)
+            pending = waiting
+            if not pending:
+                break
+        return found or None, None
+
+    def join_windows(self, parts: List[Tuple[int, List[Tuple[int, int, str]]]]) -> List[Tuple[int, int, str]]:
+        """Первое совпадение каждой группы по всем окнам, как у scan_file."""
+        found, seen = [], set()
+        for before, window_found in parts:
+            for g, lineno, text in window_found:
+                if g not in seen:
+                    seen.add(g)
+                    found.append((g, lineno + before, text))
+        return found
+
+    def collect(self, entry: FileEntry, found: List[Tuple[int, int, str]]) -> None:
+        for g, lineno, text in found:
+            pattern, rule_ids = self._groups[g]
+            for i in rule_ids:
+                tech, det = self.rules[i]
+                det.collect(entry, [(lineno, text)])
+                self._fired.setdefault(tech, []).append((pattern.pattern, entry.path, lineno, text))
+
+    def finish(self) -> Dict[str, List[Tuple[str, str, int, str]]]:
+        """{технология: [(правило, путь, номер_строки, совпавший_текст)]}"""
+        return self._fired
+
+    def remember(self, result: Any, examined: int, matched: int) -> None:
+        super().remember(result, examined, matched)
+        # правила получают совпадения и счётчики того же прохода: их
+        # result() и confidence() не сканируют дерево заново
+        for _, det in self.rules:
+            det.remember(list(det.matches), examined, len({path for path, _, _ in det.matches}))
+
+    def confidence(self) -> float:
+        """Доля правил, сработавших хотя бы раз."""
+        self.result()
+        fired = sum(1 for _, det in self.rules if det.matches)
+        return (fired / len(self.rules)) if self.rules else 0.0
@@ -1,51 +1,70 @@
-import os
-from typing import Dict, List, Tuple
+from typing import Dict, List, Optional, Tuple
 from .base import Detector
-from ..patterns import CONFIG_PATTERNS, PASSWORD_PATTERN  
+from ..cache import settings_key
+from ..engine import run_scan
+from ..file_index import FileEntry, FileIndex
+from .. import patterns as catalog
+from ..patterns import CONFIG_PATTERNS
 
 class ConfigDetector(Detector):
     """
     Детектор для анализа конфигурационных файлов и поиска шаблонов технологий и секретов.
     """
-    def __init__(self, directory: str, config_patterns: Dict[str, Dict[str, str]] = None):
-        super().__init__(directory)
+    def __init__(self, directory: str, config_patterns: Dict[str, Dict[str, str]] = None,
+                 index: FileIndex = None):
+        super().__init__(directory, index)
         # если паттерны не передали — берём из patterns.py
         self.config_patterns = config_patterns or CONFIG_PATTERNS  
-        self.detected: Dict[str, List[str]] = {}
-        self.secrets: List[Tuple[str, List[str]]] = []
+        self.reset()
 
     def detect(self) -> Dict[str, List[str]]:
         """
         Ищет технологические шаблоны в конфигурационных файлах.
         Возвращает словарь {tech_name: [списки путей к файлам]}.
         """
-        # теперь проходим только по файлам, которые есть в CONFIG_PATTERNS
-        for root, _, files in os.walk(self.directory):
-            for cfg_file, tech_map in self.config_patterns.items():
-                if cfg_file not in files:
-                    continue
-                path = os.path.join(root, cfg_file)
-                try:
-                    content = open(path, 'r', encoding='utf-8', errors='ignore').read()
-                except Exception:
-                    continue
-
-                # Поиск технологий по шаблонам
-                for pattern, tech in tech_map.items():
-                    if pattern in content:
-                        self.detected.setdefault(tech, []).append(path)
-
-                # Поиск секретов
-                secrets = PASSWORD_PATTERN.findall(content)
-                if secrets:
-                    values = [match[1] for match in secrets]
-                    self.secrets.append((path, values))
+        return run_scan(self.index, [self])[0]
+
+    # --- протокол сканера (см. engine.py) ---
+
+    def reset(self) -> None:
+        self.detected: Dict[str, List[str]] = {}
+        self.secrets: List[Tuple[str, List[str]]] = []
+
+    def accepts(self, entry: FileEntry) -> bool:
+        # проходим только по файлам, которые есть в CONFIG_PATTERNS
+        return entry.name in self.config_patterns
+
+    def cache_key(self) -> str:
+        return settings_key('config', sorted((name, sorted(pats.items()))
+                                             for name, pats in self.config_patterns.items()))
+
+    def scan_file(self, entry: FileEntry, content: str) -> Optional[Tuple[List[str], List[str]]]:
+        """Возвращает ([найденные технологии], [значения секретов]) или None."""
+        # Поиск технологий по шаблонам
+        techs = [tech for pattern, tech in self.config_patterns[entry.name].items()
+                 if pattern in content]
+
+        # Поиск секретов
+        values = [match[1] for match in catalog.PASSWORD_PATTERN.findall(content)]
+        return (techs, values) if techs or values else None
+
+    def collect(self, entry: FileEntry, found: Tuple[List[str], List[str]]) -> None:
+        techs, values = found
+        for tech in techs:
+            self.detected.setdefault(tech, []).append(entry.path)
+        if values and self.sink is not None:
+            self.sink('secret', {'file': entry.path, 'values': values})
+        elif values:
+            self.secrets.append((entry.path, values))
+
+    def finish(self) -> Dict[str, List[str]]:
         return self.detected
 
     def confidence(self) -> float:
         """
         Доля найденных технологических совпадений от общего числа шаблонов.
         """
+        self.result()
         total_patterns = sum(len(p) for p in self.config_patterns.values())
         found = sum(len(paths) for paths in self.detected.values())
-        return (found / total_patterns) if total_patterns else 0.0
\ No newline at end of file
+        return (found / total_patterns) if total_patterns else 0.0
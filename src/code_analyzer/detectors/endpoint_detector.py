@@ -1,13 +1,14 @@
 # src/code_analyzer/detectors/endpoint_detector.py
-import os
-import re
-from typing import List, Dict, Any
+from typing import List, Dict, Optional, Tuple
 from .base import Detector
-from ..patterns import (
-    ENDPOINT_PATTERNS,
-    AJAX_PATTERN_EXT,
-    ENDPOINT_IGNORE_FILE_PATTERNS
-)
+from ..engine import run_scan
+from ..file_index import FileEntry, FileIndex, PathFilter
+from ..findings import FindingTable, PathTable
+from ..prefilter import LiteralPrefilter
+from ..utils import LineIndex, as_text, for_buffer
+from ..windows import match_width, window_matches
+from .. import patterns as catalog
+from ..patterns import ENDPOINT_PATTERNS
 
 # Привязка расширений к языкам
 EXTENSION_LANG_MAP = {
@@ -24,84 +25,137 @@ EXTENSION_LANG_MAP = {
 }
 
 class EndpointDetector(Detector):
-    def __init__(self, directory: str, langs: List[str]):
-        super().__init__(directory)
+    # scan_file принимает и bytes/mmap (см. engine.py, режим mmap)
+    supports_bytes = True
+
+    def __init__(self, directory: str, langs: List[str], index: FileIndex = None):
+        super().__init__(directory, index)
         self.langs = langs
+        self._ignore = PathFilter(catalog.ENDPOINT_IGNORE_FILE_PATTERNS)
+        # Предфильтр по литералам: шаблоны эндпоинтов языка + общий AJAX-шаблон последним
+        self._prefilters = {
+            lang: LiteralPrefilter([regex for regex, _ in ENDPOINT_PATTERNS.get(lang, [])]
+                                   + [catalog.AJAX_PATTERN_EXT])
+            for lang in set(EXTENSION_LANG_MAP.values()) if lang in langs
+        }
+        self._overlap: Optional[int] = None
+        self.reset()
+
+    def detect(self) -> Dict[str, FindingTable]:
+        return run_scan(self.index, [self])[0]
+
+    # --- протокол сканера (см. engine.py) ---
+
+    def reset(self) -> None:
+        # находки столбцами (см. findings.py): файл — номер в общей таблице путей прохода
+        paths = PathTable()
+        self._endpoints = FindingTable(('framework', 'method', 'endpoint'), paths,
+                                       intern=('framework', 'method'))
+        self._ajax = FindingTable(('call',), paths)
+
+    def accepts(self, entry: FileEntry) -> bool:
+        # 1) Только кодовые расширения и активные языки
+        lang_for_file = EXTENSION_LANG_MAP.get(entry.ext)
+        if lang_for_file is None or lang_for_file not in self.langs:
+            return False
+        # 2) Пропускаем игнор-файлы
+        return not self._ignore.ignored(entry.rel)
+
+    def cache_key(self) -> str:
+        # находки файла зависят только от каталога его языка
+        return 'endpoints'
+
+    def scan_file(self, entry: FileEntry, text) -> Optional[Tuple[list, list]]:
+        """
+        Находит эндпоинты и AJAX-вызовы в одном файле (str или bytes/mmap).
+        Возвращает ([(line, framework, method, route)], [(line, url)]) или None.
+        """
+        return self.scan_window(entry, text, len(text))[0]
+
+    # --- сканирование окнами (см. windows.py) ---
+
+    def window_overlap(self) -> int:
+        if self._overlap is None:
+            self._overlap = match_width([regex for lang in self._prefilters
+                                         for regex, _ in ENDPOINT_PATTERNS.get(lang, [])]
+                                        + [catalog.AJAX_PATTERN_EXT])
+        return self._overlap
+
+    def scan_window(self, entry: FileEntry, text, limit: int,
+                    skip: Dict[int, int] = None) -> Tuple[Optional[Tuple[list, list]], Optional[Dict[int, int]]]:
+        """
+        Как scan_file, но только совпадения, начинающиеся до смещения limit;
+        цепочки поиска — номера шаблонов, AJAX — len(шаблонов языка).
+        """
+        lang = EXTENSION_LANG_MAP[entry.ext]
+        # 3) Только шаблоны языка файла, чьи обязательные литералы есть в тексте
+        selected = self._prefilters[lang].candidates(text)
+        if not selected:
+            return None, None
+        patterns = ENDPOINT_PATTERNS.get(lang, [])
+
+        endpoints = []
+        ajax = []
+        spill: Dict[int, int] = {}
+        lines = LineIndex(text)   # номера строк — бинарным поиском по началам строк
+
+        for i in selected:
+            if i == len(patterns):
+                continue
+            regex, framework = patterns[i]
+            regex = for_buffer(regex, text)
+            for m in window_matches(regex, text, limit, i, skip, spill):
+                method = as_text(m.group(1)).upper() if regex.groups >= 2 else 'ALL'
+                route = as_text(m.group(regex.groups))
+                line_no = lines.line(m.start())
+                endpoints.append((line_no, framework, method, route))
+
+        # 4) Ищем AJAX-запросы (общие шаблоны)
+        ajax_matches = window_matches(for_buffer(catalog.AJAX_PATTERN_EXT, text), text, limit,
+                                      len(patterns), skip, spill) \
+            if selected[-1] == len(patterns) else ()
+        for match in ajax_matches:
+            url = as_text(next((g for g in match.groups() if g), None))
+            if not url:
+                continue
+            line_no = lines.line(match.start())
+            ajax.append((line_no, url))
+
+        return ((endpoints, ajax) if endpoints or ajax else None), spill or None
+
+    def join_windows(self, parts: List[Tuple[int, Tuple[list, list]]]) -> Tuple[list, list]:
+        endpoints = [(line_no + before, framework, method, route)
+                     for before, (found, _) in parts for line_no, framework, method, route in found]
+        ajax = [(line_no + before, url) for before, (_, found) in parts for line_no, url in found]
+        return endpoints, ajax
+
+    def collect(self, entry: FileEntry, found: Tuple[list, list]) -> None:
+        endpoints, ajax = found
+        rel = entry.rel
+        if self.sink is not None:
+            # потоковый режим: находки файла сразу уходят в приёмник
+            for line_no, framework, method, route in sorted(endpoints, key=lambda x: x[0]):
+                self.sink('endpoint', {'file': rel, 'line': line_no, 'framework': framework,
+                                       'method': method, 'endpoint': route})
+            for line_no, url in sorted(set(map(tuple, ajax))):
+                self.sink('ajax', {'file': rel, 'line': line_no, 'call': url})
+            return
+        # находки файла — одним блоком, по строкам (AJAX — без повторов;
+        # из кэша пары приходят списками)
+        self._endpoints.add_file(rel, sorted(endpoints, key=lambda x: x[0]))
+        self._ajax.add_file(rel, sorted(set(map(tuple, ajax))))
 
-    def detect(self) -> Dict[str, List[Dict[str, Any]]]:
-        raw: List[tuple] = []     # [(file, line, framework, method, route), ...]
-        ajax_calls = set()
-
-        for root, _, files in os.walk(self.directory):
-            for fname in files:
-                fpath = os.path.join(root, fname)
-
-                # 1) Пропускаем игнор-файлы
-                if any(pat.search(fpath) for pat in ENDPOINT_IGNORE_FILE_PATTERNS):
-                    continue
-
-                # 2) Только кодовые расширения
-                ext = os.path.splitext(fname)[1].lower()
-                if ext not in EXTENSION_LANG_MAP:
-                    continue
-
-                # 3) чтение
-                try:
-                    text = open(fpath, 'r', encoding='utf-8', errors='ignore').read()
-                except Exception:
-                    continue
-
-                rel = os.path.relpath(fpath, start=self.directory)
-
-                # 4) Определяем язык файла и сразу берём только его паттерны
-                lang_for_file = EXTENSION_LANG_MAP[ext]
-                if lang_for_file not in self.langs:
-                    continue
-
-                for regex, framework in ENDPOINT_PATTERNS.get(lang_for_file, []):
-                    for m in regex.finditer(text):
-                        method = m.group(1).upper() if regex.groups >= 2 else 'ALL'
-                        route = m.group(regex.groups)
-                        line_no = text[:m.start()].count('\n') + 1
-                        raw.append((
-                            rel,
-                            line_no,
-                            framework,
-                            method,
-                            route
-                        ))
-
-                # 4) Ищем AJAX-запросы (общие шаблоны)
-                for match in AJAX_PATTERN_EXT.finditer(text):
-                    url = next((g for g in match.groups() if g), None)
-                    if not url:
-                        continue
-                    line_no = text[:match.start()].count('\n') + 1
-                    ajax_calls.add((
-                        rel,
-                        line_no,
-                        url
-                    ))
-
-        # 6) Сортировка и форматирование
-        raw.sort(key=lambda x: (x[0], x[1]))
-        endpoint_list: List[Dict[str, Any]] = []
-        for f, ln, fw, meth, ep in raw:
-            endpoint_list.append({
-                'file':      f,
-                'line':      ln,
-                'framework': fw,
-                'method':    meth,
-                'endpoint':  ep
-            })
-
-        ajax_list = [
-            {'file': fp, 'line': ln, 'call': url}
-            for fp, ln, url in sorted(ajax_calls)
-        ]
-
-        return {'endpoints': endpoint_list, 'ajax': ajax_list}
+    def finish(self) -> Dict[str, FindingTable]:
+        """
+        {'endpoints': ..., 'ajax': ...} по путям и строкам; элементы —
+        словари {'file', 'line', ...}, которые строятся только при выводе.
+        """
+        # 5) Блоки файлов — по возрастанию пути (collect идёт в порядке индекса)
+        self._endpoints.sort_by_path()
+        self._ajax.sort_by_path()
+        return {'endpoints': self._endpoints, 'ajax': self._ajax}
 
     def confidence(self) -> float:
-        res = self.detect()
-        return 1.0 if (res['endpoints'] or res['ajax']) else 0.0
+        # по счётчику прохода: в потоковом режиме списки результата пусты
+        self.result()
+        return 1.0 if self.matched else 0.0
@@ -1,66 +1,63 @@
 import os
-import glob
+import re
 from typing import List, Dict, Any, Tuple
 from .base import Detector
+from ..file_index import FileIndex
 
 class FileDetector(Detector):
-    """Детектор наличия файлов/директорий и поиска контента внутри файлов."""
-    def __init__(self, directory: str, configs: List[Dict[str, Any]]):
-        super().__init__(directory)
+    """
+    Детектор наличия файлов/директорий и поиска контента внутри файлов.
+    Пути проверяются по индексу путей проекта (FileIndex.path_index), а не по диску.
+    """
+    def __init__(self, directory: str, configs: List[Dict[str, Any]], index: FileIndex = None):
+        super().__init__(directory, index)
         self.configs = configs
         self._matches: List[Tuple[str, Any]] = []
 
-    def detect(self) -> Tuple[bool, List[Tuple[str, Any]]]:
+    def detect(self, first: bool = False) -> Tuple[bool, List[Tuple[str, Any]]]:
         """
         Ищет файлы и директории по списку конфигураций.
         Каждый cfg должен содержать:
           - 'type': 'file' или 'dir'
-          - 'path': шаблон пути
+          - 'path': шаблон пути (glob) или 'pattern': re.Pattern по имени
           - опционально 'content' для файлов
-        Возвращает (found, matches), где matches — список (путь, content_or_None).
+        Возвращает (found, matches), где matches — список (путь, content_or_None);
+        first=True — поиск до первого совпадения (план стека, см. StackAnalyzer);
+        такой неполный результат не запоминается (см. Detector.result).
         """
         self._matches.clear()
-    
+        paths = self.index.path_index()
+        examined = 0
+
         for cfg in self.configs:
             expected_type = cfg.get('type', 'file')
-
-            # 1) Если cfg содержит re.Pattern — фильтруем по нему
+            # re.Pattern — по именам файлов и каталогов, иначе glob по cfg['path']
             if isinstance(cfg.get('pattern'), re.Pattern):
-                pat: re.Pattern = cfg['pattern']
-                for root, _, files in os.walk(self.directory):
-                    for fname in files:
-                        if pat.search(fname):
-                            full = os.path.join(root, fname)
-                            if expected_type == 'dir' and os.path.isdir(full):
-                                self._matches.append((full, None))
-                            elif expected_type == 'file' and os.path.isfile(full):
-                                # при необходимости ищем по содержимому
-                                if 'content' in cfg:
-                                    text = open(full, 'r', encoding='utf-8', errors='ignore').read()
-                                    if cfg['content'] in text:
-                                        self._matches.append((full, cfg['content']))
-                                else:
-                                    self._matches.append((full, None))
-                continue
-
-            # 2) Иначе — классический glob по cfg['path']
-            pattern_str = cfg.get('path', '')
-            for full in glob.glob(os.path.join(self.directory, pattern_str), recursive=True):
-                if expected_type == 'dir' and os.path.isdir(full):
+                found = paths.search(cfg['pattern'])
+            else:
+                found = paths.glob(cfg.get('path', ''))
+            for rel in found:
+                if paths.kind(rel) != expected_type:
+                    continue
+                examined += 1
+                full = os.path.join(self.directory, rel)
+                # при необходимости ищем по содержимому
+                if expected_type == 'file' and 'content' in cfg:
+                    text = self.index.read(full) or ''
+                    if cfg['content'] in text:
+                        self._matches.append((full, cfg['content']))
+                else:
                     self._matches.append((full, None))
-                elif expected_type == 'file' and os.path.isfile(full):
-                    if 'content' in cfg:
-                        text = open(full, 'r', encoding='utf-8', errors='ignore').read()
-                        if cfg['content'] in text:
-                            self._matches.append((full, cfg['content']))
-                    else:
-                        self._matches.append((full, None))
-    
+                if first and self._matches:
+                    return (True, self._matches)
+
+        self.remember((bool(self._matches), list(self._matches)), examined, len(self._matches))
         return (bool(self._matches), self._matches)
 
     def confidence(self) -> float:
         """
         Оценка уверенности: отношение числа найденных совпадений к общему числу конфигураций.
         """
+        self.result()
         total = len(self.configs)
-        return (len(self._matches) / total) if total > 0 else 0.0
\ No newline at end of file
+        return (self.matched / total) if total > 0 else 0.0
\ No newline at end of file
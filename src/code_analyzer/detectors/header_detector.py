@@ -1,54 +1,127 @@
-import os, re
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Tuple
 from .base import Detector
-from ..patterns import HEADER_PATTERNS, ENDPOINT_IGNORE_FILE_PATTERNS
+from ..engine import run_scan
+from ..file_index import FileEntry, FileIndex, PathFilter
+from ..findings import FindingTable
+from ..prefilter import LiteralPrefilter
+from ..utils import LineIndex, as_text, for_buffer
+from ..windows import match_width, window_matches
+from .. import patterns as catalog
+from ..patterns import HEADER_PATTERNS
+
+# Привязка расширений к языкам для поиска заголовков
+HEADER_LANG_MAP = {'.js': 'JavaScript', '.py': 'Python', '.go': 'Go', '.java': 'Java'}
 
 class HeaderDetector(Detector):
-    def __init__(self, directory: str, langs: List[str]):
-        super().__init__(directory)
+    # scan_file принимает и bytes/mmap (см. engine.py, режим mmap)
+    supports_bytes = True
+
+    def __init__(self, directory: str, langs: List[str], index: FileIndex = None):
+        super().__init__(directory, index)
         self.langs = langs
+        self._ignore = PathFilter(catalog.ENDPOINT_IGNORE_FILE_PATTERNS)
+        self._prefilters = {
+            lang: LiteralPrefilter([regex for regex, _ in HEADER_PATTERNS.get(lang, [])])
+            for lang in set(HEADER_LANG_MAP.values()) if lang in langs
+        }
+        self._overlap: Optional[int] = None
+        self.reset()
+
+    def detect(self) -> FindingTable:
+        return run_scan(self.index, [self])[0]
+
+    # --- протокол сканера (см. engine.py) ---
+
+    def reset(self) -> None:
+        # находки столбцами (см. findings.py): файл — номер в таблице путей прохода
+        self._results = FindingTable(('framework', 'method', 'endpoint', 'headers'),
+                                     intern=('framework', 'method'))
+
+    def accepts(self, entry: FileEntry) -> bool:
+        lang = HEADER_LANG_MAP.get(entry.ext)
+        if lang not in self.langs:
+            return False
+        return not self._ignore.ignored(entry.rel)
+
+    def cache_key(self) -> str:
+        return 'headers'
+
+    def scan_file(self, entry: FileEntry, text) -> Optional[List[tuple]]:
+        """
+        Находит HTTP-заголовки в одном файле (str или bytes/mmap).
+        Возвращает [(line, framework, method, url, headers)] или None.
+        """
+        found = self.scan_window(entry, text, len(text))[0]
+        return [row for _, rows in found for row in rows] if found else None
+
+    # --- сканирование окнами (см. windows.py) ---
+
+    def window_overlap(self) -> int:
+        if self._overlap is None:
+            self._overlap = match_width([regex for lang in self._prefilters
+                                         for regex, _ in HEADER_PATTERNS.get(lang, [])])
+        return self._overlap
+
+    def scan_window(self, entry: FileEntry, text, limit: int, skip: Dict[int, int] = None
+                    ) -> Tuple[Optional[List[Tuple[int, List[tuple]]]], Optional[Dict[int, int]]]:
+        """
+        Как scan_file, но только совпадения, начинающиеся до смещения limit,
+        по шаблонам: [(номер_шаблона, [(line, framework, method, url, headers)])];
+        цепочки поиска — номера шаблонов.
+        """
+        lang = HEADER_LANG_MAP[entry.ext]
+        selected = self._prefilters[lang].candidates(text)
+        if not selected:
+            return None, None
+        patterns = HEADER_PATTERNS.get(lang, [])
+
+        found = []
+        spill: Dict[int, int] = {}
+        lines = LineIndex(text)
+        for i in selected:
+            regex, framework = patterns[i]
+            rows = []
+            for m in window_matches(for_buffer(regex, text), text, limit, i, skip, spill):
+                gd = {name: as_text(value) for name, value in m.groupdict().items()}
+                ln = lines.line(m.start())
+                hdrs = gd.get('headers')
+                if not hdrs and gd.get('headerName'):
+                    hdrs = {gd['headerName']: gd.get('headerValue')}
+                if isinstance(hdrs, dict):
+                    hdrs = {k.lower(): v for k, v in hdrs.items()}
+                rows.append((ln, framework, gd.get('method'), gd.get('url'), hdrs))
+            if rows:
+                found.append((i, rows))
+        return found or None, spill or None
+
+    def join_windows(self, parts: List[Tuple[int, List[Tuple[int, List[tuple]]]]]) -> List[tuple]:
+        """Находки файла в том же порядке, что у scan_file: по шаблонам, затем по окнам."""
+        by_pattern: Dict[int, List[tuple]] = {}
+        for before, found in parts:
+            for i, rows in found:
+                by_pattern.setdefault(i, []).extend(
+                    (ln + before, framework, method, url, hdrs) for ln, framework, method, url, hdrs in rows)
+        return [row for i in sorted(by_pattern) for row in by_pattern[i]]
+
+    def collect(self, entry: FileEntry, found: List[tuple]) -> None:
+        if self.sink is None:
+            self._results.add_file(entry.rel, found)
+            return
+        # в потоковом режиме записи сразу уходят в приёмник
+        for ln, framework, method, url, hdrs in found:
+            self.sink('header', {
+                'file':      entry.rel,
+                'line':      ln,
+                'framework': framework,
+                'method':    method,
+                'endpoint':  url,
+                'headers':   hdrs,
+            })
 
-    def detect(self) -> List[Dict[str, Any]]:
-        results: List[Dict[str, Any]] = []
-
-        for root, _, files in os.walk(self.directory):
-            for fname in files:
-                fpath = os.path.join(root, fname)
-                if any(pat.search(fpath) for pat in ENDPOINT_IGNORE_FILE_PATTERNS):
-                    continue
-
-                ext = os.path.splitext(fname)[1].lower()
-                lang = {'.js':'JavaScript', '.py':'Python', '.go':'Go', '.java':'Java'}.get(ext)
-                if lang not in self.langs:
-                    continue
-
-                fpath = os.path.join(root, fname)
-                try:
-                    text = open(fpath, encoding='utf-8', errors='ignore').read()
-                except:
-                    continue
-                rel = os.path.relpath(fpath, self.directory)
-
-                for regex, framework in HEADER_PATTERNS.get(lang, []):
-                    for m in regex.finditer(text):
-                        gd = m.groupdict()
-                        ln = text[:m.start()].count('\n') + 1
-                        hdrs = gd.get('headers')
-                        if not hdrs and gd.get('headerName'):
-                            hdrs = {gd['headerName']: gd.get('headerValue')}
-                        if isinstance(hdrs, dict):
-                            hdrs = {k.lower(): v for k, v in hdrs.items()}
-
-                        results.append({
-                            'file':      rel,
-                            'line':      ln,
-                            'framework': framework,
-                            'method':    gd.get('method'),
-                            'endpoint':  gd.get('url'),
-                            'headers':   hdrs,
-                        })
-
-        return results
+    def finish(self) -> FindingTable:
+        """Заголовки в порядке обхода; элементы — словари отчёта, строятся при выводе."""
+        return self._results
 
     def confidence(self) -> float:
-        return 1.0 if self.detect() else 0.0
+        self.result()
+        return 1.0 if self.matched else 0.0
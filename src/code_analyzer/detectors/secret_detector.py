@@ -0,0 +1,152 @@
+import math
+import re
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+from .base import Detector
+from ..cache import settings_key
+from ..engine import run_scan
+from ..file_index import FileEntry, FileIndex
+from ..prefilter import LiteralPrefilter
+from ..utils import as_text, for_buffer
+from ..windows import match_width
+from .. import patterns as catalog
+
+# Значение из одних букв, '_', '-' и точек — ссылка на переменную или атрибут
+# (settings.DB_PASSWORD, token_value) или имя (quoted-string), а не сам секрет
+_IDENTIFIER = re.compile(r'[A-Za-z_]+(?:[.\-][A-Za-z_]+)*')
+# Подстановки шаблонизаторов и конфигов: ${VAR}, {{ var }}, %(var)s, <password>
+_PLACEHOLDER_START = ('${', '{{', '%(', '<')
+
+
+def shannon_entropy(value: str) -> float:
+    """Энтропия Шеннона строки в битах на символ."""
+    if not value:
+        return 0.0
+    size = len(value)
+    return -sum(n / size * math.log2(n / size) for n in Counter(value).values())
+
+
+def plausible(value: str, min_entropy: float) -> bool:
+    """Похоже ли значение правила по ключевому слову на настоящий секрет."""
+    if value.startswith(_PLACEHOLDER_START) or _IDENTIFIER.fullmatch(value):
+        return False
+    return shannon_entropy(value) >= min_entropy
+
+
+class SecretDetector(Detector):
+    """
+    Поиск секретов во всех текстовых файлах общего прохода: форматы токенов
+    провайдеров и присваивания именам с ключевыми словами (SECRET_PATTERNS).
+
+    Предфильтр литералов отсеивает файлы без префиксов токенов и ключевых
+    слов, а в остальных файлах выражение правила запускается только на
+    строках с его литералами; энтропия считается только для значений,
+    которые нашли правила по ключевым словам.
+    """
+
+    # scan_file принимает и bytes/mmap (см. engine.py, режим mmap)
+    supports_bytes = True
+
+    def __init__(self, directory: str, patterns: List[Tuple[str, re.Pattern, Optional[float]]] = None,
+                 index: FileIndex = None):
+        super().__init__(directory, index)
+        self.patterns = patterns or catalog.SECRET_PATTERNS
+        self._prefilter = LiteralPrefilter([regex for _, regex, _ in self.patterns])
+        self._overlap: Optional[int] = None
+        self.reset()
+
+    def detect(self) -> List[Tuple[str, List[str]]]:
+        """
+        Сканирует все текстовые файлы проекта.
+        Возвращает список (путь_к_файлу, ["правило: значение", ...]).
+        """
+        return run_scan(self.index, [self])[0]
+
+    # --- протокол сканера (см. engine.py) ---
+
+    def reset(self) -> None:
+        self.secrets: List[Tuple[str, List[str]]] = []
+
+    def accepts(self, entry: FileEntry) -> bool:
+        return True
+
+    def cache_key(self) -> str:
+        return settings_key('secrets', [(name, regex.pattern, regex.flags, min_entropy)
+                                        for name, regex, min_entropy in self.patterns])
+
+    def scan_file(self, entry: FileEntry, text) -> Optional[List[str]]:
+        """
+        Возвращает ["правило: значение", ...] в порядке появления в файле или None.
+        Значение, найденное несколькими правилами, приписывается первому
+        из них по каталогу (форматы провайдеров идут раньше общих правил).
+        """
+        found = self.scan_window(entry, text, len(text))[0]
+        return self.join_windows([(0, found)]) if found else None
+
+    # --- сканирование окнами (см. windows.py) ---
+
+    def window_overlap(self) -> int:
+        if self._overlap is None:
+            self._overlap = match_width([regex for _, regex, _ in self.patterns])
+        return self._overlap
+
+    def scan_window(self, entry: FileEntry, text, limit: int, skip: Dict[int, int] = None
+                    ) -> Tuple[Optional[List[Tuple[int, int, str]]], Optional[Dict[int, int]]]:
+        """
+        Значения, найденные до смещения limit: [(номер_правила, смещение, значение)],
+        каждое значение — один раз, с первым нашедшим его правилом каталога;
+        цепочки поиска (перенос, см. windows.py) — номера правил.
+        """
+        selected = self._prefilter.candidates(text)
+        if not selected:
+            return None, None
+        found: Dict[str, Tuple[int, int]] = {}
+        spill: Dict[int, int] = {}
+        for i in selected:
+            _, regex, min_entropy = self.patterns[i]
+            compiled = for_buffer(regex, text)
+            last = skip.get(i, 0) if skip else 0
+            # только строки с литералами правила: ключевое слово или префикс токена
+            for start, end in self._prefilter.lines(text, i) or [(0, len(text))]:
+                if start >= limit:
+                    break
+                if end <= last:
+                    continue
+                for m in compiled.finditer(text, max(start, last), end):
+                    if m.start() >= limit:
+                        break
+                    last = m.end()
+                    value = as_text(m.group(1) if regex.groups else m.group(0))
+                    if min_entropy is not None and not plausible(value, min_entropy):
+                        continue
+                    if value not in found:
+                        found[value] = (i, m.start())
+            if last > limit:
+                spill[i] = last - limit
+        return [(i, pos, value) for value, (i, pos) in found.items()] or None, spill or None
+
+    def join_windows(self, parts: List[Tuple[int, List[Tuple[int, int, str]]]]) -> Optional[List[str]]:
+        """
+        Значение приписывается первому по каталогу правилу, нашедшему его в
+        любом окне, и стоит на месте первого совпадения этого правила.
+        """
+        best: Dict[str, Tuple[int, int, int]] = {}
+        for k, (_, found) in enumerate(parts):
+            for i, pos, value in found:
+                if value not in best or (i, k, pos) < best[value]:
+                    best[value] = (i, k, pos)
+        return [f'{self.patterns[i][0]}: {value}' for value, (i, _, _) in
+                sorted(best.items(), key=lambda item: item[1][1:])] or None
+
+    def collect(self, entry: FileEntry, values: List[str]) -> None:
+        if self.sink is not None:
+            self.sink('secret', {'file': entry.path, 'values': values})
+        else:
+            self.secrets.append((entry.path, values))
+
+    def finish(self) -> List[Tuple[str, List[str]]]:
+        return self.secrets
+
+    def confidence(self) -> float:
+        self.result()
+        return 1.0 if self.matched else 0.0
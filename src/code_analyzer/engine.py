@@ -0,0 +1,496 @@
+"""
+Движок сканирования: единица работы — один файл.
+
+Сканер (детектор или анализатор) реализует протокол:
+  - reset()                      — сброс накопленных результатов;
+  - accepts(entry) -> bool       — нужен ли сканеру этот файл (без чтения);
+  - scan_file(entry, text)       — анализ одного файла, возвращает компактные
+                                   находки (picklable) или None; выполняется
+                                   в рабочем процессе и не меняет состояние;
+  - collect(entry, found)        — приём находок в родительском процессе;
+  - finish()                     — итоговый результат сканера;
+  - cache_key() -> str           — (необязательно) ключ находок сканера
+                                   в постоянном кэше, см. cache.py;
+  - supports_bytes = True        — (необязательно) scan_file принимает
+                                   и bytes/mmap, а не только str;
+  - remember(result, examined, matched)
+                                 — (необязательно) итог прохода и его счётчики:
+                                   файлов просмотрено и файлов с находками
+                                   (см. Detector.result);
+  - window_overlap(), scan_window(entry, text, limit, skip), join_windows(parts)
+                                 — (необязательно) сканирование больших
+                                   файлов окнами, см. windows.py.
+
+В режиме mmap (use_mmap) файл отображается в память и передаётся
+сканерам с supports_bytes без декодирования; остальные получают текст,
+декодированный один раз на файл (decode_text).
+
+Файлы крупнее window_size сканеры с поддержкой окон получают окнами
+по границам строк (windows.py): при jobs > 1 окна одного файла
+сканируются в пуле параллельно, в памяти процесса — не больше окна.
+Остальным сканерам такой файл передаётся целиком.
+
+Двоичные и слишком большие файлы (см. FileIndex.scannable) сканерам не
+передаются. collect() всегда вызывается в порядке индекса, поэтому
+результат не зависит от числа рабочих процессов и от того, взяты находки
+из кэша или получены заново.
+"""
+import mmap
+import os
+import threading
+from itertools import chain
+from operator import itemgetter
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from .cache import CacheRecord, ScanCache, content_digest
+from .file_index import FileEntry, FileIndex, decode_text
+from .readahead import DEFAULT_QUEUE_DEPTH, read_ahead
+from .windows import DEFAULT_WINDOW_SIZE, Window, plan_windows, read_window, window_digest, window_text
+
+# Размер пачки файлов, отправляемой рабочему процессу за раз; внутри
+# пачки работает упреждающее чтение процесса
+CHUNK_SIZE = 64
+
+# Сканеры и настройки чтения рабочего процесса: передаются один раз при
+# старте пула, вместе со сканерами в процесс попадают скомпилированные
+# каталоги patterns.py
+_worker_scanners: Optional[Sequence[Any]] = None
+_worker_reading: Tuple[bool, int, int] = (False, 0, DEFAULT_QUEUE_DEPTH)
+
+
+class Cancelled(Exception):
+    """Проход остановлен по признаку отмены (см. CancelToken)."""
+
+
+class CancelToken:
+    """
+    Признак отмены анализа: выставляется из другого потока (cancel()),
+    проверяется в родительском процессе между файлами (check()). Рабочим
+    процессам не передаётся — при отмене пул завершается целиком.
+    """
+
+    def __init__(self):
+        self._event = threading.Event()
+
+    def cancel(self) -> None:
+        self._event.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def check(self) -> None:
+        """Исключение Cancelled, если анализ отменён."""
+        if self._event.is_set():
+            raise Cancelled('анализ отменён')
+
+
+def _init_worker(scanners: Sequence[Any], reading: Tuple[bool, int, int]) -> None:
+    global _worker_scanners, _worker_reading
+    _worker_scanners = scanners
+    _worker_reading = reading
+
+
+def _load(entry: FileEntry, use_mmap: bool):
+    """Содержимое файла для сканеров: str или (в режиме mmap) буфер."""
+    if not use_mmap:
+        return entry.read()
+    data = entry.buffer()
+    if isinstance(data, mmap.mmap) and hasattr(mmap, 'MADV_WILLNEED'):
+        # упреждающее чтение страниц отображения — иначе поток-читатель
+        # только откроет файл, а ждать диска будет уже разбор
+        data.madvise(mmap.MADV_WILLNEED)
+    return data
+
+
+def _unload(data) -> None:
+    if isinstance(data, mmap.mmap):
+        data.close()
+
+
+def _reads(plans: Sequence[tuple], reading: Tuple[bool, int, int]):
+    """
+    Пары (план, содержимое файла plan[0]) в порядке plans; при reading[1]
+    потоках-читателях файлы загружаются заранее (см. readahead.py).
+    """
+    use_mmap, readers, depth = reading
+    return read_ahead(plans, lambda plan: _load(plan[0], use_mmap), readers, depth)
+
+
+def _chunks(tasks: List[Any]) -> List[List[Any]]:
+    return [tasks[i:i + CHUNK_SIZE] for i in range(0, len(tasks), CHUNK_SIZE)]
+
+
+def _apply(entry: FileEntry, scanners: Sequence[Any], todo: List[int], data) -> List[Tuple[int, Any]]:
+    """
+    scan_file выбранных сканеров по содержимому data; сканерам без
+    supports_bytes буфер декодируется в текст один раз.
+    """
+    text = data if isinstance(data, str) else None
+    found = []
+    for i in todo:
+        scanner = scanners[i]
+        if getattr(scanner, 'supports_bytes', False):
+            found.append((i, scanner.scan_file(entry, data)))
+            continue
+        if text is None:
+            text = decode_text(data)
+        found.append((i, scanner.scan_file(entry, text)))
+    return found
+
+
+def _wanted(entry: FileEntry, scanners: Sequence[Any]) -> List[int]:
+    """Сканеры, которым нужен файл (решение без чтения)."""
+    return [i for i, scanner in enumerate(scanners) if scanner.accepts(entry)]
+
+
+def _scan_entry(entry: FileEntry, scanners: Sequence[Any], wanted: List[int], data) -> List[Tuple[int, Any]]:
+    """Прогоняет сканеры wanted по уже прочитанному содержимому файла."""
+    if data is None:
+        return []
+    try:
+        return [(i, res) for i, res in _apply(entry, scanners, wanted, data) if res is not None]
+    finally:
+        _unload(data)
+
+
+def _scan_chunk(tasks: List[Tuple[str, str, int, List[int]]]) -> List[List[Tuple[int, Any]]]:
+    plans = [(FileEntry(path, rel, size, retain=False), wanted) for path, rel, size, wanted in tasks]
+    return [_scan_entry(entry, _worker_scanners, wanted, data)
+            for (entry, wanted), data in _reads(plans, _worker_reading)]
+
+
+def _scan_changed(entry: FileEntry, scanners: Sequence[Any], wanted: List[int],
+                  known: List[int], cached_digest: Optional[str], data):
+    """
+    Сканирование с кэшем по прочитанному содержимому: считается хэш.
+    Если он совпал с закэшированным — прогоняются только сканеры без
+    находок в кэше (known — те, у кого они есть), иначе все wanted.
+    Возвращает (хэш, содержимое_не_менялось, [(i, находки)]) или None.
+    """
+    if data is None:
+        return None
+    try:
+        digest = content_digest(data)
+        same = digest == cached_digest
+        todo = [i for i in wanted if i not in known] if same else wanted
+        return digest, same, _apply(entry, scanners, todo, data)
+    finally:
+        _unload(data)
+
+
+def _changed_chunk(tasks) -> List[Optional[Tuple[str, bool, List[Tuple[int, Any]]]]]:
+    plans = [(FileEntry(path, rel, size, retain=False), wanted, known, cached_digest)
+             for path, rel, size, wanted, known, cached_digest in tasks]
+    return [_scan_changed(entry, _worker_scanners, wanted, known, cached_digest, data)
+            for (entry, wanted, known, cached_digest), data in _reads(plans, _worker_reading)]
+
+
+def _windowed(scanner: Any) -> bool:
+    return hasattr(scanner, 'window_overlap')
+
+
+def _large(entry: FileEntry, scanners: Sequence[Any], wanted: List[int], window_size: int) -> bool:
+    """Файл сканируется окнами: крупнее window_size и нужен сканерам с поддержкой окон."""
+    return 0 < window_size < entry.size and any(_windowed(scanners[i]) for i in wanted)
+
+
+def _plan_windows(entry: FileEntry, scanners: Sequence[Any], wanted: List[int],
+                  window_size: int) -> List[Window]:
+    overlap = max(scanners[i].window_overlap() for i in wanted if _windowed(scanners[i]))
+    return plan_windows(entry.path, entry.size, window_size, overlap)
+
+
+def _scan_window(entry: FileEntry, scanners: Sequence[Any], todo: List[int], window: Window,
+                 use_mmap: bool, skips: Dict[int, Any] = None) -> Optional[List[Tuple[int, int, Any, Any]]]:
+    """
+    scan_window сканеров todo по одному окну: [(i, строк_в_отрезке_окна, находки,
+    перенос)]; skips — перенос предыдущего окна по номерам сканеров. Строки
+    считаются в том виде, в котором окно видит сканер (bytes или текст).
+    """
+    data = read_window(entry.path, window)
+    if data is None:
+        return None
+    split = window[1] - window[0]
+    text = None
+    found = []
+    for i in todo:
+        scanner = scanners[i]
+        if use_mmap and getattr(scanner, 'supports_bytes', False):
+            found.append((i, data.count(b'\n', 0, split),
+                          *scanner.scan_window(entry, data, split, skips and skips.get(i))))
+            continue
+        if text is None:
+            text, limit = window_text(data, split)
+            lines = text.count('\n', 0, limit)
+        found.append((i, lines, *scanner.scan_window(entry, text, limit, skips and skips.get(i))))
+    return found
+
+
+def _pool(jobs: int, scanners: Sequence[Any], reading: Tuple[bool, int, int],
+          start_method: Optional[str]):
+    """Пул рабочих процессов прохода; start_method — см. run_scan."""
+    import multiprocessing   # только для пула: не замедляет запуск с jobs == 1
+    context = multiprocessing.get_context(start_method)
+    return context.Pool(jobs, initializer=_init_worker, initargs=(scanners, reading))
+
+
+def _window_task(task) -> Optional[List[Tuple[int, int, Any, Any]]]:
+    path, rel, size, todo, window = task
+    return _scan_window(FileEntry(path, rel, size, retain=False), _worker_scanners, todo,
+                        window, _worker_reading[0])
+
+
+def _scan_large(entry: FileEntry, scanners: Sequence[Any], todo: List[int], windows: List[Window],
+                use_mmap: bool, pool) -> Optional[List[Tuple[int, Any]]]:
+    """
+    Как _apply, но для файла, сканируемого окнами: сканеры с поддержкой окон
+    получают окна (в пуле pool, если он есть, — параллельно), находки окон
+    сливаются join_windows; остальные сканеры получают файл целиком.
+    Окна сканируются без переноса; при слиянии по порядку окно, в которое
+    сканер передал перенос (совпадение пересекло шов), сканируется им
+    заново с переносом (см. windows.py). None — файл не прочитался.
+    """
+    if not windows:
+        return None
+    split = [i for i in todo if _windowed(scanners[i])]
+    whole = [i for i in todo if not _windowed(scanners[i])]
+    found: List[Tuple[int, Any]] = []
+    if split:
+        if pool is None:
+            results = (_scan_window(entry, scanners, split, window, use_mmap) for window in windows)
+        else:
+            results = pool.imap(_window_task, [(entry.path, entry.rel, entry.size, split, window)
+                                               for window in windows])
+        parts = {i: [] for i in split}
+        before = dict.fromkeys(split, 0)
+        carry: Dict[int, Any] = {}
+        for window, window_found in zip(windows, results):
+            if window_found is None:
+                return None
+            if carry:
+                redo = _scan_window(entry, scanners, list(carry), window, use_mmap, carry)
+                if redo is None:
+                    return None
+                window_found = [found for found in window_found if found[0] not in carry] + redo
+            carry = {}
+            for i, lines, res, spill in window_found:
+                if res is not None:
+                    parts[i].append((before[i], res))
+                before[i] += lines
+                if spill:
+                    carry[i] = spill
+        found = [(i, scanners[i].join_windows(parts[i]) if parts[i] else None) for i in split]
+    if whole:
+        data = _load(entry, use_mmap)
+        if data is None:
+            return None
+        try:
+            found.extend(_apply(entry, scanners, whole, data))
+        finally:
+            _unload(data)
+    return sorted(found, key=itemgetter(0))
+
+
+def _changed_large(entry: FileEntry, scanners: Sequence[Any], wanted: List[int], known: List[int],
+                   cached_digest: Optional[str], window_size: int, use_mmap: bool, pool):
+    """_scan_changed для файла, сканируемого окнами: хэш считается по окнам."""
+    windows = _plan_windows(entry, scanners, wanted, window_size)
+    digest = window_digest(entry.path, windows, use_mmap)
+    if digest is None:
+        return None
+    same = digest == cached_digest
+    todo = [i for i in wanted if i not in known] if same else wanted
+    found = _scan_large(entry, scanners, todo, windows, use_mmap, pool)
+    return None if found is None else (digest, same, found)
+
+
+def _collect_cached(entry: FileEntry, scanners: Sequence[Any], keys: List[Optional[str]],
+                    wanted: List[int], findings: dict, fresh: dict, matched: List[int]) -> None:
+    for i in wanted:
+        res = fresh[i] if i in fresh else findings.get(keys[i])
+        if res is not None:
+            scanners[i].collect(entry, res)
+            matched[i] += 1
+
+
+def _count(plans: Sequence[tuple], examined: List[int]) -> None:
+    """Сколько файлов просмотрит каждый сканер: plans — (entry, wanted, ...)."""
+    for plan in plans:
+        for i in plan[1]:
+            examined[i] += 1
+
+
+def _finish(scanners: Sequence[Any], examined: List[int], matched: List[int]) -> List[Any]:
+    """Результаты finish(); сканеры с remember получают их вместе со счётчиками прохода."""
+    results = [scanner.finish() for scanner in scanners]
+    for scanner, result, seen, hits in zip(scanners, results, examined, matched):
+        remember = getattr(scanner, 'remember', None)
+        if remember is not None:
+            remember(result, seen, hits)
+    return results
+
+
+def _cache_key(scanner: Any, use_mmap: bool) -> Optional[str]:
+    if not hasattr(scanner, 'cache_key'):
+        return None
+    # находки по байтам хранятся отдельно: \w и IGNORECASE там только ASCII
+    if use_mmap and getattr(scanner, 'supports_bytes', False):
+        return scanner.cache_key() + ':bytes'
+    return scanner.cache_key()
+
+
+def _run_cached(index: FileIndex, scanners: Sequence[Any], jobs: int, cache: ScanCache,
+                reading: Tuple[bool, int, int], cancel: Optional[CancelToken],
+                examined: List[int], matched: List[int], window_size: int,
+                start_method: Optional[str]) -> None:
+    keys = [_cache_key(scanner, reading[0]) for scanner in scanners]
+
+    # 1) План без чтения файлов: кому нужен файл и что о нём уже известно
+    plans: List[Tuple[FileEntry, List[int], Optional[CacheRecord], List[int], bool, bool]] = []
+    for entry in index.scannable():
+        wanted = _wanted(entry, scanners)
+        if not wanted:
+            continue
+        record = cache.lookup(entry)
+        known = [i for i in wanted if record is not None and keys[i] in record[3]]
+        hit = len(known) == len(wanted) and cache.is_fresh(entry, record)
+        plans.append((entry, wanted, record, known, hit, _large(entry, scanners, wanted, window_size)))
+    _count(plans, examined)
+
+    # 2) Читаются только новые и изменённые файлы; файлы, сканируемые
+    #    окнами, — в своё время при слиянии
+    pending = [(entry, wanted, known, record[2] if record is not None else None)
+               for entry, wanted, record, known, hit, large in plans if not hit and not large]
+    # пул нужен и одним большим файлам: их окна сканируются в нём
+    windowed = any(large and not hit for _, _, _, _, hit, large in plans)
+    pool = reads = None
+    if jobs == 1 or not (pending or windowed):
+        reads = _reads(pending, reading)
+        results = (_scan_changed(entry, scanners, wanted, known, digest, data)
+                   for (entry, wanted, known, digest), data in reads)
+    else:
+        tasks = [(entry.path, entry.rel, entry.size, wanted, known, digest)
+                 for entry, wanted, known, digest in pending]
+        pool = _pool(jobs, scanners, reading, start_method)
+        results = chain.from_iterable(pool.imap(_changed_chunk, _chunks(tasks)))
+
+    # 3) Слияние в порядке индекса: находки из кэша и свежие
+    try:
+        for entry, wanted, record, known, hit, large in plans:
+            if cancel is not None:
+                cancel.check()
+            if hit:
+                cache.hits += 1
+                _collect_cached(entry, scanners, keys, wanted, record[3], {}, matched)
+                continue
+            if large:
+                result = _changed_large(entry, scanners, wanted, known,
+                                        record[2] if record is not None else None,
+                                        window_size, reading[0], pool)
+            else:
+                result = next(results)
+            if result is None:
+                continue
+            digest, same, fresh = result
+            if same:
+                cache.hits += 1
+                findings = dict(record[3])
+            else:
+                cache.misses += 1
+                findings = {}
+            for i, res in fresh:
+                if keys[i] is not None:
+                    findings[keys[i]] = res
+            cache.store(entry, digest, findings)
+            _collect_cached(entry, scanners, keys, wanted, findings, dict(fresh), matched)
+    finally:
+        if pool is not None:
+            pool.terminate()
+        if reads is not None:
+            reads.close()   # останавливает потоки-читатели
+    # записи удалённых файлов чистятся только по полному индексу
+    cache.save((entry.rel for entry in index) if index.complete else None)
+
+
+def resolve_jobs(jobs: int) -> int:
+    """0 или отрицательное значение — все доступные ядра."""
+    if jobs is None or jobs <= 0:
+        return os.cpu_count() or 1
+    return jobs
+
+
+def run_scan(index: FileIndex, scanners: Sequence[Any], jobs: int = 1,
+             cache: Optional[ScanCache] = None, use_mmap: bool = False,
+             readers: int = 0, queue_depth: int = DEFAULT_QUEUE_DEPTH,
+             cancel: Optional[CancelToken] = None,
+             window_size: int = DEFAULT_WINDOW_SIZE,
+             start_method: Optional[str] = None) -> List[Any]:
+    """
+    Один проход по индексу для всех сканеров.
+    jobs == 1 — в текущем процессе, иначе — пул из jobs процессов.
+    cache — постоянный кэш находок: неизменённые файлы не читаются.
+    use_mmap — файлы отображаются в память и сканируются как байты.
+    readers — потоки упреждающего чтения (в каждом процессе), не более
+    queue_depth прочитанных файлов в очереди; 0 — чтение по одному файлу.
+    cancel — признак отмены: проверяется перед каждым файлом, при отмене
+    проход прерывается исключением Cancelled (кэш при этом не сохраняется).
+    window_size — файлы крупнее сканируются окнами такого размера
+    (см. windows.py); 0 — файлы всегда передаются сканерам целиком.
+    start_method — способ запуска процессов пула (multiprocessing.get_context):
+    None — по умолчанию для платформы; многопоточный вызывающий (служба,
+    daemon.py) передаёт 'forkserver' или 'spawn' — fork из процесса с
+    другими потоками может унаследовать захваченную ими блокировку.
+    Возвращает список результатов finish() в порядке scanners.
+    """
+    for scanner in scanners:
+        scanner.reset()
+
+    jobs = resolve_jobs(jobs)
+    reading = (use_mmap, readers, queue_depth)
+    # счётчики прохода по сканерам: файлов просмотрено и с находками
+    examined = [0] * len(scanners)
+    matched = [0] * len(scanners)
+    if cache is not None:
+        _run_cached(index, scanners, jobs, cache, reading, cancel, examined, matched, window_size,
+                    start_method)
+        return _finish(scanners, examined, matched)
+
+    plans: List[Tuple[FileEntry, List[int]]] = []
+    for entry in index.scannable():
+        wanted = _wanted(entry, scanners)
+        if wanted:
+            plans.append((entry, wanted))
+    _count(plans, examined)
+    large = [_large(entry, scanners, wanted, window_size) for entry, wanted in plans]
+    small = [plan for plan, windowed in zip(plans, large) if not windowed]
+    pool = reads = None
+    if jobs == 1:
+        reads = _reads(small, reading)
+        found = (_scan_entry(entry, scanners, wanted, data) for (entry, wanted), data in reads)
+    else:
+        tasks = [(entry.path, entry.rel, entry.size, wanted) for entry, wanted in small]
+        pool = _pool(jobs, scanners, reading, start_method)
+        # imap сохраняет порядок задач — слияние детерминировано
+        found = chain.from_iterable(pool.imap(_scan_chunk, _chunks(tasks)))
+    try:
+        for (entry, wanted), windowed in zip(plans, large):
+            if cancel is not None:
+                cancel.check()
+            if windowed:
+                windows = _plan_windows(entry, scanners, wanted, window_size)
+                file_found = [(i, res) for i, res in
+                              _scan_large(entry, scanners, wanted, windows, use_mmap, pool) or ()
+                              if res is not None]
+            else:
+                # _scan_entry освобождает отображение файла после сканирования
+                file_found = next(found)
+            for i, res in file_found:
+                scanners[i].collect(entry, res)
+                matched[i] += 1
+    finally:
+        if pool is not None:
+            pool.terminate()
+        if reads is not None:
+            reads.close()   # останавливает потоки-читатели
+
+    return _finish(scanners, examined, matched)
@@ -0,0 +1,446 @@
+import mmap
+import os
+import re
+import stat
+from fnmatch import fnmatchcase
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Set, Tuple
+from .patterns import (LANG_EXTENSIONS, CONFIG_PATTERNS, CONFIG_FILES, IGNORE_DIRS,
+                       BINARY_EXTENSIONS, SHEBANG_LANGS)
+
+# Сколько первых байт файла читается для классификации
+SNIFF_SIZE = 8192
+# Файлы крупнее не анализируются по содержимому (0 — без ограничения)
+DEFAULT_MAX_FILE_SIZE = 10 * 1024 * 1024
+
+# Классы файлов: анализируется содержимое только текстовых
+TEXT, BINARY, OVERSIZED = 'text', 'binary', 'oversized'
+
+# Таблица "расширение/имя файла -> язык", построенная один раз.
+# Порядок LANG_EXTENSIONS важен: при конфликте побеждает язык, объявленный раньше.
+_LANG_ORDER: Dict[str, int] = {}
+_LANG_BY_KEY: Dict[str, str] = {}
+for _order, (_language, _exts) in enumerate(LANG_EXTENSIONS.items()):
+    _LANG_ORDER[_language] = _order
+    for _ext in _exts:
+        _LANG_BY_KEY.setdefault(_ext.lower(), _language)
+
+
+def detect_language(filename: str) -> str:
+    """
+    Определяет язык файла по расширению или специальному имени файла
+    (Dockerfile и т.п.). Возвращает "Other", если язык неизвестен.
+    """
+    name = filename.lower()
+    by_ext = _LANG_BY_KEY.get(os.path.splitext(name)[1])
+    by_name = _LANG_BY_KEY.get(name)
+    if by_ext and by_name:
+        return min(by_ext, by_name, key=_LANG_ORDER.__getitem__)
+    return by_ext or by_name or "Other"
+
+
+def shebang_language(head: bytes) -> Optional[str]:
+    """Язык по строке #! ("#!/usr/bin/env python3" -> "Python") или None."""
+    if not head.startswith(b'#!'):
+        return None
+    words = head[2:].split(b'\n', 1)[0].decode('utf-8', 'ignore').split()
+    if not words:
+        return None
+    program = os.path.basename(words[0])
+    if program == 'env':
+        # env -S python3 -u, env PYTHONPATH=. python3
+        args = [w for w in words[1:] if not w.startswith('-') and '=' not in w]
+        if not args:
+            return None
+        program = os.path.basename(args[0])
+    # python3.11 -> python
+    return SHEBANG_LANGS.get(program.rstrip('0123456789.'))
+
+
+def sniff(path: str) -> Tuple[bool, Optional[str]]:
+    """
+    Классификация по первым SNIFF_SIZE байтам: (двоичный ли файл, язык по
+    shebang). Признак двоичного файла — нулевой байт, как у git.
+    """
+    try:
+        with open(path, 'rb') as f:
+            head = f.read(SNIFF_SIZE)
+    except OSError:
+        return False, None
+    if b'\0' in head:
+        return True, None
+    return False, shebang_language(head)
+
+
+def decode_text(raw) -> str:
+    """
+    Текст из bytes/mmap так же, как при чтении файла в текстовом режиме:
+    UTF-8 с пропуском ошибок, переводы строк \r\n и \r заменяются на \n.
+    """
+    text = str(raw, 'utf-8', 'ignore')
+    if '\r' in text:
+        text = text.replace('\r\n', '\n').replace('\r', '\n')
+    return text
+
+
+class FileEntry:
+    """Запись индекса: метаданные файла и лениво загружаемое содержимое."""
+    __slots__ = ('path', 'rel', 'name', 'ext', 'size', 'mtime', 'lang', 'kind', 'retain',
+                 '_content', '_loaded')
+
+    def __init__(self, path: str, rel: str, size: int, retain: bool = True, mtime: int = 0):
+        self.path = path
+        self.rel = rel
+        self.name = os.path.basename(path)
+        self.ext = os.path.splitext(self.name)[1].lower()
+        self.size = size
+        self.mtime = mtime   # st_mtime_ns
+        self.lang = detect_language(self.name)
+        self.kind = TEXT
+        self.retain = retain
+        self._content: Optional[str] = None
+        self._loaded = False
+
+    def _read_disk(self) -> Optional[str]:
+        try:
+            with open(self.path, 'r', encoding='utf-8', errors='ignore') as f:
+                return f.read()
+        except Exception:
+            return None
+
+    @property
+    def content(self) -> Optional[str]:
+        """
+        Содержимое файла (UTF-8, ошибки декодирования игнорируются).
+        Файл читается с диска не более одного раза: для удерживаемых записей
+        текст кэшируется, остальные читаются единственным потребителем.
+        None — если файл прочитать не удалось.
+        """
+        if self._loaded:
+            return self._content
+        content = self._read_disk()
+        if self.retain or content is None:
+            self._content = content
+            self._loaded = True
+        return content
+
+    def read(self) -> Optional[str]:
+        """
+        Содержимое без кэширования: для общего прохода движка, после
+        которого текст файла больше не нужен.
+        """
+        if self._loaded:
+            return self._content
+        return self._read_disk()
+
+    def buffer(self):
+        """
+        Содержимое для bytes-режима движка: уже загруженный текст (str),
+        иначе файл, отображённый в память (mmap только для чтения; пустой
+        файл и ФС без поддержки mmap — bytes). None — если файл не открылся.
+        Отображение закрывает вызывающий.
+        """
+        if self._loaded:
+            return self._content
+        try:
+            with open(self.path, 'rb') as f:
+                try:
+                    return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                except (ValueError, OSError):
+                    return f.read()
+        except OSError:
+            return None
+
+    def release(self) -> None:
+        """Освобождает закэшированное содержимое."""
+        self._content = None
+        self._loaded = False
+
+
+# Манифесты и конфиги, которые читают анализаторы стека и зависимостей
+_RETAIN_NAMES = set(CONFIG_FILES) | set(CONFIG_PATTERNS)
+
+
+def _default_retain(entry: FileEntry) -> bool:
+    # Кэшируем только то, что нужно детекторам после подсчёта SLOC:
+    # текстовые исходники известных языков, манифесты и конфиги.
+    if entry.kind != TEXT:
+        return False
+    return entry.lang != "Other" or entry.name in _RETAIN_NAMES
+
+
+class PathFilter:
+    """
+    Правила игнорирования по компонентам относительного пути: путь
+    игнорируется, если шаблону соответствует любой его каталог или имя файла.
+    Решение по каталогу запоминается — для файла проверяется только имя.
+    """
+
+    def __init__(self, patterns: Sequence[re.Pattern]):
+        self.patterns = patterns
+        self._dirs: Dict[str, bool] = {'': False}
+
+    def _match(self, name: str) -> bool:
+        return any(pat.search(name) for pat in self.patterns)
+
+    def _dir_ignored(self, head: str) -> bool:
+        ignored = self._dirs.get(head)
+        if ignored is None:
+            parent, name = os.path.split(head)
+            ignored = self._dir_ignored(parent) or self._match(name)
+            self._dirs[head] = ignored
+        return ignored
+
+    def ignored(self, rel: str) -> bool:
+        head, name = os.path.split(rel)
+        return self._dir_ignored(head) or self._match(name)
+
+
+class FileIndex:
+    """
+    Общий индекс файлов проекта, построенный за один обход os.walk.
+    Используется всеми анализаторами и детекторами вместо собственных обходов.
+    """
+
+    def __init__(self, directory: str, retain: Callable[[FileEntry], bool] = None,
+                 paths: Iterable[str] = None, ignore_dirs: Iterable[str] = IGNORE_DIRS,
+                 max_file_size: int = DEFAULT_MAX_FILE_SIZE):
+        """
+        paths — относительные пути файлов: индекс строится только по ним,
+        без обхода дерева (несуществующие пропускаются).
+        ignore_dirs — имена каталогов, в которые обход не спускается;
+        файлы внутри них не попадают в индекс и при заданных paths.
+        max_file_size — файлы крупнее помечаются OVERSIZED (0 — без ограничения).
+        """
+        self.directory = directory
+        self._retain = retain or _default_retain
+        self._ignore_dirs = frozenset(ignore_dirs or ())
+        self.max_file_size = max_file_size
+        self.entries: List[FileEntry] = []
+        self._by_rel: Dict[str, FileEntry] = {}
+        # Пропущенные каталоги (относительные пути): они существуют в проекте,
+        # но их содержимое не индексируется
+        self.pruned: List[str] = []
+        # Все пройденные каталоги (относительные пути, и пустые тоже) — для PathIndex
+        self.dirs: List[str] = []
+        self._path_index: Optional['PathIndex'] = None
+        # полный индекс (обход дерева) или только перечисленные пути
+        self.complete = paths is None
+        if paths is None:
+            self._build()
+        else:
+            for rel in paths:
+                parts = os.path.normpath(rel).split(os.sep)
+                if self._ignore_dirs.isdisjoint(parts[:-1]):
+                    self._add(os.path.join(directory, rel))
+
+    def _build(self) -> None:
+        for root, dirs, files in os.walk(self.directory):
+            # отсечение до спуска: os.walk обходит только оставшиеся dirs
+            kept = []
+            for name in dirs:
+                rel = os.path.relpath(os.path.join(root, name), start=self.directory)
+                if name in self._ignore_dirs:
+                    self.pruned.append(rel)
+                else:
+                    kept.append(name)
+                    self.dirs.append(rel)
+            dirs[:] = kept
+            for fname in files:
+                self._add(os.path.join(root, fname))
+
+    def _add(self, path: str) -> None:
+        try:
+            st = os.stat(path)
+        except OSError:
+            return
+        if not stat.S_ISREG(st.st_mode):
+            return   # каталоги (подмодули git), FIFO и т.п.
+        rel = os.path.relpath(path, start=self.directory)
+        if rel in self._by_rel:
+            return
+        entry = FileEntry(path, rel, st.st_size, mtime=st.st_mtime_ns)
+        self._classify(entry)
+        entry.retain = self._retain(entry)
+        self.entries.append(entry)
+        self._by_rel[rel] = entry
+
+    def _classify(self, entry: FileEntry) -> None:
+        """
+        Класс файла: размер и расширение проверяются без чтения, первые
+        байты читаются только у файлов, язык которых не распознан по имени
+        (двоичный ли файл, нет ли shebang).
+        """
+        if entry.ext in BINARY_EXTENSIONS:
+            entry.kind = BINARY
+        elif self.max_file_size and entry.size > self.max_file_size:
+            entry.kind = OVERSIZED
+        elif entry.lang == "Other" and entry.size:
+            binary, lang = sniff(entry.path)
+            if binary:
+                entry.kind = BINARY
+            elif lang:
+                entry.lang = lang
+
+    def __iter__(self) -> Iterator[FileEntry]:
+        return iter(self.entries)
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def scannable(self) -> Iterator[FileEntry]:
+        """Записи, содержимое которых анализируется: текстовые и не крупнее предела."""
+        return (entry for entry in self.entries if entry.kind == TEXT)
+
+    def get(self, rel: str) -> Optional[FileEntry]:
+        """Запись по относительному пути (или None)."""
+        return self._by_rel.get(os.path.normpath(rel))
+
+    def path_index(self) -> 'PathIndex':
+        """Индекс путей для структурных проверок, строится один раз."""
+        if self._path_index is None:
+            self._path_index = PathIndex(self)
+        return self._path_index
+
+    def read(self, path: str) -> Optional[str]:
+        """
+        Содержимое файла по полному пути: из индекса, если файл в нём есть,
+        иначе — прямое чтение с диска.
+        """
+        entry = self.get(os.path.relpath(path, start=self.directory))
+        if entry is not None:
+            return entry.content
+        try:
+            with open(path, 'r', encoding='utf-8', errors='ignore') as f:
+                return f.read()
+        except Exception:
+            return None
+
+
+# Метасимволы glob в компоненте пути
+_GLOB_MAGIC = re.compile(r'[*?[]')
+
+
+class PathIndex:
+    """
+    Пути проекта в памяти для структурных проверок (FileDetector): множества
+    относительных путей файлов и каталогов, карта имя → пути и дети каждого
+    каталога. Проверки 'file'/'dir'/'pattern' — поиск по словарям вместо
+    glob и os.walk по диску на каждое правило.
+
+    Строится из полного FileIndex без обращений к диску; для неполного
+    (--diff) — одним обходом дерева без stat. Содержимое пропущенных
+    каталогов (IGNORE_DIRS) не индексируется: явный путь внутри них
+    проверяется на диске, шаблоны и glob видят только сам каталог.
+    """
+
+    def __init__(self, index: FileIndex):
+        self.directory = index.directory
+        self.files: Set[str] = set()
+        self.dirs: Set[str] = {''}
+        self.by_name: Dict[str, List[str]] = {}
+        self._children: Dict[str, List[str]] = {}
+        self._pruned: Set[str] = set(index.pruned)
+        if index.complete:
+            files: Iterable[str] = (entry.rel for entry in index.entries)
+            dirs: Iterable[str] = index.dirs + index.pruned
+        else:
+            files, dirs = self._walk(index._ignore_dirs)
+        for rel in dirs:
+            self.dirs.add(rel)
+            self._link(rel)
+        for rel in files:
+            self.files.add(rel)
+            self._link(rel)
+
+    def _walk(self, ignore_dirs: Iterable[str]) -> Tuple[List[str], List[str]]:
+        files: List[str] = []
+        dirs: List[str] = []
+        for root, names, fnames in os.walk(self.directory):
+            base = os.path.relpath(root, start=self.directory)
+            base = '' if base == os.curdir else base
+            for name in names:
+                rel = os.path.join(base, name)
+                dirs.append(rel)
+                if name in ignore_dirs:
+                    self._pruned.add(rel)
+            names[:] = [name for name in names if name not in ignore_dirs]
+            files.extend(os.path.join(base, name) for name in fnames)
+        return files, dirs
+
+    def _link(self, rel: str) -> None:
+        parent, name = os.path.split(rel)
+        self.by_name.setdefault(name, []).append(rel)
+        self._children.setdefault(parent, []).append(name)
+
+    def _in_pruned(self, rel: str) -> bool:
+        head = os.path.dirname(rel)
+        while head:
+            if head in self._pruned:
+                return True
+            head = os.path.dirname(head)
+        return False
+
+    def kind(self, rel: str) -> Optional[str]:
+        """'file', 'dir' или None — пути нет."""
+        rel = os.path.normpath(rel) if rel else ''
+        rel = '' if rel == os.curdir else rel
+        if rel in self.files:
+            return 'file'
+        if rel in self.dirs:
+            return 'dir'
+        if self._in_pruned(rel):
+            full = os.path.join(self.directory, rel)
+            if os.path.isfile(full):
+                return 'file'
+            if os.path.isdir(full):
+                return 'dir'
+        return None
+
+    def glob(self, pattern: str) -> List[str]:
+        """
+        Относительные пути по шаблону glob (как glob.glob с recursive=True):
+        * и ? не пересекают '/', скрытые имена — только при явной точке,
+        ** — любая глубина каталогов.
+        """
+        parts = [part for part in pattern.replace(os.sep, '/').split('/') if part not in ('', '.')]
+        if not any(_GLOB_MAGIC.search(part) for part in parts):
+            rel = os.path.join(*parts) if parts else ''
+            return [rel] if self.kind(rel) else []
+        current = ['']
+        for position, part in enumerate(parts):
+            last = position == len(parts) - 1
+            found: List[str] = []
+            for base in current:
+                if part == '**':
+                    found.extend(self._descendants(base, dirs_only=not last))
+                elif _GLOB_MAGIC.search(part):
+                    hidden = part.startswith('.')
+                    found.extend(os.path.join(base, name) for name in self._children.get(base, ())
+                                 if fnmatchcase(name, part) and (hidden or not name.startswith('.')))
+                else:
+                    rel = os.path.join(base, part)
+                    if self.kind(rel):
+                        found.append(rel)
+            current = found if last else [rel for rel in found if self.kind(rel) == 'dir']
+        return list(dict.fromkeys(current))
+
+    def _descendants(self, base: str, dirs_only: bool) -> List[str]:
+        """base и все вложенные пути без скрытых имён (для **)."""
+        found = [base]
+        stack = [base]
+        while stack:
+            head = stack.pop()
+            for name in self._children.get(head, ()):
+                if name.startswith('.'):
+                    continue
+                rel = os.path.join(head, name)
+                if rel in self.dirs:
+                    found.append(rel)
+                    stack.append(rel)
+                elif not dirs_only:
+                    found.append(rel)
+        return found
+
+    def search(self, regex: re.Pattern) -> Iterator[str]:
+        """Пути файлов и каталогов, в имени которых есть совпадение regex (лениво)."""
+        return (rel for name, rels in self.by_name.items() if regex.search(name) for rel in rels)
@@ -0,0 +1,131 @@
+"""
+Компактное хранение находок: эндпоинты, AJAX-вызовы и HTTP-заголовки.
+
+Находки одного вида хранятся столбцами (FindingTable): номер строки — в
+array('I') по 4 байта, остальные поля — в списках, повторяющиеся строки
+(фреймворк, HTTP-метод) интернируются; файл — один на блок находок файла,
+номером в таблице путей прохода (PathTable). Ни словаря, ни объекта на находку: в словари
+{'file': ..., 'line': ...} находки разворачиваются только при обращении
+к элементам — когда отчёт выводится (ReportGenerator, JSON, сравнение в --diff).
+"""
+import sys
+from array import array
+from bisect import bisect_right
+from collections.abc import Sequence
+from itertools import accumulate
+from typing import Any, Dict, Iterable, Iterator, List, Tuple
+
+
+def _intern(value: Any) -> Any:
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+class PathTable:
+    """Таблица путей одного прохода: путь -> номер и обратно."""
+    __slots__ = ('paths', '_ids')
+
+    def __init__(self):
+        self.paths: List[str] = []
+        self._ids: Dict[str, int] = {}
+
+    def id(self, path: str) -> int:
+        """Номер пути; новый путь добавляется в конец таблицы."""
+        found = self._ids.get(path)
+        if found is None:
+            found = self._ids[path] = len(self.paths)
+            self.paths.append(path)
+        return found
+
+    def __getitem__(self, file_id: int) -> str:
+        return self.paths[file_id]
+
+    def __len__(self) -> int:
+        return len(self.paths)
+
+
+class FindingTable(Sequence):
+    """
+    Находки одного вида столбцами: 'file', 'line' и поля fields (в порядке
+    ключей словаря отчёта). Находки файла добавляются одним блоком (add_file),
+    элементы идут в порядке блоков, блоки можно упорядочить по пути
+    (sort_by_path). Элементы — словари отчёта, которые строятся при обращении
+    и не хранятся; сравнение — поэлементно, в том числе со списком словарей
+    (например, из базового отчёта JSON).
+    """
+    __slots__ = ('fields', 'paths', '_intern', '_lines', '_columns', '_blocks', '_offsets')
+
+    def __init__(self, fields: Tuple[str, ...], paths: PathTable = None, intern: Tuple[str, ...] = ()):
+        self.fields = fields
+        self.paths = paths if paths is not None else PathTable()
+        # столбцы с повторяющимися строками: одна копия строки на все находки
+        self._intern = [name in intern for name in fields]
+        self._lines = array('I')
+        self._columns: List[List[Any]] = [[] for _ in fields]
+        # (номер_файла, начало, конец) — находки файла идут подряд
+        self._blocks: List[Tuple[int, int, int]] = []
+        # начала блоков в порядке элементов (для индексации), строятся лениво
+        self._offsets: List[int] = None
+
+    def add_file(self, path: str, rows: Iterable[Tuple]) -> None:
+        """Находки одного файла: строки (номер_строки, *поля) в нужном порядке."""
+        rows = list(rows)
+        if not rows:
+            return
+        start = len(self._lines)
+        lines, *values = zip(*rows)   # строки файла -> столбцы
+        self._lines.extend(lines)
+        for column, interned, items in zip(self._columns, self._intern, values):
+            column.extend(map(_intern, items) if interned else items)
+        self._blocks.append((self.paths.id(path), start, len(self._lines)))
+        self._offsets = None
+
+    def sort_by_path(self) -> None:
+        """
+        Блоки файлов по возрастанию пути (внутри блока — как есть). Сортируется
+        только список блоков: столбцы не копируются, порядок элементов
+        задают блоки.
+        """
+        paths = self.paths
+        self._blocks.sort(key=lambda block: paths[block[0]])
+        self._offsets = None
+
+    def _row(self, i: int) -> Dict[str, Any]:
+        # i -> блок (по смещениям блоков в порядке списка) -> строка столбцов
+        if self._offsets is None:
+            self._offsets = list(accumulate((end - start for _, start, end in self._blocks), initial=0))
+        k = bisect_right(self._offsets, i) - 1
+        file_id, start, _ = self._blocks[k]
+        j = start + i - self._offsets[k]
+        row = {'file': self.paths[file_id], 'line': self._lines[j]}
+        for name, column in zip(self.fields, self._columns):
+            row[name] = column[j]
+        return row
+
+    def __len__(self) -> int:
+        return len(self._lines)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self._row(j) for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError('FindingTable index out of range')
+        return self._row(i)
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        names = ('file', 'line') + tuple(self.fields)
+        for file_id, start, end in self._blocks:
+            path = self.paths[file_id]
+            for row in zip(self._lines[start:end], *(column[start:end] for column in self._columns)):
+                yield dict(zip(names, (path,) + row))
+
+    def __eq__(self, other: Any) -> bool:
+        if isinstance(other, (FindingTable, list)):
+            return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self) -> str:
+        return f'FindingTable({list(self)!r})'
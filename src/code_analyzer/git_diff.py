@@ -0,0 +1,199 @@
+"""
+Режим --diff: анализ только файлов, изменённых между двумя ревизиями.
+
+Список изменённых путей берётся из локального git (git diff --name-status),
+без обхода дерева. Находки по этим файлам заменяют находки тех же файлов
+в сохранённом базовом отчёте (--baseline, JSON полного запуска), после чего
+объединённый отчёт сравнивается с базовым: добавленные и удалённые
+эндпоинты, AJAX-запросы, секреты и технологии.
+"""
+import json
+import os
+from typing import Any, Callable, Dict, Iterable, List, Set, Tuple
+
+from .patterns import DEPENDENCY_PATTERNS
+
+# Манифесты в корне проекта, по которым определяются зависимости:
+# в режиме --diff они всегда попадают в индекс, изменены они или нет
+MANIFEST_FILES = sorted({'package.json'} | {spec[0] for specs in DEPENDENCY_PATTERNS.values()
+                                            for spec in specs})
+
+
+def changed_paths(directory: str, base: str, head: str) -> Tuple[List[str], List[str]]:
+    """
+    Пути (относительно directory), изменённые между base и head:
+    (добавленные/изменённые — их нужно проанализировать, удалённые).
+    Переименование даёт удалённый старый путь и добавленный новый.
+    """
+    cmd = ['git', '-C', directory, 'diff', '--name-status', '-z', '-M', '--relative', base, head, '--']
+    import subprocess   # только в режиме --diff: не замедляет обычный запуск
+    try:
+        out = subprocess.run(cmd, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE).stdout
+    except (OSError, subprocess.CalledProcessError) as e:
+        detail = getattr(e, 'stderr', b'') or b''
+        raise RuntimeError(f"git diff {base} {head}: {os.fsdecode(detail).strip() or e}")
+
+    changed: List[str] = []
+    removed: List[str] = []
+    fields = [os.fsdecode(f) for f in out.split(b'\0') if f]
+    i = 0
+    while i < len(fields):
+        status = fields[i][0]
+        if status in 'RC':
+            # R100 <старый> <новый>; при копировании старый путь остаётся
+            old, new = fields[i + 1], fields[i + 2]
+            if status == 'R':
+                removed.append(old)
+            changed.append(new)
+            i += 3
+            continue
+        path = fields[i + 1]
+        if status == 'D':
+            removed.append(path)
+        else:
+            changed.append(path)
+        i += 2
+    return [os.path.normpath(p) for p in changed], [os.path.normpath(p) for p in removed]
+
+
+def load_baseline(path: str) -> Dict[str, Any]:
+    """Базовый отчёт: JSON, сохранённый запуском с --format json."""
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _rel(path: str, root: str) -> str:
+    # пути в отчёте — os.path.join(root, rel), root — путь из командной строки
+    if root:
+        return os.path.relpath(path, start=root)
+    return os.path.normpath(path)
+
+
+def _merge_files(old: List[Dict[str, Any]], new: List[Dict[str, Any]],
+                 touched: Set[str]) -> List[Dict[str, Any]]:
+    kept = [item for item in old or [] if os.path.normpath(item['file']) not in touched]
+    return sorted(kept + list(new or []), key=lambda item: (item['file'], item['line']))
+
+
+def _merge_paths(old: Iterable, new: Iterable, old_root: str, new_root: str,
+                 touched: Set[str]) -> List[Tuple[str, Any]]:
+    """Списки (путь, значения): пути базового отчёта переносятся в новый корень."""
+    kept = []
+    for path, values in old or []:
+        rel = _rel(path, old_root)
+        if rel not in touched:
+            kept.append((os.path.join(new_root, rel), values))
+    return kept + [tuple(item) for item in new or []]
+
+
+def merge_baseline(baseline: Dict[str, Any], fresh: Dict[str, Any], touched: Set[str]) -> Dict[str, Any]:
+    """
+    Отчёт для head: находки базового отчёта по файлам из touched заменяются
+    находками fresh (анализ только этих файлов). Языки и SLOC берутся из
+    базового отчёта. Технология из базового отчёта остаётся, если у неё
+    есть кодовые/конфигурационные признаки в файлах или она найдена по
+    манифестам; технологии, подтверждённые структурой каталогов, и
+    технологии без признаков в файлах переносятся как есть.
+    """
+    old_root, new_root = baseline.get('root', ''), fresh['root']
+    merged = dict(baseline)
+    merged['root'] = new_root
+
+    for key in ('endpoints', 'ajax', 'headers'):
+        merged[key] = _merge_files(baseline.get(key), fresh.get(key), touched)
+    for key in ('secrets', 'config_secrets'):
+        merged[key] = _merge_paths(baseline.get(key), fresh.get(key), old_root, new_root, touched)
+
+    configs: Dict[str, List[str]] = {}
+    for tech, paths in (baseline.get('configs') or {}).items():
+        for path in paths:
+            rel = _rel(path, old_root)
+            if rel not in touched:
+                configs.setdefault(tech, []).append(os.path.join(new_root, rel))
+    for tech, paths in (fresh.get('configs') or {}).items():
+        configs.setdefault(tech, []).extend(paths)
+    merged['configs'] = configs
+
+    old_evidence = baseline.get('evidence') or {}
+    evidence: Dict[str, Set[str]] = {}
+    for tech, files in old_evidence.items():
+        kept = {f for f in files if os.path.normpath(f) not in touched}
+        if kept:
+            evidence[tech] = kept
+    for tech, files in (fresh.get('evidence') or {}).items():
+        evidence.setdefault(tech, set()).update(files)
+    merged['evidence'] = {tech: sorted(files) for tech, files in evidence.items()}
+
+    merged['dependencies'] = fresh.get('dependencies', {})
+    old_deps = {tech for items in (baseline.get('dependencies') or {}).values() for tech in items}
+    new_deps = {tech for items in merged['dependencies'].values() for tech in items}
+
+    # подтверждённые структурой (см. StackAnalyzer): кодовые правила для них
+    # не запускались, и признаков в файлах может не быть
+    structural = {tech for tech, items in (baseline.get('stack_evidence') or {}).items()
+                  if any(item['source'] in ('file', 'dir') for item in items)}
+    stack: Dict[str, Set[str]] = {}
+    for category, techs in (baseline.get('stack') or {}).items():
+        stack[category] = {tech for tech in techs
+                           if tech in evidence or tech in new_deps or tech in structural
+                           or (tech not in old_evidence and tech not in old_deps)}
+    for category, techs in (fresh.get('stack') or {}).items():
+        stack.setdefault(category, set()).update(techs)
+    merged['stack'] = stack
+
+    # Признаки технологий (stack_evidence): структурные из базового отчёта
+    # переносятся (структура в --diff не проверяется), кодовые и конфигурационные —
+    # только по незатронутым файлам, зависимости — из свежего анализа манифестов
+    present = {tech for techs in stack.values() for tech in techs}
+    stack_evidence: Dict[str, List[Dict[str, Any]]] = {}
+    for tech, items in (baseline.get('stack_evidence') or {}).items():
+        if tech in present:
+            stack_evidence[tech] = [item for item in items if item['source'] in ('file', 'dir')
+                                    or (item['source'] in ('code', 'config')
+                                        and os.path.normpath(item['path']) not in touched)]
+    for tech, items in (fresh.get('stack_evidence') or {}).items():
+        stack_evidence.setdefault(tech, []).extend(items)
+    merged['stack_evidence'] = {tech: items for tech, items in stack_evidence.items() if items}
+    return merged
+
+
+def _changes(old: Iterable, new: Iterable, key: Callable) -> Dict[str, List[Any]]:
+    old_by_key = {key(item): item for item in old}
+    new_by_key = {key(item): item for item in new}
+    return {
+        'added':   [item for k, item in new_by_key.items() if k not in old_by_key],
+        'removed': [item for k, item in old_by_key.items() if k not in new_by_key],
+    }
+
+
+def _secrets(report: Dict[str, Any]) -> List[Dict[str, str]]:
+    root = report.get('root', '')
+    found = []
+    for key in ('secrets', 'config_secrets'):
+        for path, values in report.get(key) or []:
+            for value in values:
+                found.append({'file': _rel(path, root), 'value': value})
+    return found
+
+
+def _technologies(report: Dict[str, Any]) -> List[Dict[str, str]]:
+    return [{'category': category, 'tech': tech}
+            for category, techs in (report.get('stack') or {}).items()
+            for tech in sorted(techs)]
+
+
+def diff_reports(old: Dict[str, Any], new: Dict[str, Any]) -> Dict[str, Dict[str, List[Any]]]:
+    """
+    Изменения между отчётами. Эндпоинты сравниваются без номеров строк:
+    сдвиг кода внутри файла изменением не считается.
+    """
+    return {
+        'endpoints': _changes(old.get('endpoints') or [], new.get('endpoints') or [],
+                              lambda ep: (ep['file'], ep.get('framework'), ep.get('method'), ep.get('endpoint'))),
+        'ajax': _changes(old.get('ajax') or [], new.get('ajax') or [],
+                         lambda call: (call['file'], call.get('call'))),
+        'secrets': _changes(_secrets(old), _secrets(new),
+                            lambda secret: (secret['file'], secret['value'])),
+        'technologies': _changes(_technologies(old), _technologies(new),
+                                 lambda tech: (tech['category'], tech['tech'])),
+    }
@@ -0,0 +1,286 @@
+"""
+Предфильтр по обязательным литералам регулярных выражений.
+
+Для каждого шаблона из дерева разбора извлекаются условия — наборы
+литералов, из каждого из которых хотя бы одна строка обязана входить в любое
+совпадение (например, "fetch(" или "@springbootapplication"). Все литералы
+каталога загружаются в один многострочный автомат; полное регулярное
+выражение запускается только если в файле выполнены все его условия. Большинство файлов не содержит
+ни одного — и отсеивается без единого прогона regex.
+"""
+import re
+from typing import Dict, FrozenSet, List, Optional, Sequence, Set, Tuple
+
+try:  # Python 3.11+
+    from re import _parser as sre_parse
+except ImportError:  # pragma: no cover
+    import sre_parse
+
+try:  # необязательная зависимость: настоящий автомат Ахо–Корасик на C
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+
+# Литералы короче этого почти ничего не отсеивают
+MIN_LITERAL_LEN = 3
+# Предел размера набора при раскрытии альтернатив ((get|post)\.(a|b) -> 4 строки)
+MAX_LITERAL_SET = 64
+# Символьный класс из не более чем стольких символов считается набором литералов
+MAX_CLASS_SIZE = 8
+# Буфер (bytes/mmap) переводится в нижний регистр окнами такого размера —
+# без копии всего файла
+BUFFER_WINDOW = 1 << 20
+
+_REPEATS = {'MAX_REPEAT', 'MIN_REPEAT', 'POSSESSIVE_REPEAT'}
+
+# Разбор фрагмента: (точный_набор, условия)
+#   точный_набор — все строки, которые может дать фрагмент (или None);
+#   условия      — наборы литералов; из КАЖДОГО набора хотя бы одна строка
+#                  обязательно входит в совпадение.
+_Analysis = Tuple[Optional[Set[str]], List[FrozenSet[str]]]
+
+
+def _usable(candidate) -> bool:
+    return bool(candidate) and min(map(len, candidate)) >= MIN_LITERAL_LEN
+
+
+def _best(candidates) -> Optional[FrozenSet[str]]:
+    """Самый избирательный набор: длиннее кратчайший литерал, меньше вариантов."""
+    usable = [frozenset(c) for c in candidates if _usable(c)]
+    if not usable:
+        return None
+    return max(usable, key=lambda c: (min(map(len, c)), -len(c)))
+
+
+def _analyze_item(op, av) -> _Analysis:
+    name = str(op)
+    if name == 'LITERAL':
+        return {chr(av).lower()}, []
+    if name == 'AT':
+        # \b, ^ и т.п. нулевой ширины — соседние литералы остаются смежными
+        return {''}, []
+    if name == 'IN':
+        chars = set()
+        for item_op, item_av in av:
+            if str(item_op) != 'LITERAL':
+                return None, []
+            chars.add(chr(item_av).lower())
+        return (chars, []) if len(chars) <= MAX_CLASS_SIZE else (None, [])
+    if name == 'SUBPATTERN':
+        return _analyze_seq(av[-1])
+    if name == 'ATOMIC_GROUP':
+        return _analyze_seq(av)
+    if name == 'BRANCH':
+        # из альтернатив выводится одно условие: объединение лучших наборов
+        exact: Optional[Set[str]] = set()
+        union: Optional[Set[str]] = set()
+        for alternative in av[1]:
+            alt_exact, alt_clauses = _analyze_seq(alternative)
+            if exact is not None and alt_exact is not None:
+                exact |= alt_exact
+            else:
+                exact = None
+            alt_best = _best(alt_clauses + [alt_exact])
+            if union is not None and alt_best is not None:
+                union |= alt_best
+            else:
+                union = None
+        if exact is not None and len(exact) > MAX_LITERAL_SET:
+            exact = None
+        return exact, ([frozenset(union)] if union else [])
+    if name in _REPEATS:
+        lo, hi, item = av
+        item_exact, item_clauses = _analyze_seq(item)
+        if lo == hi == 1:
+            return item_exact, item_clauses
+        if lo == 0 and hi == 1 and item_exact is not None:
+            return item_exact | {''}, []
+        if lo >= 1:
+            return None, item_clauses + ([frozenset(item_exact)] if _usable(item_exact) else [])
+        return None, []
+    # ANY, NOT_LITERAL, CATEGORY, ASSERT, GROUPREF… — ничего обязательного
+    return None, []
+
+
+def _analyze_seq(subpattern) -> _Analysis:
+    exact = {''}
+    whole_exact = True
+    clauses: List[FrozenSet[str]] = []
+
+    def flush(run):
+        if _usable(run):
+            clauses.append(frozenset(run))
+
+    for op, av in subpattern:
+        item_exact, item_clauses = _analyze_item(op, av)
+        if item_exact is not None:
+            joined = {a + b for a in exact for b in item_exact}
+            if len(joined) <= MAX_LITERAL_SET:
+                exact = joined
+                continue
+            flush(exact)
+            exact = item_exact
+            whole_exact = False
+            continue
+        # фрагмент переменной длины разрывает цепочку литералов
+        whole_exact = False
+        flush(exact)
+        clauses.extend(item_clauses)
+        exact = {''}
+    if whole_exact:
+        return exact, []
+    flush(exact)
+    return None, clauses
+
+
+# Условия уже разобранных шаблонов по (исходник, флаги): разбор дерева
+# sre_parse — основная цена построения предфильтров, а каталог шаблонов
+# конечен. В долгоживущем процессе (пакетный режим, batch.py) детекторы
+# следующих проектов строятся без повторного разбора.
+_clauses_memo: Dict[Tuple[str, int], Tuple[FrozenSet[str], ...]] = {}
+
+
+def required_clauses(pattern: re.Pattern) -> List[FrozenSet[str]]:
+    """
+    Условия на литералы (в нижнем регистре): из каждого набора хотя бы одна
+    строка входит в любое совпадение шаблона. Пустой список — условий нет,
+    шаблон нужно запускать всегда.
+    """
+    key = (pattern.pattern, pattern.flags)
+    cached = _clauses_memo.get(key)
+    if cached is None:
+        try:
+            parsed = sre_parse.parse(pattern.pattern, pattern.flags)
+        except Exception:
+            cached = ()
+        else:
+            exact, clauses = _analyze_seq(parsed)
+            if _usable(exact):
+                clauses = clauses + [frozenset(exact)]
+            cached = tuple(dict.fromkeys(clauses))
+        _clauses_memo[key] = cached
+    return list(cached)
+
+
+def required_literals(pattern: re.Pattern) -> Optional[FrozenSet[str]]:
+    """Самое избирательное из условий шаблона (или None)."""
+    return _best(required_clauses(pattern))
+
+
+# Текст последнего файла в нижнем регистре: детекторы одного файла
+# получают один и тот же объект str и переводят его в нижний регистр один раз.
+# Пара заменяется целиком — одно присваивание, безопасно для потоков.
+_lowered: Tuple[Optional[str], Optional[str]] = (None, None)
+
+
+def _lower(text: str) -> str:
+    global _lowered
+    cached, lowered = _lowered
+    if cached is not text:
+        lowered = text.lower()
+        _lowered = (text, lowered)
+    return lowered
+
+
+class LiteralPrefilter:
+    """
+    Автомат по обязательным литералам набора шаблонов.
+    candidates(text) возвращает индексы шаблонов, которые имеет смысл
+    запускать на этом тексте (в исходном порядке).
+    """
+
+    def __init__(self, patterns: Sequence[re.Pattern]):
+        self.clauses = [required_clauses(p) for p in patterns]
+        self._literals = sorted({literal for clauses in self.clauses
+                                 for clause in clauses for literal in clause})
+        self._automaton = None
+
+    def __getstate__(self):
+        # автомат не передаётся в рабочие процессы — строится там заново
+        state = self.__dict__.copy()
+        state['_automaton'] = None
+        return state
+
+    def _build(self):
+        if ahocorasick is None:
+            self._automaton = self._literals
+        else:
+            automaton = ahocorasick.Automaton()
+            for literal in self._literals:
+                automaton.add_word(literal, literal)
+            automaton.make_automaton()
+            self._automaton = automaton
+        return self._automaton
+
+    def _search(self, lowered: str) -> Set[str]:
+        automaton = self._automaton or self._build()
+        if ahocorasick is None:
+            # без автомата: поиск каждого литерала — C-уровневый поиск подстроки
+            return {literal for literal in automaton if literal in lowered}
+        return {literal for _, literal in automaton.iter(lowered)}
+
+    def _search_buffer(self, buf) -> Set[str]:
+        """
+        Литералы в bytes/mmap: окна с перекрытием на длину самого длинного
+        литерала, регистр — ASCII. Литералы каталога — ASCII, поэтому
+        latin-1 даёт str с теми же позициями без настоящего декодирования.
+        """
+        overlap = max(map(len, self._literals)) - 1
+        found: Set[str] = set()
+        for start in range(0, max(len(buf), 1), BUFFER_WINDOW):
+            window = buf[start:start + BUFFER_WINDOW + overlap].lower().decode('latin-1')
+            found |= self._search(window)
+            if len(found) == len(self._literals):
+                break
+        return found
+
+    def literals_in(self, text) -> Set[str]:
+        """Литералы автомата, встречающиеся в тексте (str, bytes или mmap)."""
+        if not self._literals:
+            return set()
+        if not isinstance(text, str):
+            return self._search_buffer(text)
+        return self._search(_lower(text))
+
+    def candidates(self, text) -> List[int]:
+        found = self.literals_in(text)
+        return [i for i, clauses in enumerate(self.clauses)
+                if all(not clause.isdisjoint(found) for clause in clauses)]
+
+    def lines(self, text, i: int) -> Optional[List[Tuple[int, int]]]:
+        """
+        Отрезки [начало, конец) строк text, в которых есть литерал самого
+        избирательного условия шаблона i, по возрастанию. None — условий нет
+        (или нижний регистр меняет длину str), шаблон запускается по всему
+        тексту. Только для шаблонов, совпадения которых не пересекают строк.
+        """
+        clause = _best(self.clauses[i])
+        if clause is None:
+            return None
+        if isinstance(text, str):
+            lowered = _lower(text)
+            if len(lowered) != len(text):
+                return None
+            windows = [(0, lowered, set(clause))]
+        else:
+            # буфер — окнами с перекрытием, как в _search_buffer
+            overlap = max(map(len, clause)) - 1
+            words = {literal.encode('latin-1') for literal in clause}
+            windows = ((start, buf, words) for start, buf in
+                       ((start, text[start:start + BUFFER_WINDOW + overlap].lower())
+                        for start in range(0, max(len(text), 1), BUFFER_WINDOW)))
+        newline = '\n' if isinstance(text, str) else b'\n'
+        spans = {}
+        for offset, window, words in windows:
+            for literal in words:
+                pos = window.find(literal)
+                while pos >= 0:
+                    at = offset + pos
+                    start = text.rfind(newline, 0, at) + 1
+                    end = text.find(newline, at)
+                    if end < 0:
+                        end = len(text)
+                    spans[start] = end
+                    # следующая строка: в этой литерал уже найден
+                    pos = window.find(literal, end - offset + 1) if end - offset < len(window) else -1
+        return sorted(spans.items())
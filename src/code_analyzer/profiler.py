@@ -0,0 +1,237 @@
+"""
+Встроенный профилировщик (--profile): во что обходится анализ.
+
+Собирает:
+  - по этапам cli.analyze — время (настенное и CPU), число файлов и байт,
+    пиковый RSS процесса после этапа;
+  - по сканерам общего прохода — вызовы scan_file и их суммарное время;
+  - по шаблонам каталогов (ENDPOINT_PATTERNS, HEADER_PATTERNS,
+    AJAX_PATTERN_EXT, кодовые правила TECHNOLOGY_DETECTORS) — сколько раз
+    шаблон применялся, сколько совпадений дал и сколько времени занял;
+    шаблоны, отсечённые предфильтром литералов, не применяются вовсе;
+  - самые медленные файлы общего прохода.
+
+Шаблоны учитываются через utils.for_buffer — через неё сканеры получают
+каждый шаблон перед применением. Профилирование идёт в одном процессе:
+счётчики рабочих процессов пула не собираются.
+"""
+import json
+import re
+import sys
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+
+from . import utils
+from .file_index import FileEntry
+from .patterns import catalog
+
+try:
+    import resource
+except ImportError:   # Windows
+    resource = None
+
+
+def _peak_rss_mb() -> Optional[float]:
+    """Пиковый RSS процесса в МБ (None, если недоступен)."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux — КиБ, macOS — байты
+    return round(peak / (1 << 20 if sys.platform == 'darwin' else 1 << 10), 1)
+
+
+def _catalog_labels() -> Dict[Tuple[str, int], str]:
+    """Подписи шаблонов каталога по (исходник, флаги) — те же, что в аудите."""
+    return {(regex.pattern, regex.flags): label for label, regex in catalog()}
+
+
+class _PatternStat:
+    __slots__ = ('label', 'source', 'evaluations', 'matches', 'seconds')
+
+    def __init__(self, label: str, source: str):
+        self.label = label
+        self.source = source
+        self.evaluations = 0
+        self.matches = 0
+        self.seconds = 0.0
+
+
+class _TimedPattern:
+    """Обёртка шаблона: search/finditer с учётом времени и совпадений."""
+    __slots__ = ('_pattern', '_stat')
+
+    def __init__(self, pattern: re.Pattern, stat: _PatternStat):
+        self._pattern = pattern
+        self._stat = stat
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._pattern, name)
+
+    def search(self, string, *args):
+        stat = self._stat
+        start = time.perf_counter()
+        m = self._pattern.search(string, *args)
+        stat.seconds += time.perf_counter() - start
+        stat.evaluations += 1
+        stat.matches += m is not None
+        return m
+
+    def finditer(self, string, *args) -> Iterator[re.Match]:
+        stat = self._stat
+        stat.evaluations += 1
+        matches = self._pattern.finditer(string, *args)
+        while True:
+            start = time.perf_counter()
+            m = next(matches, None)
+            stat.seconds += time.perf_counter() - start
+            if m is None:
+                return
+            stat.matches += 1
+            yield m
+
+
+class _TimedScanner:
+    """Сканер общего прохода, у которого замеряются scan_file и scan_window."""
+
+    def __init__(self, scanner: Any, profiler: 'Profiler'):
+        self._scanner = scanner
+        self._profiler = profiler
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._scanner, name)
+
+    def scan_file(self, entry: FileEntry, text) -> Any:
+        start = time.perf_counter()
+        try:
+            return self._scanner.scan_file(entry, text)
+        finally:
+            self._profiler._scanned(self._scanner, entry, time.perf_counter() - start)
+
+    def scan_window(self, entry: FileEntry, text, limit: int, skip=None) -> Any:
+        start = time.perf_counter()
+        try:
+            return self._scanner.scan_window(entry, text, limit, skip)
+        finally:
+            self._profiler._scanned(self._scanner, entry, time.perf_counter() - start)
+
+
+class Profiler:
+    """Накопитель измерений одного запуска; см. описание модуля."""
+
+    def __init__(self, top: int = 10):
+        self.top = top
+        self.stages: List[Dict[str, Any]] = []
+        self._labels = _catalog_labels()
+        self._patterns: Dict[Tuple[Any, int], _PatternStat] = {}
+        self._scanners: Dict[str, List[float]] = {}   # имя: [вызовы, секунды]
+        self._files: Dict[str, Tuple[int, float]] = {}   # rel: (размер, секунды)
+
+    # --- этапы ---
+
+    @contextmanager
+    def stage(self, name: str,
+              entries: Union[Iterable[FileEntry], Callable[[], Iterable[FileEntry]]] = ()):
+        """
+        Замер этапа; entries — файлы, которые этап обрабатывает (или функция,
+        возвращающая их, — если они известны только после этапа).
+        """
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield
+        finally:
+            wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+            entries = list(entries() if callable(entries) else entries)
+            self.stages.append({
+                'stage':       name,
+                'wall':        round(wall, 4),
+                'cpu':         round(cpu, 4),
+                'files':       len(entries),
+                'bytes':       sum(entry.size for entry in entries),
+                'peak_rss_mb': _peak_rss_mb(),
+            })
+
+    # --- сканеры и шаблоны ---
+
+    def wrap(self, scanners: Sequence[Any]) -> List[Any]:
+        """
+        Сканеры для run_scan с замером scan_file. Подписи собственных
+        шаблонов сканера (не из каталога) берутся из его pattern_labels().
+        """
+        for scanner in scanners:
+            if hasattr(scanner, 'pattern_labels'):
+                self._labels.update(scanner.pattern_labels())
+        return [_TimedScanner(scanner, self) for scanner in scanners]
+
+    def _scanned(self, scanner: Any, entry: FileEntry, seconds: float) -> None:
+        stat = self._scanners.setdefault(type(scanner).__name__, [0, 0.0])
+        stat[0] += 1
+        stat[1] += seconds
+        size, total = self._files.get(entry.rel, (entry.size, 0.0))
+        self._files[entry.rel] = (size, total + seconds)
+
+    def _pattern(self, original: re.Pattern, compiled: re.Pattern) -> _TimedPattern:
+        key = (original.pattern, original.flags)
+        stat = self._patterns.get((key, type(compiled.pattern) is bytes))
+        if stat is None:
+            source = original.pattern
+            label = self._labels.get(key) or 'другое: ' + ' '.join(source.split())[:60]
+            stat = _PatternStat(label, source)
+            self._patterns[(key, type(compiled.pattern) is bytes)] = stat
+        return _TimedPattern(compiled, stat)
+
+    @contextmanager
+    def patterns(self):
+        """Учёт шаблонов на время блока (через utils.for_buffer)."""
+        previous = utils.set_pattern_hook(self._pattern)
+        try:
+            yield
+        finally:
+            utils.set_pattern_hook(previous)
+
+    # --- отчёт ---
+
+    def report(self) -> Dict[str, Any]:
+        stats: Dict[str, _PatternStat] = {}
+        for stat in self._patterns.values():
+            # str- и bytes-версии одного шаблона — одна строка отчёта
+            merged = stats.setdefault(stat.label, _PatternStat(stat.label, stat.source))
+            merged.evaluations += stat.evaluations
+            merged.matches += stat.matches
+            merged.seconds += stat.seconds
+        patterns = sorted(stats.values(), key=lambda s: -s.seconds)
+        files = sorted(self._files.items(), key=lambda item: -item[1][1])[:self.top]
+        return {
+            'stages': self.stages,
+            'scanners': [{'scanner': name, 'calls': calls, 'seconds': round(seconds, 4)}
+                         for name, (calls, seconds) in sorted(self._scanners.items(), key=lambda i: -i[1][1])],
+            'patterns': [{'pattern': s.label, 'source': s.source, 'evaluations': s.evaluations,
+                          'matches': s.matches, 'seconds': round(s.seconds, 4)} for s in patterns],
+            'slowest_files': [{'file': rel, 'size': size, 'seconds': round(seconds, 4)}
+                              for rel, (size, seconds) in files],
+        }
+
+    def save(self, path: str) -> None:
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.report(), f, indent=2, ensure_ascii=False)
+
+    def print_table(self, out=None) -> None:
+        """Таблица профиля (по умолчанию в stderr — отчёт анализа остаётся в stdout)."""
+        out = out or sys.stderr
+        report = self.report()
+        print("=== ПРОФИЛЬ: ЭТАПЫ ===", file=out)
+        print(f"{'этап':<24} {'wall, с':>9} {'cpu, с':>9} {'файлы':>7} {'МБ':>8} {'пик RSS, МБ':>12}", file=out)
+        for s in report['stages']:
+            rss = '' if s['peak_rss_mb'] is None else f"{s['peak_rss_mb']:.1f}"
+            print(f"{s['stage']:<24} {s['wall']:>9.3f} {s['cpu']:>9.3f} {s['files']:>7} "
+                  f"{s['bytes'] / 1e6:>8.2f} {rss:>12}", file=out)
+        print("=== ПРОФИЛЬ: СКАНЕРЫ ===", file=out)
+        for s in report['scanners']:
+            print(f"{s['scanner']:<24} {s['calls']:>9} вызовов {s['seconds']:>9.3f} с", file=out)
+        print(f"=== ПРОФИЛЬ: ШАБЛОНЫ (топ {self.top} по времени) ===", file=out)
+        print(f"{'шаблон':<48} {'применений':>10} {'совпадений':>10} {'с':>8}", file=out)
+        for s in report['patterns'][:self.top]:
+            print(f"{s['pattern'][:48]:<48} {s['evaluations']:>10} {s['matches']:>10} {s['seconds']:>8.3f}", file=out)
+        print(f"=== ПРОФИЛЬ: САМЫЕ МЕДЛЕННЫЕ ФАЙЛЫ (топ {self.top}) ===", file=out)
+        for f in report['slowest_files']:
+            print(f"{f['file']:<60} {f['size']:>10} байт {f['seconds']:>8.3f} с", file=out)
@@ -0,0 +1,51 @@
+"""
+Упреждающее чтение файлов: пул потоков-читателей загружает содержимое
+следующих файлов, пока текущий анализируется регулярными выражениями.
+
+На сетевых ФС (NFS) проход упирается в задержку открытия и чтения
+каждого файла; чтение отпускает GIL, поэтому ожидание диска перекрывается
+с разбором уже прочитанных файлов. Очередь ограничена: в памяти не больше
+depth загруженных файлов, результаты выдаются в исходном порядке.
+"""
+from collections import deque
+from typing import Callable, Deque, Iterable, Iterator, Tuple, TypeVar
+
+# Значения по умолчанию для CLI (--readers, --queue-depth)
+DEFAULT_READERS = 4
+DEFAULT_QUEUE_DEPTH = 32
+
+T = TypeVar('T')
+D = TypeVar('D')
+
+
+def read_ahead(items: Iterable[T], load: Callable[[T], D], readers: int = DEFAULT_READERS,
+               depth: int = DEFAULT_QUEUE_DEPTH) -> Iterator[Tuple[T, D]]:
+    """
+    Пары (элемент, load(элемент)) в порядке items; load выполняется заранее
+    в readers потоках, не более чем на depth элементов вперёд.
+    readers <= 0 — последовательное чтение в текущем потоке.
+    """
+    if readers <= 0:
+        for item in items:
+            yield item, load(item)
+        return
+
+    # concurrent.futures (вместе с logging) — только при упреждающем чтении
+    from concurrent.futures import ThreadPoolExecutor
+    depth = max(depth, 1)
+    window: Deque = deque()
+    pool = ThreadPoolExecutor(readers, thread_name_prefix='reader')
+    try:
+        for item in items:
+            window.append((item, pool.submit(load, item)))
+            if len(window) >= depth:
+                head, future = window.popleft()
+                yield head, future.result()
+        while window:
+            head, future = window.popleft()
+            yield head, future.result()
+    finally:
+        # потребитель остановился раньше — незапущенные чтения отменяются
+        for _, future in window:
+            future.cancel()
+        pool.shutdown(wait=True)
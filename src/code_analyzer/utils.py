@@ -1,5 +1,9 @@
 import os
-from typing import Iterator, Tuple
+import re
+from bisect import bisect_right
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+from .file_index import FileIndex
+from .readahead import DEFAULT_QUEUE_DEPTH, read_ahead
 
 # Вспомогательные функции для работы с файлами и путями
 
@@ -19,14 +23,107 @@ def format_path(path: str, base_dir: str = None) -> str:
     return path.replace("\\\\", "/")
 
 
-def read_files(directory: str) -> Iterator[Tuple[str, str]]:
-    """Генератор обхода всех файлов: возвращает кортеж (путь, содержимое)"""
-    for root, _, files in os.walk(directory):
-        for file in files:
-            path = os.path.join(root, file)
-            try:
-                with open(path, 'r', encoding='utf-8', errors='ignore') as f:
-                    content = f.read()
-                yield path, content
-            except Exception:
-                continue
\ No newline at end of file
+def read_files(directory: str, readers: int = 0,
+               queue_depth: int = DEFAULT_QUEUE_DEPTH) -> Iterator[Tuple[str, str]]:
+    """
+    Генератор обхода текстовых файлов: возвращает кортеж (путь, содержимое).
+    Двоичные и слишком большие файлы, а также каталоги зависимостей и
+    сборок пропускаются — та же политика, что у FileIndex.
+    readers > 0 — файлы заранее читаются потоками (см. readahead.py).
+    """
+    entries = FileIndex(directory).scannable()
+    for entry, content in read_ahead(entries, lambda entry: entry.read(), readers, queue_depth):
+        if content is not None:
+            yield entry.path, content
+
+
+# bytes-версии шаблонов каталога: компилируются при первом использовании
+_BYTES_PATTERNS: Dict[Tuple[str, int], re.Pattern] = {}
+
+# Наблюдатель за применением шаблонов: (исходный, применяемый) -> объект
+# с интерфейсом шаблона; задаётся профилировщиком (profiler.py)
+PatternHook = Callable[[re.Pattern, re.Pattern], Any]
+_pattern_hook: Optional[PatternHook] = None
+
+
+def set_pattern_hook(hook: Optional[PatternHook]) -> Optional[PatternHook]:
+    """Устанавливает наблюдателя for_buffer; возвращает прежнего."""
+    global _pattern_hook
+    previous, _pattern_hook = _pattern_hook, hook
+    return previous
+
+
+def for_buffer(pattern: re.Pattern, text) -> re.Pattern:
+    """
+    Шаблон под тип текста: для str — как есть, для bytes/mmap — тот же
+    шаблон, скомпилированный как bytes (классы \\w, \\s и IGNORECASE — ASCII).
+    Через эту функцию сканеры получают каждый шаблон перед применением.
+    """
+    if isinstance(text, str):
+        compiled = pattern
+    else:
+        key = (pattern.pattern, pattern.flags)
+        compiled = _BYTES_PATTERNS.get(key)
+        if compiled is None:
+            compiled = re.compile(pattern.pattern.encode('utf-8'), pattern.flags & ~re.UNICODE)
+            _BYTES_PATTERNS[key] = compiled
+    if _pattern_hook is not None:
+        return _pattern_hook(pattern, compiled)
+    return compiled
+
+
+def as_text(value: Any) -> Any:
+    """Фрагмент совпадения как str: в bytes-режиме декодируются только совпадения."""
+    if isinstance(value, (bytes, bytearray)):
+        return value.decode('utf-8', 'ignore')
+    return value
+
+
+_NEWLINE = re.compile(b'\n')
+_TEXT_NEWLINE = re.compile('\n')
+
+
+class LineIndex:
+    """
+    Индекс начал строк одного текста (str, bytes или mmap): номер строки и
+    колонка для смещения совпадения за O(log n) вместо text[:pos].count('\\n').
+    Строится лениво — при первом запросе, один раз на файл.
+    """
+    __slots__ = ('_text', '_starts', '_length')
+
+    def __init__(self, text):
+        self._text = text
+        self._starts: List[int] = None
+        self._length = len(text)
+
+    def _build(self) -> List[int]:
+        # только позиции переводов строк: ни копии буфера, ни строки на строку
+        text = self._text
+        textual = isinstance(text, str)
+        self._starts = [0]
+        self._starts.extend(m.end() for m in (_TEXT_NEWLINE if textual else _NEWLINE).finditer(text))
+        if textual:
+            # буфер bytes/mmap остаётся: span() отбрасывает '\r' у строк CRLF
+            self._text = None
+        return self._starts
+
+    def line(self, pos: int) -> int:
+        """Номер строки (с 1) для смещения pos."""
+        starts = self._starts or self._build()
+        return bisect_right(starts, pos)
+
+    def position(self, pos: int) -> Tuple[int, int]:
+        """(строка, колонка), обе с 1, для смещения pos."""
+        starts = self._starts or self._build()
+        line = bisect_right(starts, pos)
+        return line, pos - starts[line - 1] + 1
+
+    def span(self, line: int) -> Tuple[int, int]:
+        """Смещения [начало, конец) строки line без завершающего '\\n'."""
+        starts = self._starts or self._build()
+        start = starts[line - 1]
+        end = starts[line] - 1 if line < len(starts) else self._length
+        # в текстовом режиме open() уже превратил '\r\n' в '\n'
+        if self._text is not None and end > start and self._text[end - 1] == 13:
+            end -= 1
+        return start, end
@@ -0,0 +1,176 @@
+"""
+Сканирование больших файлов окнами.
+
+Файл крупнее window_size делится на окна по границам строк. Собственный
+отрезок окна [start, stop) — целые строки, примерно window_size байт; за
+ним идёт перекрытие: не меньше overlap байт, дополненное до конца строки.
+Сканер ищет совпадения по всему окну, но оставляет только начинающиеся в
+собственном отрезке: совпадение, пересекающее шов, оставляет одно окно
+(если оно не длиннее перекрытия).
+
+Перекрытие — наибольшая длина совпадения шаблонов сканера, но не больше
+MAX_OVERLAP: у шаблонов с неограниченными повторами ([^}]*, \s*, .*) длина
+совпадения не ограничена. Это намеренное приближение: совпадение длиннее
+перекрытия, начавшееся в окне, теряется — окно видит его обрезанным (и
+либо не находит, либо находит короче), а следующее окно его не оставляет,
+так как оно началось до шва. Какая попытка поиска упёрлась в конец окна,
+re не сообщает, и продлить окно по факту нельзя. Для сканирования без
+окон — window_size=0 (--window-size 0).
+
+Поиск по файлу целиком продолжается с конца предыдущего совпадения, поэтому
+совпадения, начинающиеся внутри пересекающего шов, он не видит, а следующее
+окно, начав со шва, нашло бы их. Окно сообщает перенос: для каждого шаблона
+(цепочки поиска), на сколько последнее оставленное совпадение заходит за
+шов; следующее окно ищет по этому шаблону с конца совпадения
+(window_matches). Окна сканируются независимо, без переноса, и сливаются по
+порядку: окно, в которое пришёл перенос, сканируется заново с ним — только
+когда совпадение действительно пересекло шов.
+
+Номера строк окна считаются от его начала. Каждое окно сообщает, сколько
+строк в его собственном отрезке, и перед слиянием номера сдвигаются на
+число строк предыдущих окон. Окна читаются с диска по смещению, в пуле
+процессов окна одного файла сканируются параллельно, и в памяти процесса
+не больше одного окна. Одна строка никогда не делится: файл из одной
+длинной строки — одно окно.
+
+Сканер с поддержкой окон (необязательная часть протокола, см. engine.py):
+  - window_overlap() -> int               — перекрытие окон в байтах: длина
+                                            самого длинного возможного
+                                            совпадения (см. match_width);
+  - scan_window(entry, text, limit, skip) — как scan_file, но по окну:
+                                            (находки, перенос). Только
+                                            совпадения, начинающиеся до limit,
+                                            номера строк — от начала окна;
+                                            skip — перенос предыдущего окна
+                                            ({цепочка: смещение} или None),
+                                            перенос — такой же словарь для
+                                            следующего окна или None;
+  - join_windows(parts)                   — находки файла (как у scan_file)
+                                            из [(строк_до_окна, находки_окна)]
+                                            по порядку окон, окна без находок
+                                            пропущены.
+"""
+import re
+from typing import Dict, Hashable, Iterator, List, Optional, Sequence, Tuple
+from .cache import parts_digest
+from .file_index import decode_text
+
+try:  # Python 3.11+
+    from re import _parser as sre_parse
+except ImportError:  # pragma: no cover
+    import sre_parse
+
+# Файлы крупнее сканируются окнами такого размера (0 — без окон)
+DEFAULT_WINDOW_SIZE = 4 * 1024 * 1024
+# Предел перекрытия: шаблоны с неограниченными повторами (.*, \s+)
+# считаются совпадающими не длиннее этого; более длинные совпадения,
+# начавшиеся у шва, окна теряют (см. описание модуля)
+MAX_OVERLAP = 64 * 1024
+# Граница строки ищется блоками такого размера
+_PROBE = 64 * 1024
+
+# Окно: (начало, конец собственного отрезка, конец окна с перекрытием)
+Window = Tuple[int, int, int]
+
+
+def match_width(patterns: Sequence[re.Pattern], cap: int = MAX_OVERLAP) -> int:
+    """
+    Перекрытие окон для набора шаблонов: наибольшая длина совпадения
+    в байтах (символ UTF-8 — до 4 байт), но не больше cap.
+    """
+    width = 0
+    for pattern in patterns:
+        try:
+            widest = sre_parse.parse(pattern.pattern, pattern.flags).getwidth()[1]
+        except Exception:
+            return cap
+        width = max(width, 4 * widest)
+        if width >= cap:
+            return cap
+    return width
+
+
+def window_matches(regex: re.Pattern, text, limit: int, key: Hashable,
+                   skip: Optional[Dict[Hashable, int]], spill: Dict[Hashable, int]) -> Iterator[re.Match]:
+    """
+    regex.finditer по окну: совпадения, начинающиеся до limit, поиск — со
+    смещения skip[key] (перенос предыдущего окна). Если последнее совпадение
+    заходит за limit, после обхода spill[key] — на сколько.
+    """
+    end = skip.get(key, 0) if skip else 0
+    for m in regex.finditer(text, end):
+        if m.start() >= limit:
+            break
+        end = m.end()
+        yield m
+    if end > limit:
+        spill[key] = end - limit
+
+
+def _line_end(f, pos: int, size: int) -> int:
+    """Смещение после ближайшего '\\n' не раньше pos - 1 (начало строки) или size."""
+    if pos <= 0 or pos >= size:
+        return min(max(pos, 0), size)
+    f.seek(pos - 1)
+    while True:
+        block = f.read(_PROBE)
+        if not block:
+            return size
+        found = block.find(b'\n')
+        if found >= 0:
+            return pos + found
+        pos += len(block)
+
+
+def plan_windows(path: str, size: int, window_size: int, overlap: int) -> List[Window]:
+    """
+    Окна файла по границам строк; читаются только блоки около швов.
+    Пустой список — файл не открылся.
+    """
+    windows: List[Window] = []
+    try:
+        with open(path, 'rb') as f:
+            start = 0
+            while start < size:
+                stop = _line_end(f, start + window_size, size)
+                end = _line_end(f, stop + overlap, size) if overlap else stop
+                windows.append((start, stop, end))
+                start = stop
+    except OSError:
+        return []
+    return windows
+
+
+def read_window(path: str, window: Window) -> Optional[bytes]:
+    """Окно с перекрытием как bytes или None; отрезок окна — первые stop - start байт."""
+    start, _, end = window
+    try:
+        with open(path, 'rb') as f:
+            f.seek(start)
+            return f.read(end - start)
+    except OSError:
+        return None
+
+
+def window_text(data: bytes, split: int) -> Tuple[str, int]:
+    """
+    Окно как текст (см. file_index.decode_text) и граница собственного
+    отрезка в символах. Швы — после '\\n', поэтому по отдельности
+    декодированные отрезки склеиваются в тот же текст, что и файл целиком.
+    """
+    text = decode_text(data[:split])
+    return text + decode_text(data[split:]), len(text)
+
+
+def window_digest(path: str, windows: Sequence[Window], raw: bool) -> Optional[str]:
+    """
+    cache.content_digest файла, посчитанный по собственным отрезкам окон
+    (они идут подряд с начала файла): по сырым байтам (raw, режим mmap)
+    или по тексту — без загрузки файла целиком. None — файл не прочитался.
+    """
+    try:
+        with open(path, 'rb') as f:
+            return parts_digest(f.read(stop - start) if raw else decode_text(f.read(stop - start))
+                                for start, stop, _ in windows)
+    except OSError:
+        return None
@@ -0,0 +1,73 @@
+"""
+Запуск инструмента: импорт code_analyzer.cli не компилирует шаблоны
+каталогов (patterns.py) и укладывается в бюджет времени.
+
+Оба замера — в отдельном интерпретаторе: в процессе pytest модули уже
+могут быть импортированы, а шаблоны — скомпилированы другими тестами.
+"""
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src')
+
+# Бюджет импорта code_analyzer.cli, мс (см. benchmarks/bench.py, --import-budget)
+IMPORT_BUDGET_MS = 50
+
+# Каждый вызов re._compile (через него идут re.compile, re.match, re.search…)
+# из patterns.py во время импорта: (строка, исходник шаблона)
+_COMPILE_PROBE = '''
+import re, sys
+calls = []
+_compile = re._compile
+def probe(pattern, flags):
+    frame = sys._getframe(1)
+    while frame is not None and frame.f_code.co_filename == re.__file__:
+        frame = frame.f_back
+    if frame is not None and frame.f_code.co_filename.endswith('patterns.py'):
+        calls.append((frame.f_lineno, str(pattern)))
+    return _compile(pattern, flags)
+re._compile = probe
+import code_analyzer.cli
+print(calls)
+'''
+
+
+def _python(*args: str, **kwargs) -> subprocess.CompletedProcess:
+    env = dict(os.environ, PYTHONPATH=os.path.abspath(SRC))
+    env.pop('PYTHONDONTWRITEBYTECODE', None)
+    return subprocess.run([sys.executable, *args], env=env, check=True,
+                          capture_output=True, text=True, **kwargs)
+
+
+def test_import_compiles_no_patterns():
+    calls = _python('-c', _COMPILE_PROBE).stdout.strip()
+    assert calls == '[]', f'patterns.py компилирует шаблоны при импорте: {calls}'
+
+
+def test_import_lazy_catalogs_untouched():
+    probe = ('import code_analyzer.cli, code_analyzer.patterns as p\n'
+             'print(p.ENDPOINT_PATTERNS.compiled() + p.HEADER_PATTERNS.compiled()'
+             ' + p.TECHNOLOGY_DETECTORS.compiled() + [name for name in p._DEFERRED if name in vars(p)])')
+    assert _python('-c', probe).stdout.strip() == '[]'
+
+
+def test_import_budget():
+    # байт-код — во временный каталог, первый запуск только компилирует его;
+    # берётся лучший из остальных: шум планировщика только добавляет время
+    prefix = tempfile.mkdtemp(prefix='test-pyc-')
+    try:
+        best = float('inf')
+        for run in range(6):
+            done = _python('-X', f'pycache_prefix={prefix}', '-X', 'importtime',
+                           '-c', 'import code_analyzer.cli')
+            for line in done.stderr.splitlines():
+                # import time: self [us] | cumulative | name
+                fields = line.split('|')
+                if run and len(fields) == 3 and fields[2].strip() == 'code_analyzer.cli':
+                    best = min(best, int(fields[1]) / 1000)
+    finally:
+        shutil.rmtree(prefix, ignore_errors=True)
+    assert best <= IMPORT_BUDGET_MS, f'импорт code_analyzer.cli: {best:.1f} мс > {IMPORT_BUDGET_MS} мс'
@@ -0,0 +1,78 @@
+"""
+Сканирование окнами (windows.py) находит то же, что сканирование файла
+целиком, при любом положении швов — в том числе когда совпадение пересекает
+шов, а внутри него начинается другое совпадение того же шаблона.
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+import pytest  # noqa: E402
+
+from code_analyzer.detectors.endpoint_detector import EndpointDetector  # noqa: E402
+from code_analyzer.detectors.header_detector import HeaderDetector  # noqa: E402
+from code_analyzer.detectors.secret_detector import SecretDetector  # noqa: E402
+from code_analyzer.engine import run_scan  # noqa: E402
+from code_analyzer.file_index import FileIndex  # noqa: E402
+
+
+def _filler(name: str, count: int):
+    return [f'// {name} {i}: padding text so that seams fall on many different lines' for i in range(count)]
+
+
+# Вложенные вызовы: внешнее совпадение (jQuery.ajax, fetch с заголовками)
+# тянется через несколько строк и поглощает внутреннее — при поиске по файлу
+# целиком внутреннее не находится
+APP_JS = '\n'.join(
+    _filler('head', 60)
+    + ["jQuery.ajax({ type: 'POST',"]
+    + [f'    data: compute({i}),' for i in range(30)]
+    + ["    success: jQuery.ajax({ url: '/inner' })",
+       '});']
+    + _filler('middle', 40)
+    + ["fetch('/outer', { method: 'POST',",
+       "    body: fetch('/inner', { method: 'GET',"]
+    + [f'        part{i}: {i},' for i in range(30)]
+    + ["    headers: { 'X-Token': 'abc' }",
+       '});',
+       "const api_key = 'Zx9Qw8Er7Ty6Ui5Op4As';"]
+    + _filler('tail', 60)
+) + '\n'
+
+
+@pytest.fixture(scope='module')
+def project(tmp_path_factory):
+    root = tmp_path_factory.mktemp('windows')
+    (root / 'app.js').write_text(APP_JS, encoding='utf-8')
+    return str(root)
+
+
+def _scan(root: str, **kwargs):
+    index = FileIndex(root)
+    scanners = [EndpointDetector(root, ['JavaScript'], index),
+                HeaderDetector(root, ['JavaScript'], index),
+                SecretDetector(root, index=index)]
+    endpoints, headers, secrets = run_scan(index, scanners, **kwargs)
+    return list(endpoints['endpoints']), list(endpoints['ajax']), list(headers), secrets
+
+
+def test_whole_file_skips_nested_matches(project):
+    endpoints, ajax, headers, _ = _scan(project, window_size=0)
+    assert [row['line'] for row in ajax] == [61]
+    assert [row['endpoint'] for row in headers] == ["'/outer'"]
+
+
+@pytest.mark.parametrize('use_mmap', [False, True])
+def test_windows_match_whole_file(project, use_mmap):
+    whole = _scan(project, window_size=0, use_mmap=use_mmap)
+    size = len(APP_JS.encode('utf-8'))
+    for window_size in range(200, size, 97):
+        assert _scan(project, window_size=window_size, use_mmap=use_mmap) == whole, window_size
+
+
+def test_windows_match_whole_file_in_pool(project):
+    whole = _scan(project, window_size=0)
+    # швы внутри вложенных вызовов: без переноса между окнами — лишние находки
+    for window_size in (1364, 2237, 4468):
+        assert _scan(project, window_size=window_size, jobs=2) == whole, window_size